@@ -0,0 +1,327 @@
+import base64
+import json
+import mmap
+import os
+import struct
+import time
+from cryptography.fernet import Fernet
+import record_index
+import safe_io
+from vault_store import JsonStore
+from encryption import ENVELOPE_MAGIC
+
+BINARY_FILE = 'vault.bin'
+MAGIC = b"SBXV"
+VERSION = 2
+
+HEADER_PREFIX = struct.Struct(">4sB")  # Número mágico y versión, comunes a todas las versiones
+HEADER_V1 = struct.Struct(">4sBI")  # Versión 1: longitud de la tabla de nombres
+HEADER = struct.Struct(">4sBI16s")  # Versión 2: además, un identificador aleatorio de cada escritura
+RECORD_HEADER = struct.Struct(">BI")  # Registro: flags y longitud del contenedor
+
+FLAG_DOUBLE_BASE64 = 0x01  # El contenedor era base64 de un token Fernet (también base64)
+
+def encode_value(value):
+    """
+    Convierte un contenedor cifrado en base64 a sus bytes crudos.
+
+    Los contenedores cifrados en sobre (`encryption.seal_container`) son base64 de bytes crudos,
+    así que basta con deshacer esa capa. Los del formato anterior son base64 de un token Fernet,
+    que a su vez ya es base64, por lo que se deshacen ambas capas. Si el valor no se puede
+    reconstruir exactamente, solo se deshace la primera capa.
+
+    Args:
+    - value (str): El contenedor cifrado tal y como se guarda en el vault.
+
+    Returns:
+    - flags (int): Las capas de base64 eliminadas.
+    - raw (bytes): Los bytes crudos del contenedor.
+    """
+    token = base64.urlsafe_b64decode(value)
+    if token.startswith(ENVELOPE_MAGIC):
+        return 0, token
+    try:
+        raw = base64.urlsafe_b64decode(token)
+        if base64.urlsafe_b64encode(base64.urlsafe_b64encode(raw)).decode('utf-8') == value:
+            return FLAG_DOUBLE_BASE64, raw
+    except Exception:
+        pass
+    return 0, token
+
+def decode_value(flags, raw):
+    """
+    Reconstruye el contenedor cifrado en base64 a partir de sus bytes crudos.
+
+    Args:
+    - flags (int): Las capas de base64 que se eliminaron al guardar.
+    - raw (bytes): Los bytes crudos del contenedor.
+
+    Returns:
+    - value (str): El contenedor cifrado tal y como se usa en el vault.
+    """
+    if flags & FLAG_DOUBLE_BASE64:
+        raw = base64.urlsafe_b64encode(raw)
+    return base64.urlsafe_b64encode(raw).decode('utf-8')
+
+def pack_record(value):
+    """
+    Serializa un contenedor como registro binario con prefijo de longitud.
+
+    Args:
+    - value (str): El contenedor cifrado en base64.
+
+    Returns:
+    - record (bytes): El registro listo para escribirse.
+    """
+    flags, value_raw = encode_value(value)
+    return RECORD_HEADER.pack(flags, len(value_raw)) + value_raw
+
+def iter_records(data, offset):
+    """
+    Recorre los registros de un vault binario sin descifrarlos.
+
+    Args:
+    - data (bytes): El contenido completo del archivo.
+    - offset (int): La posición del primer registro.
+
+    Returns:
+    - records (generator): Tuplas (offset, flags, contenedor crudo).
+    """
+    while offset < len(data):
+        flags, value_len = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        yield offset, flags, data[start:start + value_len]
+        offset = start + value_len
+
+def write_binary_vault(vault, key, path=BINARY_FILE, index_path=record_index.INDEX_FILE):
+    """
+    Guarda el vault en el formato binario versionado junto con su índice de registros.
+
+    Los nombres se cifran juntos en una única tabla tras la cabecera, y a continuación
+    se escribe un registro por contenedor en el mismo orden que la tabla.
+
+    Args:
+    - vault (dict): El vault a guardar.
+    - key (bytes): La clave Fernet para cifrar la tabla de nombres.
+    - path (str): La ruta del archivo binario.
+    - index_path (str): La ruta del índice de registros.
+    """
+    names = list(vault.keys())
+    names_token = Fernet(key).encrypt(json.dumps(names).encode('utf-8'))
+    names_raw = base64.urlsafe_b64decode(names_token)
+    records = [pack_record(vault[name]) for name in names]
+    generation = os.urandom(16)
+    entries = []
+    offset = HEADER.size + len(names_raw)
+    for name, record in zip(names, records):
+        entries.append((name, offset, len(record)))
+        offset += len(record)
+    data = HEADER.pack(MAGIC, VERSION, len(names_raw), generation) + names_raw + b"".join(records)
+    safe_io.atomic_write(path, data)
+    record_index.write_index(entries, key, generation, index_path)
+
+def parse_header(data):
+    """
+    Interpreta la cabecera de un vault binario de cualquier versión soportada.
+
+    Args:
+    - data (bytes): El contenido del archivo (o al menos su cabecera).
+
+    Returns:
+    - names_offset (int): La posición de la tabla de nombres.
+    - names_len (int): La longitud de la tabla de nombres.
+    - generation (bytes): El identificador de la escritura, o None en la versión 1.
+    """
+    magic, version = HEADER_PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("El archivo no es un vault binario de SecureBox.")
+    if version == 1:
+        _, _, names_len = HEADER_V1.unpack_from(data)
+        return HEADER_V1.size, names_len, None
+    if version == VERSION:
+        _, _, names_len, generation = HEADER.unpack_from(data)
+        return HEADER.size, names_len, generation
+    raise ValueError(f"Versión de vault binario no soportada: {version}")
+
+def read_binary_vault(key, path=BINARY_FILE):
+    """
+    Carga un vault guardado en el formato binario versionado.
+
+    Args:
+    - key (bytes): La clave Fernet para descifrar la tabla de nombres.
+    - path (str): La ruta del archivo binario.
+
+    Returns:
+    - vault (dict): El vault con los contenedores en su representación habitual.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    names_offset, names_len, _ = parse_header(data)
+    names_raw = data[names_offset:names_offset + names_len]
+    names = json.loads(Fernet(key).decrypt(base64.urlsafe_b64encode(names_raw)))
+    records = iter_records(data, names_offset + names_len)
+    return {name: decode_value(flags, value_raw) for name, (_, flags, value_raw) in zip(names, records)}
+
+def read_container_value(name, key, path=BINARY_FILE, index_path=record_index.INDEX_FILE):
+    """
+    Lee un único contenedor del vault binario sin cargar el resto.
+
+    El índice indica la posición del registro, que se lee directamente del archivo
+    mapeado en memoria, de modo que solo ese contenedor tendrá que descifrarse. Si el
+    índice no corresponde a la última escritura del vault, se carga el vault completo.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del archivo binario.
+    - index_path (str): La ruta del índice de registros.
+
+    Returns:
+    - value (str): El contenedor cifrado en base64, o None si no existe.
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        _, _, generation = parse_header(data)
+        if generation is None or not record_index.index_matches(generation, index_path):
+            return read_binary_vault(key, path).get(name)
+        position = record_index.lookup(name, key, index_path)
+        if position is None:
+            return None
+        offset, length = position
+        flags, value_len = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        return decode_value(flags, data[start:start + value_len])
+
+def migrate_json_to_binary(key):
+    """
+    Convierte de una sola vez el vault JSON (con su log de cambios) al formato binario.
+
+    Tras escribir el archivo binario se eliminan `vault.json` (o el checkpoint) y el log, de modo que a partir
+    de ese momento el almacenamiento usa el formato binario.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - vault (dict): El vault migrado.
+    """
+    import storage
+    import log_store
+    vault = storage.load_data(key)
+    write_binary_vault(vault, key)
+    for path in (storage.DATA_FILE, storage.CHECKPOINT_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    log_store.truncate_log()
+    return vault
+
+class BinaryStore(JsonStore):
+    def __init__(self, key, path=BINARY_FILE, index_path=record_index.INDEX_FILE):
+        """
+        Inicializa el almacén binario: como el JSON (copia completa más log de cambios), pero
+        con la copia completa en `vault.bin`, de la que se puede leer un contenedor a través del índice.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+            path (str): La ruta del archivo binario.
+            index_path (str): La ruta del índice de registros.
+        """
+        super().__init__(key, path)
+        self.index_path = index_path
+
+    def has_snapshot(self):
+        return os.path.exists(self.path)
+
+    def snapshot_files(self):
+        return [self.path, self.index_path]
+
+    def read_snapshot(self):
+        return read_binary_vault(self.key, self.path) if self.has_snapshot() else {}
+
+    def read_snapshot_value(self, name):
+        if not self.has_snapshot():
+            return None
+        return read_container_value(name, self.key, self.path, self.index_path)
+
+    def write_snapshot(self, vault):
+        write_binary_vault(vault, self.key, self.path, self.index_path)
+
+# Sección de prueba
+
+def compare_formats(num_containers=1000, content_size=200):
+    """
+    Compara tamaño en disco y tiempo de carga del formato JSON y del formato binario.
+
+    Args:
+    - num_containers (int): Número de contenedores del vault de prueba.
+    - content_size (int): Tamaño en caracteres del contenido de cada contenedor.
+    """
+    import tempfile
+    from encryption import encrypt_container, encrypt_data, decrypt_data
+
+    key = Fernet.generate_key()
+    vault = {f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * content_size, key)
+             for i in range(num_containers)}
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'vault.json')
+        bin_path = os.path.join(tmp, BINARY_FILE)
+        with open(json_path, 'w') as file:
+            file.write(encrypt_data(json.dumps(vault), key))
+        write_binary_vault(vault, key, bin_path, os.path.join(tmp, record_index.INDEX_FILE))
+
+        start = time.perf_counter()
+        with open(json_path, 'r') as file:
+            loaded_json = json.loads(decrypt_data(file.read(), key))
+        json_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded_bin = read_binary_vault(key, bin_path)
+        bin_time = time.perf_counter() - start
+
+        assert loaded_json == loaded_bin == vault, "Los formatos no producen el mismo vault."
+        print(f"{num_containers} contenedores de {content_size} caracteres:")
+        print(f"  JSON:    {os.path.getsize(json_path):>10} bytes, carga en {json_time * 1000:.1f} ms")
+        print(f"  Binario: {os.path.getsize(bin_path):>10} bytes, carga en {bin_time * 1000:.1f} ms")
+
+def compare_lookup(num_containers=100000, content_size=200):
+    """
+    Compara el tiempo de leer un contenedor cargando todo el vault frente a usar el índice.
+
+    Args:
+    - num_containers (int): Número de contenedores del vault de prueba.
+    - content_size (int): Tamaño en caracteres del contenido de cada contenedor.
+    """
+    import tempfile
+    from encryption import encrypt_container, decrypt_container
+
+    key = Fernet.generate_key()
+    vault = {f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * content_size, key)
+             for i in range(num_containers)}
+    target = f"contenedor-{num_containers // 2}"
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_path = os.path.join(tmp, BINARY_FILE)
+        index_path = os.path.join(tmp, record_index.INDEX_FILE)
+        write_binary_vault(vault, key, bin_path, index_path)
+
+        start = time.perf_counter()
+        full_content = decrypt_container(read_binary_vault(key, bin_path)[target], key, target)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed_content = decrypt_container(read_container_value(target, key, bin_path, index_path), key, target)
+        indexed_time = time.perf_counter() - start
+
+        assert full_content == indexed_content, "La lectura indexada no coincide con la carga completa."
+        print(f"Lectura de un contenedor en un vault de {num_containers} contenedores:")
+        print(f"  Carga completa: {full_time * 1000:.1f} ms")
+        print(f"  Con índice:     {indexed_time * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "migrar":
+        from main import initialize_system
+        migrated = migrate_json_to_binary(initialize_system())
+        print(f"Vault migrado al formato binario ({len(migrated)} contenedores).")
+    else:
+        for n in (1000, 10000):
+            compare_formats(n)
+        compare_lookup()
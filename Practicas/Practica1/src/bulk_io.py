@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+from encryption import encrypt_container, read_container_data, release_container
+import chunk_store
+import storage
+import history
+import search_index
+import metadata
+
+CSV_FIELDS = ("name", "content", "tags", "env", "owner")
+
+def file_format(path):
+    """
+    Deduce el formato de un archivo de importación o exportación a partir de su extensión.
+
+    Args:
+    - path (str): La ruta del archivo.
+
+    Returns:
+    - fmt (str): "csv" para los `.csv`; "jsonl" (JSON Lines) en cualquier otro caso.
+    """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def read_records(path):
+    """
+    Lee los registros de un archivo JSON Lines o CSV de uno en uno, sin cargarlo entero.
+
+    Cada registro tiene "name" y "content", y opcionalmente "tags" (lista, o separadas por ";"
+    en CSV), "env" y "owner".
+
+    Args:
+    - path (str): La ruta del archivo.
+
+    Yields:
+    - record (dict): Cada registro del archivo.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        if file_format(path) == "csv":
+            for row in csv.DictReader(file):
+                tags = row.get("tags") or ""
+                row["tags"] = [tag for tag in tags.split(";") if tag]
+                yield row
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+def encrypt_records(records, key):
+    """
+    Cifra los registros a medida que se leen.
+
+    Args:
+    - records (iterable): Los registros de `read_records`.
+    - key (bytes): La clave Fernet del vault.
+
+    Yields:
+    - item (tuple): (nombre, contenido, contenedor cifrado, metadatos del registro).
+    """
+    for record in records:
+        name, content = record["name"], record.get("content") or ""
+        fields = {field: record[field] for field in ("tags", "env", "owner") if record.get(field)}
+        yield name, content, encrypt_container(name, content, key), fields
+
+def stage_records(path, key):
+    """
+    Lee y cifra todos los registros de un archivo sin tocar el vault.
+
+    Si un nombre aparece varias veces, se queda su última versión. Si la lectura o el cifrado
+    fallan, se descartan los fragmentos preparados para los registros ya cifrados y el error se
+    propaga, de modo que no queda nada de la importación.
+
+    Args:
+    - path (str): La ruta del archivo.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - staged (dict): Nombre -> (contenido, contenedor cifrado, metadatos del registro).
+    """
+    staged = {}
+    try:
+        for name, content, encrypted_content, fields in encrypt_records(read_records(path), key):
+            if name in staged:
+                release_container(staged[name][1], key, name)  # Versión anterior del mismo archivo, que nunca llegó a guardarse
+            staged[name] = (content, encrypted_content, fields)
+    except Exception:
+        for name, (_, encrypted_content, _) in staged.items():
+            release_container(encrypted_content, key, name)
+        raise
+    return staged
+
+def import_containers(vault, key, path):
+    """
+    Importa contenedores desde un archivo JSON Lines o CSV.
+
+    El archivo se lee y se cifra entero antes de modificar el vault (`stage_records`), y después
+    los contenedores se guardan con una única copia completa (`storage.save_data`) en lugar de uno
+    a uno en el log. Si falla la lectura, el cifrado o el guardado, el vault queda como estaba:
+    la importación se guarda entera o no se guarda. Solo entonces se liberan las versiones
+    sobrescritas y se actualizan el historial y los índices de búsqueda y de metadatos, estos
+    con una sola escritura; el de nombres se reconstruye en la propia copia completa.
+
+    Args:
+    - vault (Vault): El vault en el que se importan los contenedores.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del archivo.
+
+    Returns:
+    - imported (int): El número de contenedores importados (0 si no se pudo guardar la importación).
+    """
+    staged = stage_records(path, key)
+    if not staged:
+        return 0
+    previous = {name: vault[name] for name in staged if name in vault}
+    previous_contents = {name: vault.get_content(name) for name in previous}
+    vault.update({name: encrypted_content for name, (_, encrypted_content, _) in staged.items()})
+    if not storage.save_data(vault, key):
+        for name, (_, encrypted_content, _) in staged.items():
+            if name in previous:
+                vault[name] = previous[name]
+            else:
+                del vault[name]
+            release_container(encrypted_content, key, name)
+        return 0
+    vault.mark_clean()
+    for name, encrypted_content in previous.items():
+        release_container(encrypted_content, key, name)
+    with search_index.batch(key), metadata.batch(key):
+        for name, (content, _, fields) in staged.items():
+            if name in previous_contents:
+                # Sobrescribir un contenedor existente conserva su contenido anterior en el historial
+                history.record_revision(name, content, key, previous_contents[name])
+            search_index.index_container(name, content, key)
+            metadata.update_metadata(name, key, **fields)
+    return len(staged)
+
+def export_containers(vault, key, path):
+    """
+    Exporta los contenedores de texto del vault, con sus metadatos, a un archivo JSON Lines o CSV.
+
+    Los contenedores se descifran y se escriben de uno en uno, sin pasar por la caché del vault.
+    Los contenedores de archivo no se exportan (se recuperan con "Exportar archivo").
+
+    Args:
+    - vault (dict): El vault a exportar.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del archivo de destino.
+
+    Returns:
+    - exported (int): El número de contenedores exportados.
+    - skipped (int): El número de contenedores de archivo omitidos.
+    """
+    exported = skipped = 0
+    fmt = file_format(path)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for name in sorted(vault):
+            container_data = read_container_data(vault[name], key, name)
+            if "file" in container_data:
+                skipped += 1
+                continue
+            if "chunks" in container_data:
+                content = chunk_store.load_content(container_data["chunks"], key)
+            else:
+                content = container_data["content"]
+            meta = metadata.get_metadata(name, key) or {}
+            record = {"name": name, "content": content}
+            record.update({field: meta[field] for field in ("tags", "env", "owner") if meta.get(field)})
+            if writer:
+                record["tags"] = ";".join(record.get("tags", []))
+                writer.writerow(record)
+            else:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            exported += 1
+    return exported, skipped
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from cryptography.fernet import Fernet
+    from vault import Vault
+    import name_index
+
+    key = Fernet.generate_key()
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with open("importar.jsonl", "w") as file:
+                for i in range(100000):
+                    file.write(json.dumps({"name": f"equipo/servicio-{i}", "content": f"usuario: svc{i}\nhost: app{i}.prod.example.com",
+                                           "tags": ["onboarding"], "env": "prod"}) + "\n")
+            vault = Vault({}, key)
+            start = time.perf_counter()
+            imported = import_containers(vault, key, "importar.jsonl")
+            elapsed = time.perf_counter() - start
+
+            assert storage.load_data(key) == dict(vault), "El almacenamiento no contiene lo importado."
+            assert search_index.search("app42.prod.example.com", key) == ["equipo/servicio-42"]
+            assert len(metadata.filter_containers(key, env="prod")) == imported
+            assert name_index.query(key, "equipo/servicio-9999", limit=2)[0] == ["equipo/servicio-9999", "equipo/servicio-99990"]
+
+            exported, _ = export_containers(vault, key, "exportar.csv")
+            assert exported == imported
+
+            # Un registro erróneo al final del archivo deja el vault como estaba
+            with open("erroneo.jsonl", "w") as file:
+                file.write(json.dumps({"name": "equipo/servicio-0", "content": "sobrescrito"}) + "\n")
+                file.write(json.dumps({"name": "equipo/nuevo", "content": "nuevo"}) + "\n{")
+            try:
+                import_containers(vault, key, "erroneo.jsonl")
+                raise AssertionError("La importación de un archivo erróneo no falló.")
+            except json.JSONDecodeError:
+                pass
+            assert "equipo/nuevo" not in vault and vault.get_content("equipo/servicio-0").startswith("usuario: svc0")
+            assert storage.load_data(key) == dict(vault), "El almacenamiento contiene parte de una importación fallida."
+            print(f"{imported} contenedores importados en {elapsed:.1f} s")
+        finally:
+            os.chdir(previous_dir)
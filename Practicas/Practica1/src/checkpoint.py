@@ -0,0 +1,185 @@
+import marshal
+import os
+import struct
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from chunk_store import derive_subkey
+import safe_io
+import log_store
+from vault_store import JsonStore, DATA_FILE
+
+CHECKPOINT_FILE = 'vault.ckpt'
+MAGIC = b"SBXK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sB12s")  # Número mágico, versión del formato y nonce de AES-GCM
+MARSHAL_VERSION = 4  # Versión de marshal fija, para que el formato no dependa de la de Python
+CHECKPOINT_TAIL_MAX = 1000  # Registros del log a partir de los cuales se escribe un checkpoint al abrir
+
+_checkpoint_keys = {}  # clave del vault -> AESGCM con la subclave de los checkpoints
+
+def checkpoint_cipher(key):
+    """
+    Devuelve el cifrado AES-GCM de los checkpoints, con una subclave derivada de la clave del vault.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - cipher (AESGCM): El cifrado autenticado.
+    """
+    cipher = _checkpoint_keys.get(key)
+    if cipher is None:
+        cipher = _checkpoint_keys[key] = AESGCM(derive_subkey(key, b"SecureBox-checkpoint"))
+    return cipher
+
+def write_checkpoint(vault, key, path=CHECKPOINT_FILE):
+    """
+    Escribe de forma atómica un checkpoint del vault: el diccionario serializado con `marshal`
+    y cifrado con AES-GCM.
+
+    A diferencia de `vault.json` (JSON, comprimido, cifrado con Fernet y en base64), cargarlo
+    no pasa por decodificar base64 ni analizar JSON: solo descifrar y deserializar.
+
+    Args:
+    - vault (dict): El vault a guardar.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del checkpoint.
+    """
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, os.urandom(12))
+    payload = marshal.dumps(dict(vault), MARSHAL_VERSION)
+    # La cabecera se autentica junto con los datos, así que la versión no se puede alterar
+    safe_io.atomic_write(path, header + checkpoint_cipher(key).encrypt(header[-12:], payload, header))
+
+def read_checkpoint(key, path=CHECKPOINT_FILE):
+    """
+    Carga un checkpoint del vault.
+
+    `marshal` no es seguro con datos arbitrarios, pero solo se deserializa lo que ha superado
+    la autenticación de AES-GCM, es decir, lo que se escribió con la clave del vault.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del checkpoint.
+
+    Returns:
+    - vault (dict): El vault guardado en el checkpoint.
+
+    Raises:
+    - ValueError: Si el archivo no es un checkpoint o es de una versión desconocida.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError("El checkpoint está incompleto.")
+    magic, version, nonce = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("El archivo no es un checkpoint del vault.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de checkpoint no soportada: {version}")
+    return marshal.loads(checkpoint_cipher(key).decrypt(nonce, data[HEADER.size:], data[:HEADER.size]))
+
+class CheckpointStore(JsonStore):
+    def __init__(self, key, path=CHECKPOINT_FILE, json_path=DATA_FILE):
+        """
+        Inicializa el almacén por defecto: un checkpoint (`write_checkpoint`) más la cola de
+        cambios posteriores en el log, que es lo único que hay que aplicar al arrancar.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+            path (str): La ruta del checkpoint.
+            json_path (str): La ruta de `vault.json`, que se sigue leyendo en los vaults que aún
+                no tienen checkpoint y se sustituye por él en el siguiente guardado.
+        """
+        super().__init__(key, path)
+        self.json_path = json_path
+
+    def json_is_newer(self):
+        """
+        Indica si hay que leer `vault.json` en lugar del checkpoint: porque aún no hay checkpoint
+        o porque `vault.json` es más reciente (por ejemplo, recuperado de una copia de seguridad).
+        """
+        if not (os.path.exists(self.json_path) and os.stat(self.json_path).st_size > 0):
+            return False
+        return not os.path.exists(self.path) or os.stat(self.json_path).st_mtime > os.stat(self.path).st_mtime
+
+    def has_snapshot(self):
+        return os.path.exists(self.path) or self.json_is_newer()
+
+    def snapshot_files(self):
+        return [self.path, self.json_path]
+
+    def read_snapshot(self):
+        if self.json_is_newer():
+            return JsonStore(self.key, self.json_path).read_snapshot()
+        if not os.path.exists(self.path):
+            return {}
+        return read_checkpoint(self.key, self.path)
+
+    def write_snapshot(self, vault):
+        write_checkpoint(vault, self.key, self.path)
+        if os.path.exists(self.json_path):
+            os.remove(self.json_path)  # El checkpoint ya lo sustituye
+
+    def open(self):
+        vault = self.read_snapshot()
+        tail = 0
+        for record in log_store.read_records(self.key):
+            if record["op"] == "put":
+                vault[record["name"]] = record["data"]
+            elif record["op"] == "delete":
+                vault.pop(record["name"], None)
+            tail += 1
+        if tail > CHECKPOINT_TAIL_MAX:
+            # La cola ha crecido (por ejemplo, tras varios cierres inesperados): se consolida
+            # para que el próximo arranque vuelva a aplicar solo unos pocos cambios
+            self.commit(vault)
+        return vault
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from cryptography.fernet import Fernet
+    from encryption import encrypt_container
+    from vault import Vault
+
+    key = Fernet.generate_key()
+    vault = {f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * 200, key) for i in range(100000)}
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            JsonStore(key).commit(vault)
+            json_size = os.path.getsize(DATA_FILE)
+            store = CheckpointStore(key)
+            store.commit(vault)
+            assert not os.path.exists(DATA_FILE), "El checkpoint debe sustituir a vault.json."
+            # Cola de cambios posteriores al checkpoint
+            for i in range(100):
+                name = f"contenedor-{i}"
+                vault[name] = encrypt_container(name, "y" * 200, key)
+                store.put(name, vault[name])
+            store.close()
+
+            start = time.perf_counter()
+            loaded = CheckpointStore(key).open()
+            checkpoint_time = time.perf_counter() - start
+            assert loaded == vault, "El checkpoint y su cola no reconstruyen el vault."
+            checkpoint_size = os.path.getsize(CHECKPOINT_FILE)
+            start = time.perf_counter()
+            Vault(loaded, key)
+            vault_time = time.perf_counter() - start
+
+            # El arranque anterior: vault.json y la misma cola
+            JsonStore(key).write_snapshot(loaded)
+            os.remove(CHECKPOINT_FILE)
+            start = time.perf_counter()
+            assert JsonStore(key).open() == vault
+            json_time = time.perf_counter() - start
+
+            print(f"Carga de {len(vault)} contenedores + 100 cambios en la cola:")
+            print(f"  vault.json: {json_time * 1000:7.0f} ms ({json_size} bytes)")
+            print(f"  checkpoint: {checkpoint_time * 1000:7.0f} ms ({checkpoint_size} bytes)")
+            print(f"  (construir el Vault: {vault_time * 1000:.1f} ms más en ambos casos)")
+        finally:
+            os.chdir(previous_dir)
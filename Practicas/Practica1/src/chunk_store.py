@@ -0,0 +1,285 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+from contextlib import contextmanager
+from cryptography.fernet import Fernet
+import safe_io
+from compression import compress_payload, decompress_payload
+
+CHUNKS_DIR = 'chunks'
+REFS_FILE = os.path.join(CHUNKS_DIR, 'refs.dat')
+
+CHUNK_THRESHOLD = 16 * 1024  # Contenidos más pequeños se cifran enteros, sin trocear
+MIN_CHUNK_SIZE = 2 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+BOUNDARY_MASK = (1 << 13) - 1  # Tamaño medio de fragmento de unos 8 KiB
+
+_gear_tables = {}
+_pending = {}  # (nombre, contenedor cifrado) -> fragmentos troceados al cifrar que aún no se han guardado
+
+def derive_subkey(key, label):
+    """
+    Deriva una subclave independiente a partir de la clave del vault.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - label (bytes): La etiqueta que identifica el uso de la subclave.
+
+    Returns:
+    - subkey (bytes): La subclave de 32 bytes.
+    """
+    return hmac.new(base64.urlsafe_b64decode(key), label, hashlib.sha256).digest()
+
+def gear_table(key):
+    """
+    Devuelve la tabla de la función hash rodante (Gear), derivada de la clave del vault para
+    que los cortes entre fragmentos no revelen información sobre el contenido.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - table (list): 256 valores de 64 bits, uno por cada valor de byte.
+    """
+    table = _gear_tables.get(key)
+    if table is None:
+        gear_key = derive_subkey(key, b"SecureBox-gear")
+        table = [int.from_bytes(hmac.new(gear_key, bytes([i]), hashlib.sha256).digest()[:8], 'big')
+                 for i in range(256)]
+        _gear_tables[key] = table
+    return table
+
+def split_chunks(data, key):
+    """
+    Divide los datos en fragmentos definidos por su contenido.
+
+    Los cortes se sitúan donde el hash rodante cumple la máscara, así que una inserción o
+    un borrado solo cambian los fragmentos cercanos y el resto se sigue pudiendo deduplicar.
+
+    Args:
+    - data (bytes): Los datos a dividir.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - chunks (list): Los fragmentos, en orden.
+    """
+    table = gear_table(key)
+    chunks = []
+    start = 0
+    h = 0
+    mask64 = (1 << 64) - 1
+    for i, byte in enumerate(data):
+        h = ((h << 1) + table[byte]) & mask64
+        size = i + 1 - start
+        if (size >= MIN_CHUNK_SIZE and not (h & BOUNDARY_MASK)) or size >= MAX_CHUNK_SIZE:
+            chunks.append(data[start:i + 1])
+            start = i + 1
+            h = 0
+    if start < len(data):
+        chunks.append(data[start:])
+    return chunks
+
+def chunk_id(chunk, key):
+    """
+    Calcula el identificador de un fragmento con un HMAC, de forma que fragmentos idénticos
+    comparten identificador sin que este permita adivinar su contenido.
+
+    Args:
+    - chunk (bytes): El fragmento.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - chunk_id (str): El identificador en hexadecimal.
+    """
+    return hmac.new(derive_subkey(key, b"SecureBox-chunk"), chunk, hashlib.sha256).hexdigest()
+
+def chunk_path(chunk_id):
+    """
+    Devuelve la ruta del archivo de un fragmento.
+
+    Args:
+    - chunk_id (str): El identificador del fragmento.
+
+    Returns:
+    - path (str): La ruta del archivo cifrado del fragmento.
+    """
+    return os.path.join(CHUNKS_DIR, chunk_id)
+
+def load_refs(key):
+    """
+    Carga la tabla cifrada de contadores de referencias de los fragmentos.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - refs (dict): Número de contenedores que usan cada fragmento.
+    """
+    if not os.path.exists(REFS_FILE):
+        return {}
+    with open(REFS_FILE, 'rb') as file:
+        return json.loads(Fernet(key).decrypt(file.read()))
+
+def save_refs(refs, key):
+    """
+    Guarda de forma atómica la tabla cifrada de contadores de referencias.
+
+    Args:
+    - refs (dict): Número de contenedores que usan cada fragmento.
+    - key (bytes): La clave Fernet del vault.
+    """
+    safe_io.atomic_write(REFS_FILE, Fernet(key).encrypt(json.dumps(refs).encode('utf-8')))
+
+def split_content(content, key):
+    """
+    Trocea un contenido e identifica sus fragmentos, sin escribir nada en disco.
+
+    Args:
+    - content (str): El contenido del contenedor.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - chunks (list): Las tuplas (identificador, fragmento), en orden.
+    """
+    return [(chunk_id(chunk, key), chunk) for chunk in split_chunks(content.encode('utf-8'), key)]
+
+def stage_chunks(name, encrypted_data, chunks):
+    """
+    Deja pendientes de guardar los fragmentos de un contenedor recién cifrado. Se escriben al
+    guardar el contenedor (ver `storing`) o se descartan al liberarlo sin haberlo guardado.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - encrypted_data (str): El contenedor cifrado que referencia los fragmentos.
+    - chunks (list): Las tuplas (identificador, fragmento) de `split_content`.
+    """
+    _pending[(name, encrypted_data)] = chunks
+
+def discard_pending(name, encrypted_data):
+    """
+    Descarta los fragmentos pendientes de un contenedor que no llegó a guardarse.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - encrypted_data (str): El contenedor cifrado.
+
+    Returns:
+    - bool: True si el contenedor tenía fragmentos pendientes (y no hay referencias que liberar).
+    """
+    return _pending.pop((name, encrypted_data), None) is not None
+
+def pending_in(vault):
+    """
+    Devuelve los contenedores del vault cuyos fragmentos aún no se han guardado.
+
+    Args:
+    - vault (dict): El vault.
+
+    Returns:
+    - entries (list): Las tuplas (nombre, contenedor cifrado).
+    """
+    return [(name, encrypted_data) for name, encrypted_data in _pending if vault.get(name) == encrypted_data]
+
+@contextmanager
+def storing(entries, key):
+    """
+    Guarda los fragmentos pendientes de los contenedores indicados alrededor de su guardado.
+
+    Los fragmentos nuevos se escriben comprimidos y cifrados antes de guardar los contenedores
+    (que no pueden referenciar fragmentos inexistentes), y las referencias se cuentan después,
+    solo si el guardado ha ido bien: si falla, se borran los fragmentos escritos y no queda
+    ninguna referencia de más.
+
+    Uso:
+        with chunk_store.storing([(name, vault[name])], key):
+            ...  # guardar los contenedores
+
+    Args:
+    - entries (list): Las tuplas (nombre, contenedor cifrado) que se van a guardar.
+    - key (bytes): La clave Fernet del vault.
+    """
+    staged = [(entry, _pending[entry]) for entry in entries if entry in _pending]
+    if not staged:
+        yield
+        return
+    os.makedirs(CHUNKS_DIR, exist_ok=True)
+    f = Fernet(key)
+    refs = load_refs(key)
+    written = []
+    for _, chunks in staged:
+        for cid, chunk in chunks:
+            if cid not in refs and cid not in written:
+                safe_io.atomic_write(chunk_path(cid), f.encrypt(compress_payload(chunk)))
+                written.append(cid)
+    try:
+        yield
+    except Exception:
+        for cid in written:
+            if os.path.exists(chunk_path(cid)):
+                os.remove(chunk_path(cid))
+        raise
+    for entry, chunks in staged:
+        for cid, _ in chunks:
+            refs[cid] = refs.get(cid, 0) + 1
+        _pending.pop(entry, None)
+    save_refs(refs, key)
+
+def pending_chunk(cid):
+    """
+    Busca un fragmento entre los pendientes de guardar.
+
+    Args:
+    - cid (str): El identificador del fragmento.
+
+    Returns:
+    - chunk (bytes): El fragmento, o None si no está pendiente.
+    """
+    for chunks in _pending.values():
+        for pending_cid, chunk in chunks:
+            if pending_cid == cid:
+                return chunk
+    return None
+
+def load_content(chunk_ids, key):
+    """
+    Reconstruye un contenido a partir de sus fragmentos.
+
+    Args:
+    - chunk_ids (list): Los identificadores de los fragmentos, en orden.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - content (str): El contenido original.
+    """
+    f = Fernet(key)
+    parts = []
+    for cid in chunk_ids:
+        if not os.path.exists(chunk_path(cid)):
+            chunk = pending_chunk(cid)  # Un contenedor cifrado que aún no se ha guardado
+            if chunk is not None:
+                parts.append(chunk)
+                continue
+        with open(chunk_path(cid), 'rb') as file:
+            parts.append(decompress_payload(f.decrypt(file.read())))
+    return b"".join(parts).decode('utf-8')
+
+def release_content(chunk_ids, key):
+    """
+    Decrementa las referencias de los fragmentos de un contenido y borra los que ya no usa nadie.
+
+    Args:
+    - chunk_ids (list): Los identificadores de los fragmentos.
+    - key (bytes): La clave Fernet del vault.
+    """
+    refs = load_refs(key)
+    for cid in chunk_ids:
+        count = refs.get(cid, 0) - 1
+        if count > 0:
+            refs[cid] = count
+        else:
+            refs.pop(cid, None)
+            if os.path.exists(chunk_path(cid)):
+                os.remove(chunk_path(cid))
+    save_refs(refs, key)
@@ -0,0 +1,200 @@
+import threading
+import time
+import safe_io
+import storage
+
+MAX_SPACE_AMPLIFICATION = 2.0  # Se compacta cuando el vault ocupa en disco más del doble que sus datos vivos
+MIN_GARBAGE_BYTES = 256 * 1024  # ... y la basura supera este tamaño (en vaults pequeños no compensa)
+CHECK_INTERVAL_SECONDS = 10.0  # Cada cuánto se mide la amplificación
+COMPACTION_MIN_INTERVAL_SECONDS = 60.0  # Tiempo mínimo entre dos compactaciones
+COMPACTION_MAX_RATE = 8 * 1024 * 1024  # Bytes por segundo que puede escribir una compactación
+
+class Compactor:
+    def __init__(self, vault, key, lock=None, interval=CHECK_INTERVAL_SECONDS,
+                 max_amplification=MAX_SPACE_AMPLIFICATION, min_garbage=MIN_GARBAGE_BYTES,
+                 min_interval=COMPACTION_MIN_INTERVAL_SECONDS, max_rate=COMPACTION_MAX_RATE):
+        """
+        Inicializa el compactador del vault: mide periódicamente la amplificación de espacio del
+        almacén (ver `VaultStore.space_usage`) y, cuando supera el límite, reescribe los datos
+        vivos en un archivo nuevo en segundo plano, descartando las versiones sustituidas y las
+        marcas de borrado.
+
+        Args:
+            vault (Vault): El vault en memoria.
+            key (bytes): La clave Fernet del vault.
+            lock (threading.RLock): El bloqueo que se mantiene mientras se modifica el vault
+                (el de `WriteBehind`); se crea uno si no se indica.
+            interval (float): Segundos entre mediciones.
+            max_amplification (float): Amplificación a partir de la cual se compacta.
+            min_garbage (int): Bytes de basura mínimos para compactar.
+            min_interval (float): Segundos mínimos entre dos compactaciones.
+            max_rate (float): Bytes por segundo que puede escribir la compactación, o None para no limitarla.
+
+        El vault solo se bloquea para medirlo y copiar sus datos vivos; la escritura, limitada
+        en velocidad, se hace sin bloquearlo, y los cambios que llegan mientras tanto van a un log nuevo.
+        """
+        self.vault = vault
+        self.key = key
+        self.lock = lock if lock is not None else threading.RLock()
+        self.interval = interval
+        self.max_amplification = max_amplification
+        self.min_garbage = min_garbage
+        self.min_interval = min_interval
+        self.max_rate = max_rate
+        self.amplification = 1.0  # Última amplificación medida
+        self.compactions = 0
+        self.reclaimed_bytes = 0
+        self.last_compaction = 0.0
+        self.running = False
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.worker = None  # Hilo de la última compactación lanzada con `check(background=True)`
+
+    def measure(self, store):
+        """
+        Mide la amplificación de espacio del almacén (hay que llamarlo con el vault bloqueado).
+
+        Args:
+            store (VaultStore): El almacén del vault.
+
+        Returns:
+            disk (int): Bytes en disco.
+            garbage (int): Bytes que no corresponden a datos vivos.
+        """
+        disk, live = store.space_usage(self.vault)
+        self.amplification = disk / live if live else 1.0
+        return disk, max(disk - live, 0)
+
+    def check(self, background=False):
+        """
+        Mide la amplificación y, si hace falta y lo permite el intervalo mínimo, compacta.
+
+        Args:
+            background (bool): Si la escritura se hace en un hilo nuevo (desde la interfaz
+                gráfica) o en el hilo actual (el del propio compactador).
+
+        Returns:
+            bool: True si se ha iniciado una compactación.
+        """
+        with self.lock:
+            if self.running or time.monotonic() - self.last_compaction < self.min_interval:
+                return False
+            store = storage.open_store(self.key)
+            disk, garbage = self.measure(store)
+            if self.amplification <= self.max_amplification or garbage < self.min_garbage:
+                return False
+            live = dict(self.vault)
+            store.begin_compaction()
+            self.running = True
+        if background:
+            self.worker = threading.Thread(target=self.compact, args=(store, live, disk), daemon=True)
+            self.worker.start()
+        else:
+            self.compact(store, live, disk)
+        return True
+
+    def compact(self, store, live, disk_before):
+        """
+        Reescribe los datos vivos con la velocidad de escritura limitada.
+
+        Args:
+            store (VaultStore): El almacén del vault, ya preparado con `begin_compaction`.
+            live (dict): La copia de los datos vivos.
+            disk_before (int): Los bytes en disco antes de compactar.
+        """
+        try:
+            with safe_io.throttle(self.max_rate):
+                store.compact(live)
+            disk_after, _ = store.space_usage(live)
+            self.compactions += 1
+            self.reclaimed_bytes += max(disk_before - disk_after, 0)
+        except Exception as e:
+            print(f"Error al compactar el vault: {e}")
+        finally:
+            self.last_compaction = time.monotonic()
+            self.running = False
+
+    def start(self):
+        """
+        Arranca la comprobación periódica en un hilo de fondo.
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """
+        Bucle del hilo de fondo: mide y compacta cada `interval` segundos hasta `stop`.
+        """
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error al comprobar la compactación del vault: {e}")
+
+    def stop(self):
+        """
+        Detiene el hilo de fondo, esperando a que termine la compactación en curso (también la
+        lanzada en segundo plano desde la interfaz gráfica).
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from cryptography.fernet import Fernet
+    from encryption import encrypt_container
+    from vault import Vault
+    import log_store
+
+    key = Fernet.generate_key()
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            vault = Vault({f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * 200, key) for i in range(2000)}, key)
+            storage.save_data(vault, key)
+            compactor = Compactor(vault, key, min_interval=0, max_rate=2 * 1024 * 1024)
+
+            # Ediciones y borrados repetidos: el log crece con versiones sustituidas y marcas de borrado
+            for round_ in range(5):
+                for i in range(1000):
+                    name = f"contenedor-{i}"
+                    with compactor.lock:
+                        vault[name] = encrypt_container(name, f"{round_}" * 200, key)
+                        storage.save_container(vault, key, name)
+            for i in range(1000, 1500):
+                with compactor.lock:
+                    del vault[f"contenedor-{i}"]
+                    storage.remove_container(key, f"contenedor-{i}")
+            store = storage.open_store(key)
+            disk_before, _ = compactor.measure(store)
+            amplification_before = compactor.amplification
+            # (con `get`: abrir el vault con una cola tan larga ya la consolidaría)
+            assert store.get("contenedor-1000") is None, "Las marcas de borrado no se han guardado."
+
+            # La compactación corre en segundo plano mientras siguen llegando cambios
+            assert compactor.check(background=True)
+            for i in range(1500, 1510):
+                with compactor.lock:
+                    del vault[f"contenedor-{i}"]
+                    storage.remove_container(key, f"contenedor-{i}")
+            while compactor.running:
+                time.sleep(0.01)
+            disk_after, _ = compactor.measure(storage.open_store(key))
+            assert storage.load_data(key) == dict(vault), "La compactación ha perdido cambios."
+            assert not os.path.exists(log_store.ROTATED_LOG_FILE)
+            assert not compactor.check(), "Tras compactar no debe quedar basura que compactar."
+            print(f"Amplificación {amplification_before:.2f} -> {compactor.amplification:.2f}, "
+                  f"{disk_before} -> {disk_after} bytes en disco")
+        finally:
+            log_store.close_log()
+            os.chdir(previous_dir)
@@ -0,0 +1,85 @@
+import lzma
+import zlib
+
+# Códec de compresión de los vaults nuevos: "zlib" (rápido), "lzma" (más compacto y más lento) o None
+# para desactivarla. Cada vault guarda el suyo en su cabecera (ver `kdf`), que lo aplica al desbloquearlo.
+DEFAULT_CODEC = "zlib"
+COMPRESSION_MIN_SIZE = 256  # Por debajo de este tamaño no compensa comprimir
+
+MARKER = b"\x01"  # Primer byte de un texto con cabecera de compresión (JSON nunca empieza así)
+CODEC_IDS = {None: 0, "zlib": 1, "lzma": 2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+_codec = DEFAULT_CODEC  # Códec del vault abierto
+
+def set_codec(codec):
+    """
+    Elige el códec con el que se comprimen los datos a partir de ahora. Lo que ya está guardado
+    lleva su códec en la cabecera de cada registro y se sigue descomprimiendo igual.
+
+    Args:
+    - codec (str): "zlib", "lzma" o None para no comprimir.
+    """
+    global _codec
+    if codec not in CODEC_IDS:
+        raise ValueError(f"Códec de compresión desconocido: {codec}")
+    _codec = codec
+
+def compress_payload(data):
+    """
+    Comprime los datos antes de cifrarlos, si compensa.
+
+    La compresión se omite para datos pequeños o que no se reducen (por ejemplo, datos ya
+    comprimidos o aleatorios). El códec utilizado queda registrado en una cabecera de dos
+    bytes, de modo que `decompress_payload` sabe siempre cómo recuperar el original.
+
+    Args:
+    - data (bytes): Los datos en claro.
+
+    Returns:
+    - payload (bytes): Los datos listos para cifrar.
+    """
+    if _codec and len(data) >= COMPRESSION_MIN_SIZE:
+        if _codec == "lzma":
+            compressed = lzma.compress(data)
+        else:
+            compressed = zlib.compress(data)
+        if len(compressed) + 2 < len(data):
+            return MARKER + bytes([CODEC_IDS[_codec]]) + compressed
+    if data.startswith(MARKER):
+        return MARKER + bytes([CODEC_IDS[None]]) + data  # Evita confundirlo con una cabecera
+    return data
+
+def decompress_payload(payload):
+    """
+    Recupera los datos originales a partir de lo producido por `compress_payload`.
+
+    Args:
+    - payload (bytes): Los datos descifrados.
+
+    Returns:
+    - data (bytes): Los datos en claro.
+    """
+    if not payload.startswith(MARKER):
+        return payload  # Datos sin cabecera (guardados antes de existir la compresión)
+    codec = CODEC_NAMES.get(payload[1])
+    body = payload[2:]
+    if codec == "zlib":
+        return zlib.decompress(body)
+    if codec == "lzma":
+        return lzma.decompress(body)
+    if payload[1] == CODEC_IDS[None]:
+        return body
+    raise ValueError(f"Códec de compresión desconocido: {payload[1]}")
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import os
+    runbook = "\n".join(f"paso {i}: ssh admin@db-{i % 8}.prod.interna && systemctl restart postgresql" for i in range(400))
+    for sample_name, sample in (("texto", runbook.encode('utf-8')), ("aleatorio", os.urandom(16000)), ("corto", b'{"content": "x"}')):
+        for codec in ("zlib", "lzma"):
+            set_codec(codec)
+            payload = compress_payload(sample)
+            assert decompress_payload(payload) == sample, "La compresión no es reversible."
+            print(f"{sample_name:10} {codec:5}: {len(sample):>6} -> {len(payload):>6} bytes")
@@ -1,4 +1,11 @@
+import os
 import storage
+import file_containers
+import history
+import name_index
+import search_index
+import metadata
+import time
 from encryption import *
 import json
 from getpass import getpass
@@ -15,13 +22,19 @@ def create_container(vault, key):
     
     La función solicita al usuario el nombre y contenido del nuevo contenedor,
     cifra esta información usando la clave proporcionada y actualiza el vault
-    con el contenedor cifrado. Finalmente, guarda los cambios en el almacenamiento.
+    con el contenedor cifrado. Finalmente, añade el contenedor al log de cambios del almacenamiento.
     """
     name = input("Nombre del contenedor: ")
     content = input("Contenido del contenedor: ")
     encrypted_content = encrypt_container(name, content, key)
+    previous = vault.get(name)
     vault[name] = encrypted_content
-    storage.save_data(vault, key)
+    # El valor anterior se libera después de guardar el nuevo: si comparten fragmentos, nunca se quedan sin referencias
+    if storage.save_container(vault, key, name) and previous is not None:
+        release_container(previous, key, name)
+    history.record_revision(name, content, key)
+    search_index.index_container(name, content, key)
+    metadata.update_metadata(name, key)
 
 def edit_container(vault, key):
     """
@@ -32,41 +45,86 @@ def edit_container(vault, key):
     - key (bytes): La clave de cifrado usada para cifrar el contenedor modificado.
     
     Si el contenedor existe, solicita al usuario el nuevo contenido,
-    actualiza el contenedor con este contenido cifrado y guarda los cambios.
+    actualiza el contenedor con este contenido cifrado y guarda los cambios,
+    conservando el contenido anterior en el historial de revisiones.
     De lo contrario, informa que el contenedor no fue encontrado.
     """
     name = input("Nombre del contenedor a editar: ")
     if name in vault:
         content = input("Nuevo contenido del contenedor: ")
-        encrypted_content = encrypt_container(name, content, key)
-        vault[name] = encrypted_content
-        storage.save_data(vault, key)
+        replace_content(vault, key, name, content)
     else:
         print("Contenedor no encontrado.")
 
-def delete_container(vault, name):
+def replace_content(vault, key, name, content):
+    """
+    Sustituye el contenido de un contenedor existente y guarda la nueva revisión en su historial.
+    
+    Args:
+    - vault (Vault): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado usada para cifrar el contenedor.
+    - name (str): El nombre del contenedor.
+    - content (str): El nuevo contenido.
+    """
+    previous_content = vault.get_content(name)
+    encrypted_content = encrypt_container(name, content, key)
+    previous = vault[name]
+    vault[name] = encrypted_content
+    if storage.save_container(vault, key, name):
+        release_container(previous, key, name)
+    history.record_revision(name, content, key, previous_content)
+    search_index.index_container(name, content, key)
+    metadata.update_metadata(name, key)
+
+def delete_container(vault, key, name):
     """
     Elimina un contenedor específico del vault.
     
     Args:
     - vault (dict): El vault del cual se eliminará el contenedor.
+    - key (bytes): La clave de cifrado (necesaria para liberar sus fragmentos deduplicados).
     - name (str): El nombre del contenedor a eliminar.
     
-    Si el contenedor existe, se elimina del vault y se muestran cambios guardados.
+    Si el contenedor existe, se elimina del vault y el borrado se guarda enseguida (en el log
+    de cambios, una marca de borrado que persiste hasta la siguiente copia completa).
     De lo contrario, se informa que el contenedor no se encontró.
     """
     if name in vault:
-        del vault[name]
+        previous = vault.pop(name)
+        storage.remove_container(key, name)
+        release_container(previous, key, name)
+        history.delete_history(name, key)
+        search_index.remove_container(name, key)
+        metadata.remove_metadata(name, key)
         print(f"Contenedor '{name}' borrado exitosamente.")
     else:
         print("Contenedor no encontrado.")
 
+def renew_container_key(vault, key, name):
+    """
+    Vuelve a cifrar un contenedor con una clave de datos nueva (ver `encryption.rekey_container`),
+    sin cambiar su contenido ni tocar el resto del vault.
+
+    Args:
+    - vault (Vault): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado del vault.
+    - name (str): El nombre del contenedor.
+
+    Returns:
+    - bool: True si el contenedor existe y se ha vuelto a cifrar.
+    """
+    if name not in vault:
+        return False
+    vault[name] = rekey_container(vault[name], key, name)
+    storage.save_container(vault, key, name)
+    return True
+
 def view_container(vault, key, name):
     """
     Muestra el contenido de un contenedor específico dentro del vault.
     
     Args:
-    - vault (dict): El vault que contiene el contenedor.
+    - vault (Vault): El vault que contiene el contenedor.
     - key (bytes): La clave de cifrado usada para descifrar el contenedor.
     - name (str): El nombre del contenedor a visualizar.
     
@@ -75,37 +133,182 @@ def view_container(vault, key, name):
     """
     # Verifica si el nombre del contenedor existe en el vault
     if name in vault:
-        encrypted_data_base64 = vault[name]
-        # Decodifica los datos cifrados de Base64 a bytes
-        encrypted_data_bytes = base64.urlsafe_b64decode(encrypted_data_base64)
-        # Crea una instancia de Fernet con la clave proporcionada
-        f = Fernet(key)
-        # Descifra los datos
-        decrypted_data_bytes = f.decrypt(encrypted_data_bytes)
-        # Convierte los datos descifrados a una cadena UTF-8
-        decrypted_data = decrypted_data_bytes.decode('utf-8')
-        
-        # Asume que los datos descifrados son una cadena JSON que contiene "content" y "signature"
-        container_data = json.loads(decrypted_data)
-        content = container_data["content"]
-        
+        # Descifra únicamente este contenedor, o lo toma de la caché si ya se visualizó
+        content = vault.get_content(name)
         print(f"Contenido del contenedor '{name}': {content}")
     else:
         print("El contenedor especificado no existe.")
         
-def list_containers(vault):
+def list_containers(vault, key):
     """
-    Lista los nombres de todos los contenedores existentes dentro del vault.
+    Lista, en orden alfabético y por páginas, los nombres de los contenedores del vault.
     
     Args:
     - vault (dict): El vault del cual listar los contenedores.
+    - key (bytes): La clave de cifrado del índice de nombres.
     
-    Imprime los nombres de todos los contenedores disponibles.
+    Solicita un prefijo opcional (por ejemplo, "prod/db/") y muestra los nombres que empiezan
+    por él de `LIST_PAGE_SIZE` en `LIST_PAGE_SIZE`, consultando solo las páginas del índice necesarias.
     Si no hay contenedores, informa que no hay contenedores disponibles.
     """
-    if vault:
-        print("Contenedores disponibles:")
-        for name in vault.keys():
+    if not vault:
+        print("No hay contenedores disponibles.")
+        return
+    name_index.ensure_index(vault, key)
+    prefix = input("Prefijo de los contenedores (vacío para todos): ")
+    names, cursor = name_index.query(key, prefix)
+    if not names:
+        print("No hay contenedores con ese prefijo.")
+        return
+    print("Contenedores disponibles:")
+    while True:
+        for name in names:
+            print(f"- {name}")
+        if cursor is None or input("Pulsa Enter para ver más o 'q' para terminar: ").lower() == "q":
+            break
+        names, cursor = name_index.query(key, prefix, after=cursor)
+
+def attach_file(vault, key):
+    """
+    Crea un contenedor de archivo a partir de un archivo del disco.
+    
+    Args:
+    - vault (dict): El vault en el que se almacena el contenedor.
+    - key (bytes): La clave de cifrado usada para cifrar el contenedor.
+    
+    El archivo se cifra por segmentos directamente desde el disco, de modo que
+    la memoria utilizada no depende de su tamaño.
+    """
+    name = input("Nombre del contenedor: ")
+    source_path = input("Ruta del archivo a adjuntar: ")
+    if not os.path.isfile(source_path):
+        print("El archivo indicado no existe.")
+        return
+    file_info = file_containers.import_file(source_path)
+    encrypted_content = encrypt_file_container(name, file_info, key)
+    previous = vault.get(name)
+    vault[name] = encrypted_content
+    if storage.save_container(vault, key, name) and previous is not None:
+        release_container(previous, key, name)
+    search_index.index_container(name, file_info["source_name"], key)  # De los archivos solo se indexa su nombre
+    metadata.update_metadata(name, key)
+
+def export_attached_file(vault, key):
+    """
+    Descifra el archivo de un contenedor de archivo y lo guarda en el disco.
+    
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado usada para descifrar el contenedor.
+    """
+    name = input("Nombre del contenedor de archivo: ")
+    if name not in vault:
+        print("El contenedor especificado no existe.")
+        return
+    container_data = read_container_data(vault[name], key, name)
+    if "file" not in container_data:
+        print("El contenedor especificado no contiene un archivo.")
+        return
+    destination_path = input("Ruta donde guardar el archivo: ")
+    file_containers.export_file(container_data["file"], destination_path)
+    print(f"Archivo exportado a '{destination_path}'.")
+
+def restore_revision(vault, key):
+    """
+    Muestra el historial de revisiones de un contenedor y permite restaurar una de ellas.
+    
+    Args:
+    - vault (Vault): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado usada para descifrar y cifrar el contenedor.
+    
+    La revisión restaurada se guarda como una revisión nueva, de modo que no se pierde ninguna.
+    """
+    name = input("Nombre del contenedor: ")
+    if name not in vault:
+        print("El contenedor especificado no existe.")
+        return
+    revisions = history.list_revisions(name, key)
+    if not revisions:
+        print("El contenedor no tiene historial de revisiones.")
+        return
+    print(f"Revisiones de '{name}':")
+    for rev, timestamp in revisions:
+        print(f"- {rev}: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}")
+    choice = input("Revisión a restaurar (vacío para cancelar): ")
+    if not choice:
+        return
+    content = history.get_revision(name, int(choice), key) if choice.isdigit() else None
+    if content is None:
+        print("La revisión indicada no existe.")
+        return
+    replace_content(vault, key, name, content)
+    print(f"Revisión {choice} de '{name}' restaurada.")
+
+def search_containers(vault, key):
+    """
+    Busca los contenedores cuyo contenido incluye todos los términos indicados.
+    
+    Args:
+    - vault (Vault): El vault en el que buscar.
+    - key (bytes): La clave de cifrado del índice de búsqueda.
+    
+    La búsqueda se resuelve con el índice cifrado, sin descifrar los contenedores.
+    """
+    query = input("Términos a buscar (por ejemplo, un nombre de máquina o de usuario): ")
+    search_index.ensure_index(vault, key)
+    names = search_index.search(query, key)
+    if names:
+        print("Contenedores encontrados:")
+        for name in names:
             print(f"- {name}")
     else:
-        print("No hay contenedores disponibles.")
+        print("Ningún contenedor contiene esos términos.")
+
+def edit_metadata(vault, key):
+    """
+    Permite cambiar las etiquetas, el entorno y el propietario de un contenedor.
+    
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado de la tabla de metadatos.
+    
+    Un campo que se deja vacío conserva su valor; "-" lo borra.
+    """
+    name = input("Nombre del contenedor: ")
+    if name not in vault:
+        print("El contenedor especificado no existe.")
+        return
+    current = metadata.get_metadata(name, key) or {}
+    print(f"Metadatos actuales: etiquetas {', '.join(current.get('tags', [])) or '-'}, "
+          f"entorno {current.get('env', '-')}, propietario {current.get('owner', '-')}")
+    fields = {}
+    tags = input("Etiquetas separadas por comas: ")
+    if tags:
+        fields["tags"] = None if tags == "-" else [tag.strip() for tag in tags.split(",") if tag.strip()]
+    for field, prompt in (("env", "Entorno (por ejemplo, prod): "), ("owner", "Propietario: ")):
+        value = input(prompt)
+        if value:
+            fields[field] = None if value == "-" else value
+    metadata.update_metadata(name, key, touch=False, **fields)
+    print(f"Metadatos de '{name}' actualizados.")
+
+def filter_containers(vault, key):
+    """
+    Lista los contenedores que cumplen unos filtros de metadatos, sin descifrar ningún contenedor.
+    
+    Args:
+    - vault (dict): El vault del cual listar los contenedores.
+    - key (bytes): La clave de cifrado de la tabla de metadatos.
+    """
+    tags = [tag.strip() for tag in input("Etiquetas (separadas por comas, vacío para cualquiera): ").split(",") if tag.strip()]
+    env = input("Entorno (vacío para cualquiera): ") or None
+    owner = input("Propietario (vacío para cualquiera): ") or None
+    days = input("Modificados en los últimos N días (vacío para cualquier fecha): ")
+    modified_since = time.time() - int(days) * 86400 if days.isdigit() else None
+    names = [name for name in metadata.filter_containers(key, tags, env, owner, modified_since) if name in vault]
+    if names:
+        print("Contenedores encontrados:")
+        for name in names:
+            print(f"- {name}")
+    else:
+        print("Ningún contenedor cumple esos filtros.")
@@ -1,7 +1,13 @@
 from tkinter import simpledialog, messagebox
 import json
-from encryption import encrypt_container, decrypt_data
+import time
+from encryption import encrypt_container, encrypt_file_container, read_container_data, release_container
 import storage
+import file_containers
+import history
+import name_index
+import search_index
+import metadata
 
 def create_container_ui(vault, key, name, content):
     """
@@ -14,11 +20,16 @@ def create_container_ui(vault, key, name, content):
     - content (str): El contenido del nuevo contenedor.
     
     La función cifra el contenido utilizando la clave proporcionada y actualiza el vault
-    con el nuevo contenedor cifrado. Posteriormente, guarda los cambios realizados en el almacenamiento.
+    con el nuevo contenedor cifrado. Posteriormente, añade únicamente ese contenedor al log de cambios.
     """
     encrypted_content = encrypt_container(name, content, key)
+    previous = vault.get(name)
     vault[name] = encrypted_content
-    storage.save_data(vault, key)
+    if storage.save_container(vault, key, name) and previous is not None:
+        release_container(previous, key, name)
+    history.record_revision(name, content, key)
+    search_index.index_container(name, content, key)
+    metadata.update_metadata(name, key)
 
 def edit_container_ui(vault, key, name, content):
     """
@@ -30,13 +41,20 @@ def edit_container_ui(vault, key, name, content):
     - name (str): El nombre del contenedor a editar.
     - content (str): El nuevo contenido del contenedor.
     
-    Si el contenedor existe, actualiza su contenido con el nuevo contenido cifrado y guarda los cambios.
+    Si el contenedor existe, actualiza su contenido con el nuevo contenido cifrado y guarda los cambios,
+    conservando el contenido anterior en el historial de revisiones.
     Si no se encuentra el contenedor, muestra un mensaje de error.
     """
     if name in vault:
+        previous_content = vault.get_content(name)
         encrypted_content = encrypt_container(name, content, key)
+        previous = vault[name]
         vault[name] = encrypted_content
-        storage.save_data(vault, key)
+        if storage.save_container(vault, key, name):
+            release_container(previous, key, name)
+        history.record_revision(name, content, key, previous_content)
+        search_index.index_container(name, content, key)
+        metadata.update_metadata(name, key)
     else:
         messagebox.showerror("Error", "Contenedor no encontrado.")
 
@@ -46,15 +64,19 @@ def delete_container_ui(vault, key, name):
     
     Args:
     - vault (dict): El vault del cual se eliminará el contenedor.
-    - key (bytes): La clave de cifrado (necesaria para guardar los cambios en el almacenamiento).
+    - key (bytes): La clave de cifrado (necesaria para guardar los cambios y liberar sus fragmentos deduplicados).
     - name (str): El nombre del contenedor a eliminar.
     
-    Si el contenedor existe, se elimina del vault y se guardan los cambios.
+    Si el contenedor existe, se elimina del vault y se registra el borrado en el log de cambios.
     Si no se encuentra el contenedor, muestra un mensaje de error.
     """
     if name in vault:
-        del vault[name]
-        storage.save_data(vault, key)
+        previous = vault.pop(name)
+        storage.remove_container(key, name)
+        release_container(previous, key, name)
+        history.delete_history(name, key)
+        search_index.remove_container(name, key)
+        metadata.remove_metadata(name, key)
     else:
         messagebox.showerror("Error", "Contenedor no encontrado.")
 
@@ -63,7 +85,7 @@ def view_container_ui(vault, key, name):
     Muestra el contenido de un contenedor específico del vault a través de la interfaz gráfica.
     
     Args:
-    - vault (dict): El vault que contiene el contenedor a visualizar.
+    - vault (Vault): El vault que contiene el contenedor a visualizar.
     - key (bytes): La clave de cifrado utilizada para descifrar el contenido del contenedor.
     - name (str): El nombre del contenedor cuyo contenido se desea visualizar.
     
@@ -71,26 +93,176 @@ def view_container_ui(vault, key, name):
     Si no se encuentra el contenedor, muestra un mensaje de error.
     """
     if name in vault:
-        encrypted_data = vault[name]
-        decrypted_data = decrypt_data(encrypted_data, key)
-        container_data = json.loads(decrypted_data)
-        content = container_data["content"]
+        content = vault.get_content(name)  # Descifra solo si no está en la caché
         messagebox.showinfo("Contenedor", f"Contenido del contenedor '{name}':\n{content}")
     else:
         messagebox.showerror("Error", "Contenedor no encontrado.")
 
-def list_containers_ui(vault):
+def list_containers_ui(vault, key, prefix="", after=None):
     """
-    Lista todos los nombres de los contenedores existentes en el vault a través de la interfaz gráfica.
+    Lista una página de nombres de contenedores, en orden alfabético, a través de la interfaz gráfica.
     
     Args:
     - vault (dict): El vault del cual se listarán los contenedores.
+    - key (bytes): La clave de cifrado del índice de nombres.
+    - prefix (str): Prefijo que deben tener los nombres (vacío para todos).
+    - after (str): Cursor devuelto por la página anterior, o None para la primera.
     
-    Muestra los nombres de todos los contenedores disponibles en una ventana de mensaje.
+    Returns:
+    - cursor (str): El cursor de la página siguiente, o None si no hay más.
+    
+    Muestra los nombres de la página en una ventana de mensaje.
     Si no hay contenedores disponibles, muestra un mensaje informativo.
     """
-    if vault:
-        containers_list = "\n".join(vault.keys())
-        messagebox.showinfo("Contenedores disponibles", containers_list)
-    else:
+    if not vault:
         messagebox.showinfo("Información", "No hay contenedores disponibles.")
+        return None
+    name_index.ensure_index(vault, key)
+    names, cursor = name_index.query(key, prefix, after=after)
+    if names:
+        messagebox.showinfo("Contenedores disponibles", "\n".join(names))
+    else:
+        messagebox.showinfo("Información", "No hay contenedores con ese prefijo.")
+    return cursor
+
+def attach_file_ui(vault, key, name, source_path):
+    """
+    Crea un contenedor de archivo a partir de un archivo del disco a través de la interfaz gráfica.
+    
+    Args:
+    - vault (dict): El vault en el que se almacenará el contenedor.
+    - key (bytes): La clave de cifrado utilizada para cifrar el contenedor.
+    - name (str): El nombre del nuevo contenedor.
+    - source_path (str): La ruta del archivo a adjuntar.
+    
+    El archivo se cifra por segmentos directamente desde el disco, de modo que
+    la memoria utilizada no depende de su tamaño.
+    """
+    file_info = file_containers.import_file(source_path)
+    encrypted_content = encrypt_file_container(name, file_info, key)
+    previous = vault.get(name)
+    vault[name] = encrypted_content
+    if storage.save_container(vault, key, name) and previous is not None:
+        release_container(previous, key, name)
+    search_index.index_container(name, file_info["source_name"], key)  # De los archivos solo se indexa su nombre
+    metadata.update_metadata(name, key)
+
+def export_file_ui(vault, key, name, destination_path):
+    """
+    Descifra el archivo de un contenedor de archivo y lo guarda en el disco a través de la interfaz gráfica.
+    
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado utilizada para descifrar el contenedor.
+    - name (str): El nombre del contenedor de archivo.
+    - destination_path (str): La ruta donde se guardará el archivo descifrado.
+    
+    Si el contenedor no existe o no contiene un archivo, muestra un mensaje de error.
+    """
+    if name not in vault:
+        messagebox.showerror("Error", "Contenedor no encontrado.")
+        return
+    container_data = read_container_data(vault[name], key, name)
+    if "file" not in container_data:
+        messagebox.showerror("Error", "El contenedor no contiene un archivo.")
+        return
+    file_containers.export_file(container_data["file"], destination_path)
+    messagebox.showinfo("Información", f"Archivo exportado a '{destination_path}'.")
+
+def list_revisions_ui(vault, key, name):
+    """
+    Muestra el historial de revisiones de un contenedor a través de la interfaz gráfica.
+    
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado del vault.
+    - name (str): El nombre del contenedor.
+    
+    Returns:
+    - revisions (list): Las revisiones del contenedor, para que el usuario elija cuál restaurar.
+    """
+    if name not in vault:
+        messagebox.showerror("Error", "Contenedor no encontrado.")
+        return []
+    revisions = history.list_revisions(name, key)
+    if revisions:
+        lines = [f"{rev}: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}" for rev, timestamp in revisions]
+        messagebox.showinfo("Historial", f"Revisiones de '{name}':\n" + "\n".join(lines))
+    else:
+        messagebox.showinfo("Historial", "El contenedor no tiene historial de revisiones.")
+    return revisions
+
+def restore_revision_ui(vault, key, name, rev):
+    """
+    Restaura una revisión anterior de un contenedor a través de la interfaz gráfica.
+    
+    Args:
+    - vault (Vault): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado del vault.
+    - name (str): El nombre del contenedor.
+    - rev (int): El número de la revisión a restaurar.
+    
+    La revisión restaurada se guarda como una revisión nueva, de modo que no se pierde ninguna.
+    """
+    content = history.get_revision(name, rev, key)
+    if content is None:
+        messagebox.showerror("Error", "La revisión indicada no existe.")
+        return
+    edit_container_ui(vault, key, name, content)
+    messagebox.showinfo("Información", f"Revisión {rev} de '{name}' restaurada.")
+
+def search_containers_ui(vault, key, query):
+    """
+    Busca los contenedores cuyo contenido incluye todos los términos indicados, a través de la interfaz gráfica.
+    
+    Args:
+    - vault (Vault): El vault en el que buscar.
+    - key (bytes): La clave de cifrado del índice de búsqueda.
+    - query (str): Los términos a buscar.
+    
+    La búsqueda se resuelve con el índice cifrado, sin descifrar los contenedores.
+    """
+    search_index.ensure_index(vault, key)
+    names = search_index.search(query, key)
+    if names:
+        messagebox.showinfo("Búsqueda", "Contenedores encontrados:\n" + "\n".join(names))
+    else:
+        messagebox.showinfo("Búsqueda", "Ningún contenedor contiene esos términos.")
+
+def edit_metadata_ui(vault, key, name, tags=None, env=None, owner=None):
+    """
+    Cambia las etiquetas, el entorno y el propietario de un contenedor a través de la interfaz gráfica.
+    
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave de cifrado de la tabla de metadatos.
+    - name (str): El nombre del contenedor.
+    - tags (list): Las nuevas etiquetas, o None para conservarlas.
+    - env (str): El nuevo entorno, o None para conservarlo.
+    - owner (str): El nuevo propietario, o None para conservarlo.
+    """
+    if name not in vault:
+        messagebox.showerror("Error", "Contenedor no encontrado.")
+        return
+    fields = {field: value for field, value in (("tags", tags), ("env", env), ("owner", owner)) if value is not None}
+    metadata.update_metadata(name, key, touch=False, **fields)
+    messagebox.showinfo("Información", f"Metadatos de '{name}' actualizados.")
+
+def filter_containers_ui(vault, key, tags=(), env=None, owner=None, days=None):
+    """
+    Muestra los contenedores que cumplen unos filtros de metadatos, sin descifrar ningún contenedor.
+    
+    Args:
+    - vault (dict): El vault del cual listar los contenedores.
+    - key (bytes): La clave de cifrado de la tabla de metadatos.
+    - tags (iterable): Etiquetas que deben tener todos.
+    - env (str): Entorno, o None para cualquiera.
+    - owner (str): Propietario, o None para cualquiera.
+    - days (int): Solo los modificados en los últimos `days` días, o None para cualquier fecha.
+    """
+    modified_since = time.time() - days * 86400 if days is not None else None
+    names = [name for name in metadata.filter_containers(key, tags, env, owner, modified_since) if name in vault]
+    if names:
+        messagebox.showinfo("Contenedores encontrados", "\n".join(names))
+    else:
+        messagebox.showinfo("Información", "Ningún contenedor cumple esos filtros.")
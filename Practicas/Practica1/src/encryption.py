@@ -1,14 +1,30 @@
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
 import os
 import base64
 from hashlib import sha256
 import json
-from tkinter import simpledialog, Tk
+import kdf
+import chunk_store
+import file_containers
+from compression import compress_payload, decompress_payload
 
 SALT_FILE = 'salt.key'
+ENVELOPE_MAGIC = b"SBXE"  # Contenedores cifrados con su propia clave de datos (ver `seal_container`)
+WRAPPED_KEY_LENGTH = 40  # Clave de datos de 32 bytes envuelta con AES Key Wrap (RFC 3394)
+NONCE_LENGTH = 12
+
+# Conjuntos de cifrado de los contenedores: el identificador va en cada sobre, tras el número
+# mágico, así que un vault puede mezclarlos y los contenedores antiguos se siguen abriendo
+SUITE_FERNET = 1  # Token Fernet: AES-128-CBC + HMAC-SHA256, con la firma SHA-256 dentro de los datos
+SUITE_AES_GCM = 2  # AES-256-GCM, con el nombre del contenedor como datos asociados
+SUITE_CHACHA20_POLY1305 = 3  # ChaCha20-Poly1305 (más rápido sin AES por hardware), también con el nombre
+AEAD_SUITES = {SUITE_AES_GCM: AESGCM, SUITE_CHACHA20_POLY1305: ChaCha20Poly1305}
+CIPHER_SUITE = SUITE_AES_GCM  # Conjunto con el que se cifran los contenedores nuevos
+
+_wrapping_keys = {}  # clave del vault -> subclave que envuelve las claves de datos de los contenedores
 
 def save_key(key):
     """
@@ -32,31 +48,27 @@ def load_key():
         key = key_file.read()
     return key
 
-def derive_key(password: str, salt: bytes) -> bytes:
+def derive_key(password: str, salt: bytes, params=None) -> bytes:
     """
     Deriva una clave Fernet segura a partir de una contraseña dada y una sal.
 
     Args:
     - password (str): La contraseña para derivar la clave.
     - salt (bytes): La sal para usar en la derivación de clave.
+    - params (dict): El algoritmo y sus parámetros de coste (ver `kdf`); por defecto, los de los
+      vaults anteriores a la cabecera de derivación (PBKDF2-SHA256 con 100.000 iteraciones).
 
     Returns:
     - key (bytes): La clave Fernet derivada.
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-        backend=default_backend()
-    )
-    key = kdf.derive(password.encode())  # Deriva la clave
-    return base64.urlsafe_b64encode(key)  # La pasa a formato base64
+    return kdf.derive_key(password, salt, params or kdf.LEGACY_PARAMS)
 
 def encrypt_data(data: str, key: bytes) -> str:
     """
     Cifra los datos dados y devuelve el resultado en base64.
 
+    Antes de cifrar, los datos se comprimen con el códec del vault si compensa (ver `compression`).
+
     Args:
     - data (str): Los datos a cifrar.
     - key (bytes): La clave Fernet para cifrar los datos.
@@ -65,7 +77,7 @@ def encrypt_data(data: str, key: bytes) -> str:
     - encrypted_data (str): Los datos cifrados codificados en base64.
     """
     f = Fernet(key)
-    encrypted_data = f.encrypt(data.encode('utf-8'))
+    encrypted_data = f.encrypt(compress_payload(data.encode('utf-8')))
     return base64.urlsafe_b64encode(encrypted_data).decode('utf-8')
 
 def decrypt_data(encrypted_data_str: str, key: bytes) -> str:
@@ -81,7 +93,7 @@ def decrypt_data(encrypted_data_str: str, key: bytes) -> str:
     """
     f = Fernet(key)
     encrypted_data_bytes = base64.urlsafe_b64decode(encrypted_data_str)  # Decodifica de Base64 a bytes
-    decrypted_data_bytes = f.decrypt(encrypted_data_bytes)
+    decrypted_data_bytes = decompress_payload(f.decrypt(encrypted_data_bytes))
     return decrypted_data_bytes.decode('utf-8')
 
 def generate_container_signature(name, content):
@@ -99,128 +111,240 @@ def generate_container_signature(name, content):
     signature = sha256(signature_input).hexdigest()
     return signature
 
-def encrypt_container(name, content, key):
+def encrypt_container(name, content, key, suite=None):
     """
-    Cifra el contenido de un contenedor, incluida su firma, y devuelve el resultado en Base64.
+    Cifra el contenido de un contenedor y devuelve el resultado en Base64.
+
+    Como en `encrypt_data`, el contenedor se comprime antes de cifrarse si compensa.
+    Si el contenido supera `chunk_store.CHUNK_THRESHOLD`, se trocea en fragmentos que se cifran
+    y guardan una sola vez aunque se repitan en otros contenedores, y el contenedor guarda
+    únicamente la lista de fragmentos. Aquí no se escribe nada: los fragmentos quedan pendientes
+    hasta que se guarda el contenedor (`storage.save_container`).
 
     Args:
     - name (str): El nombre del contenedor.
     - content (str): El contenido del contenedor.
     - key (bytes): La clave Fernet para cifrar el contenedor.
+    - suite (int): El conjunto de cifrado (por defecto, CIPHER_SUITE).
 
     Returns:
     - encrypted_data (str): El contenedor cifrado en base64.
     """
-    signature = generate_container_signature(name, content)
-    data_to_encrypt = json.dumps({"content": content, "signature": signature})
-    f = Fernet(key)
-    encrypted_data = f.encrypt(data_to_encrypt.encode('utf-8'))
-    # Convertir los datos cifrados a Base64 para que sean serializables a JSON
-    return base64.urlsafe_b64encode(encrypted_data).decode('utf-8')
+    if len(content) < chunk_store.CHUNK_THRESHOLD:
+        return encrypt_container_data({"content": content}, key, name, content, suite)
+    # Los contenidos grandes se guardan como fragmentos deduplicados y el contenedor solo los referencia
+    chunks = chunk_store.split_content(content, key)
+    encrypted_data = encrypt_container_data({"chunks": [cid for cid, _ in chunks]}, key, name, content, suite)
+    chunk_store.stage_chunks(name, encrypted_data, chunks)
+    return encrypted_data
+
+def encrypt_file_container(name, file_info, key, suite=None):
+    """
+    Cifra un contenedor de archivo: el archivo ya está cifrado por segmentos en disco y el
+    contenedor guarda su identificador y su clave.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - file_info (dict): La información devuelta por `file_containers.import_file`.
+    - key (bytes): La clave Fernet para cifrar el contenedor.
+    - suite (int): El conjunto de cifrado (por defecto, CIPHER_SUITE).
 
-def derive_encryption_key(password: str, salt: bytes, vault):
+    Returns:
+    - encrypted_data (str): El contenedor cifrado en base64.
     """
-    Deriva una clave segura a partir de la contraseña, el contenido del vault, y una sal. La función utiliza 
-    el hash del contenido del vault como parte de la entrada para la derivación de la clave, añadiendo una capa 
-    adicional de seguridad al asegurar que la clave sea única no solo a la contraseña, sino también al contenido actual.
+    return encrypt_container_data({"file": file_info}, key, name, file_info["file_id"], suite)
+
+def container_wrapping_key(key):
+    """
+    Devuelve la subclave con la que se envuelven las claves de datos de los contenedores.
 
     Args:
-    - password (str): La contraseña proporcionada por el usuario.
-    - salt (bytes): La sal utilizada para la derivación de la clave.
-    - vault (dict): El vault actual cuyo contenido se utiliza en la derivación de la clave.
+    - key (bytes): La clave Fernet del vault.
 
     Returns:
-    - key (bytes): La clave derivada en formato adecuado para su uso con Fernet.
+    - wrapping_key (bytes): La subclave de 32 bytes.
     """
-    # Convierte contraseña a bytes
-    if isinstance(password, str):
-        password_bytes = password.encode('utf-8')
-    else:
-        password_bytes = password  # Si ya es bytes, lo deja sin cambios
-
-    # Calcula el hash del contenido del vault como additional_data
-    contents_hash = sha256(json.dumps(vault, sort_keys=True).encode()).digest()
-    
-    # Combina la contraseña (ya en bytes) y el hash del contenido (también en bytes)
-    combined_input = password_bytes + contents_hash
-
-    # Deriva la clave utilizando tanto la contraseña como el hash del contenido
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-        backend=default_backend()
-    )
-    key = kdf.derive(combined_input)
-    
-    # Devuelve la clave en formato adecuado para Fernet (base64)
-    return base64.urlsafe_b64encode(key)
-
-
-def save_vault_changes(vault, password):
-    """
-    Cifra y guarda el estado actual del vault en un archivo, utilizando una clave derivada que incluye 
-    la contraseña del usuario y el contenido actual del vault. Esto garantiza que el vault solo pueda ser 
-    descifrado con el conocimiento de la contraseña correcta y cuando el contenido del vault coincide con 
-    el estado cuando fue cifrado.
-
-    Args:
-    - vault (dict): El vault a ser guardado.
-    - password (str): La contraseña utilizada para derivar la clave de cifrado.
-    """
-    # Intenta cargar la sal existente o genera una nueva
-    if os.path.exists(SALT_FILE):
-        with open(SALT_FILE, 'rb') as salt_file:
-            save_salt = salt_file.read()
+    wrapping_key = _wrapping_keys.get(key)
+    if wrapping_key is None:
+        wrapping_key = _wrapping_keys[key] = chunk_store.derive_subkey(key, b"SecureBox-container-keys")
+    return wrapping_key
+
+def seal_container(payload, key, name, suite=None):
+    """
+    Cifra los datos de un contenedor con una clave de datos aleatoria propia, que se guarda
+    envuelta por la clave del vault junto al contenedor (cifrado en sobre).
+
+    Así cada contenedor se puede volver a cifrar por separado (`rekey_container`), y cambiar la
+    clave que protege el vault solo obliga a volver a envolver claves de 32 bytes, no a
+    volver a cifrar los contenidos.
+
+    Con un conjunto AEAD el resultado es binario (nonce y texto cifrado con su etiqueta), sin el
+    base64 interno ni el HMAC aparte de Fernet. La cabecera del sobre y el nombre del contenedor
+    se autentican como datos asociados: un contenedor copiado bajo otro nombre no se descifra.
+
+    Args:
+    - payload (bytes): Los datos del contenedor, ya serializados y comprimidos.
+    - key (bytes): La clave Fernet del vault.
+    - name (str): El nombre del contenedor.
+    - suite (int): El conjunto de cifrado (por defecto, CIPHER_SUITE).
+
+    Returns:
+    - encrypted_data (str): El sobre en base64: número mágico, conjunto de cifrado, clave de
+      datos envuelta y datos cifrados.
+    """
+    suite = suite or CIPHER_SUITE
+    data_key = os.urandom(32)
+    header = ENVELOPE_MAGIC + bytes([suite]) + aes_key_wrap(container_wrapping_key(key), data_key)
+    if suite == SUITE_FERNET:
+        body = base64.urlsafe_b64decode(Fernet(base64.urlsafe_b64encode(data_key)).encrypt(payload))
+    elif suite in AEAD_SUITES:
+        # La clave de datos solo cifra este mensaje, así que un nonce aleatorio no se repite
+        nonce = os.urandom(NONCE_LENGTH)
+        body = nonce + AEAD_SUITES[suite](data_key).encrypt(nonce, payload, header + name.encode('utf-8'))
     else:
-        save_salt = os.urandom(16)
-        with open(SALT_FILE, 'wb') as salt_file:
-            salt_file.write(save_salt)
-    
-    # Deriva la clave de cifrado
-    encryption_key = derive_encryption_key(password, save_salt, vault)
-    
-    # Cifra el vault
-    f = Fernet(encryption_key)
-    encrypted_vault = f.encrypt(json.dumps(vault).encode())
-    
-    # Guarda el vault cifrado
-    with open('encrypted_vault.dat', 'wb') as file:
-        file.write(encrypted_vault)
-    
-    print("Cambios guardados exitosamente.")
-
-def load_vault_changes(password):
-    """
-    Descifra y carga el vault cifrado desde un archivo, utilizando una clave derivada basada en la contraseña 
-    proporcionada y el contenido esperado del vault. Si el contenido ha cambiado o la contraseña es incorrecta, 
-    el proceso de descifrado fallará, protegiendo contra accesos no autorizados.
-
-    Args:
-    - password (str): La contraseña proporcionada por el usuario para descifrar el vault.
+        raise ValueError(f"Conjunto de cifrado desconocido: {suite}")
+    return base64.urlsafe_b64encode(header + body).decode('utf-8')
+
+def open_container(encrypted_data, key, name=None):
+    """
+    Descifra los datos de un contenedor, tanto en sobre (`seal_container`) con cualquier conjunto
+    de cifrado como en el formato anterior, cifrado directamente con la clave del vault.
+
+    Args:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet del vault.
+    - name (str): El nombre del contenedor; imprescindible con los conjuntos AEAD.
 
     Returns:
-    - vault (dict): El vault descifrado y cargado como un diccionario.
-    """
-    with open(SALT_FILE, 'rb') as salt_file:
-        save_salt = salt_file.read()
-    
-    # Asumimos que necesitas cargar un indicador del contenido del vault para derivar la clave
-    # Esto puede ser complicado si el contenido cambia. Podrías necesitar almacenar un hash fijo o metadata.
-    # Por simplicidad, asumiremos que el contenido no influye directamente en la clave en esta función.
-    
-    # Deriva la clave de cifrado
-    # Necesitas una manera de obtener un 'vault_contents' consistente o simplificar el uso de 'additional_data'
-    encryption_key = derive_encryption_key(password, save_salt, {})
-    
-    # Descifra el vault
-    with open('encrypted_vault.dat', 'rb') as file:
-        encrypted_vault = file.read()
-    f = Fernet(encryption_key)
-    decrypted_vault = f.decrypt(encrypted_vault).decode()
-    
-    return json.loads(decrypted_vault)
+    - payload (bytes): Los datos del contenedor, serializados y comprimidos.
+
+    Raises:
+    - ValueError: Si el conjunto de cifrado es desconocido o falta el nombre.
+    - cryptography.exceptions.InvalidTag: Si el contenedor se ha alterado o no pertenece a ese nombre.
+    """
+    raw = base64.urlsafe_b64decode(encrypted_data)
+    if not raw.startswith(ENVELOPE_MAGIC):
+        return Fernet(key).decrypt(raw)  # Un token Fernet nunca empieza por la cabecera del sobre
+    suite = raw[len(ENVELOPE_MAGIC)]
+    header_size = len(ENVELOPE_MAGIC) + 1 + WRAPPED_KEY_LENGTH
+    header, body = raw[:header_size], raw[header_size:]
+    if suite != SUITE_FERNET and suite not in AEAD_SUITES:
+        raise ValueError(f"Conjunto de cifrado desconocido: {suite}")
+    data_key = aes_key_unwrap(container_wrapping_key(key), header[len(ENVELOPE_MAGIC) + 1:])
+    if suite == SUITE_FERNET:
+        return Fernet(base64.urlsafe_b64encode(data_key)).decrypt(base64.urlsafe_b64encode(body))
+    if name is None:
+        raise ValueError("Hace falta el nombre del contenedor para descifrarlo.")
+    return AEAD_SUITES[suite](data_key).decrypt(body[:NONCE_LENGTH], body[NONCE_LENGTH:], header + name.encode('utf-8'))
+
+def rekey_container(encrypted_data, key, name, suite=None):
+    """
+    Vuelve a cifrar un contenedor con una clave de datos nueva, sin tocar el resto del vault.
+    Los contenedores de formatos anteriores pasan a cifrarse en sobre con el conjunto indicado.
+
+    Los fragmentos deduplicados (`chunk_store`) se comparten entre contenedores y siguen
+    cifrados con subclaves del vault; los archivos adjuntos ya tienen su propia clave.
+
+    Args:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet del vault.
+    - name (str): El nombre del contenedor.
+    - suite (int): El conjunto de cifrado (por defecto, CIPHER_SUITE).
+
+    Returns:
+    - encrypted_data (str): El contenedor cifrado con la nueva clave de datos.
+    """
+    suite = suite or CIPHER_SUITE
+    container_data = read_container_data(encrypted_data, key, name)
+    container_data.pop("signature", None)
+    content = None
+    if suite == SUITE_FERNET:
+        # Lo que firma `encrypt_container`: el contenido (aunque esté en fragmentos) o el archivo
+        if "file" in container_data:
+            content = container_data["file"]["file_id"]
+        elif "chunks" in container_data:
+            content = chunk_store.load_content(container_data["chunks"], key)
+        else:
+            content = container_data["content"]
+    return encrypt_container_data(container_data, key, name, content, suite)
+
+def encrypt_container_data(container_data, key, name, content=None, suite=None):
+    """
+    Serializa, comprime si compensa y cifra los datos de un contenedor.
+
+    Con Fernet se añade la firma SHA-256 del nombre y el contenido, como en los vaults
+    anteriores; con los conjuntos AEAD no hace falta, porque el nombre se autentica al cifrar.
+
+    Args:
+    - container_data (dict): Los datos del contenedor ("content", "chunks" o "file").
+    - key (bytes): La clave Fernet para cifrar el contenedor.
+    - name (str): El nombre del contenedor.
+    - content (str): Lo que se firma con Fernet (el contenido o el identificador del archivo).
+    - suite (int): El conjunto de cifrado (por defecto, CIPHER_SUITE).
+
+    Returns:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    """
+    suite = suite or CIPHER_SUITE
+    if suite == SUITE_FERNET:
+        container_data = dict(container_data, signature=generate_container_signature(name, content))
+    data_to_encrypt = json.dumps(container_data)
+    # Cada contenedor con su propia clave de datos; el resultado, en base64 para que sea serializable a JSON
+    return seal_container(compress_payload(data_to_encrypt.encode('utf-8')), key, name, suite)
+
+def read_container_data(encrypted_data, key, name=None):
+    """
+    Descifra un contenedor y devuelve sus datos sin interpretar.
+
+    Args:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet para descifrar el contenedor.
+    - name (str): El nombre del contenedor (necesario con los conjuntos AEAD).
+
+    Returns:
+    - container_data (dict): Los datos del contenedor ("content", "chunks" o "file", y
+      "signature" en los cifrados con Fernet).
+    """
+    return json.loads(decompress_payload(open_container(encrypted_data, key, name)).decode('utf-8'))
+
+def decrypt_container(encrypted_data, key, name=None):
+    """
+    Descifra un contenedor cifrado con `encrypt_container` y devuelve su contenido.
+
+    Para los contenedores de archivo se devuelve una descripción del archivo adjunto, que
+    se recupera con `file_containers.export_file`.
+
+    Args:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet para descifrar el contenedor.
+    - name (str): El nombre del contenedor (necesario con los conjuntos AEAD).
+
+    Returns:
+    - content (str): El contenido del contenedor.
+    """
+    container_data = read_container_data(encrypted_data, key, name)
+    if "chunks" in container_data:
+        return chunk_store.load_content(container_data["chunks"], key)
+    if "file" in container_data:
+        file_info = container_data["file"]
+        return f"[Archivo adjunto '{file_info['source_name']}' de {file_info['size']} bytes; expórtalo para recuperarlo]"
+    return container_data["content"]
+
+def release_container(encrypted_data, key, name=None):
+    """
+    Libera los fragmentos deduplicados o el archivo adjunto de un contenedor que se va a sobrescribir o borrar.
+    Si el contenedor no llegó a guardarse, sus fragmentos pendientes simplemente se descartan.
+
+    Args:
+    - encrypted_data (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet con la que se cifró el contenedor.
+    - name (str): El nombre del contenedor (necesario con los conjuntos AEAD).
+    """
+    container_data = read_container_data(encrypted_data, key, name)
+    if "chunks" in container_data and not chunk_store.discard_pending(name, encrypted_data):
+        chunk_store.release_content(container_data["chunks"], key)
+    if "file" in container_data:
+        file_containers.delete_file(container_data["file"])
 
 # Sección de prueba
 
@@ -228,7 +352,47 @@ def generate_key():
     """Genera y retorna una nueva clave de cifrado Fernet."""
     return Fernet.generate_key()
 
+def benchmark_cipher_suites(sizes=(200, 4096, 64 * 1024, 1024 * 1024), total_bytes=4 * 1024 * 1024):
+    """
+    Compara el rendimiento de los conjuntos de cifrado de los contenedores, y del formato
+    anterior al sobre (Fernet directamente con la clave del vault), sobre los datos ya
+    serializados y comprimidos: la serialización y la compresión son iguales en todos.
+
+    Args:
+    - sizes (tuple): Tamaños de los datos de cada contenedor, en bytes.
+    - total_bytes (int): Bytes que se cifran y descifran por cada tamaño y conjunto (con
+      `python encryption.py comparar`, 64 MiB para una medida más estable).
+    """
+    import time
+    key = generate_key()
+    suites = [
+        ("Fernet (clave del vault)", lambda payload, name: base64.urlsafe_b64encode(Fernet(key).encrypt(payload)).decode('utf-8')),
+        ("Fernet (sobre)", lambda payload, name: seal_container(payload, key, name, SUITE_FERNET)),
+        ("AES-256-GCM", lambda payload, name: seal_container(payload, key, name, SUITE_AES_GCM)),
+        ("ChaCha20-Poly1305", lambda payload, name: seal_container(payload, key, name, SUITE_CHACHA20_POLY1305)),
+    ]
+    print(f"{'Conjunto':<26}{'Tamaño':>9}{'Cifrar':>12}{'Descifrar':>12}{'Guardado':>11}")
+    for size in sizes:
+        payload = os.urandom(size)
+        count = max(total_bytes // size, 1)
+        for label, seal in suites:
+            start = time.perf_counter()
+            values = [seal(payload, f"contenedor-{i}") for i in range(count)]
+            encrypt_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for i, value in enumerate(values):
+                assert open_container(value, key, f"contenedor-{i}") == payload
+            decrypt_time = time.perf_counter() - start
+            megabytes = count * size / (1024 * 1024)
+            print(f"{label:<26}{size:>9}{megabytes / encrypt_time:>8.0f} MB/s{megabytes / decrypt_time:>8.0f} MB/s"
+                  f"{len(values[0]) / size:>10.2f}x")
+
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "comparar":
+        benchmark_cipher_suites(total_bytes=64 * 1024 * 1024)
+        sys.exit()
+
     key = generate_key()
     save_key(key)
     loaded_key = load_key()
@@ -237,4 +401,18 @@ if __name__ == "__main__":
     encrypted_test_data = encrypt_data(test_data, loaded_key)
     decrypted_test_data = decrypt_data(encrypted_test_data, loaded_key)
     assert test_data == decrypted_test_data, "El proceso de cifrado y descifrado no coinciden."
-    print("La prueba de cifrado/descifrado fue exitosa.")
\ No newline at end of file
+    print("La prueba de cifrado/descifrado fue exitosa.")
+
+    # Cada conjunto de cifrado abre lo suyo, y los AEAD solo con el nombre con el que se cifró
+    for suite in (SUITE_FERNET, SUITE_AES_GCM, SUITE_CHACHA20_POLY1305):
+        encrypted = encrypt_container("nombre", "contenido", loaded_key, suite)
+        assert decrypt_container(encrypted, loaded_key, "nombre") == "contenido"
+        assert decrypt_container(rekey_container(encrypted, loaded_key, "nombre"), loaded_key, "nombre") == "contenido"
+        if suite in AEAD_SUITES:
+            try:
+                decrypt_container(encrypted, loaded_key, "otro nombre")
+                raise AssertionError("Un contenedor AEAD no debe descifrarse con otro nombre.")
+            except InvalidTag:
+                pass
+    os.remove('vault.key')
+    benchmark_cipher_suites()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import base64
+import os
+import struct
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import safe_io
+
+FILES_DIR = 'files'
+FILE_MAGIC = b"SBXF"
+FILE_VERSION = 1
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+
+FILE_HEADER = struct.Struct(">4sBI7s")  # Número mágico, versión, tamaño de segmento y prefijo del nonce
+NONCE_SUFFIX = struct.Struct(">IB")  # Número de segmento y marca de último segmento
+
+def segment_nonce(prefix, index, last):
+    """
+    Construye el nonce de un segmento (construcción STREAM): prefijo aleatorio del archivo,
+    número de segmento y una marca que indica si es el último. Así un segmento no puede
+    reordenarse ni el archivo truncarse sin que falle la autenticación.
+
+    Args:
+    - prefix (bytes): El prefijo aleatorio de 7 bytes del archivo.
+    - index (int): El número de segmento.
+    - last (bool): Si es el último segmento del archivo.
+
+    Returns:
+    - nonce (bytes): El nonce de 12 bytes para AES-GCM.
+    """
+    return prefix + NONCE_SUFFIX.pack(index, 1 if last else 0)
+
+def file_path(file_id):
+    """
+    Devuelve la ruta del archivo cifrado de un contenedor de archivo.
+
+    Args:
+    - file_id (str): El identificador del archivo.
+
+    Returns:
+    - path (str): La ruta del archivo cifrado.
+    """
+    return os.path.join(FILES_DIR, file_id + ".sbx")
+
+def import_file(source_path):
+    """
+    Cifra un archivo del disco por segmentos, sin cargarlo entero en memoria.
+
+    Cada segmento de `SEGMENT_SIZE` bytes se cifra y autentica por separado con AES-GCM y una
+    clave aleatoria propia del archivo, que se guarda dentro del contenedor (cifrado a su vez
+    con la clave del vault).
+
+    Args:
+    - source_path (str): La ruta del archivo a adjuntar.
+
+    Returns:
+    - file_info (dict): Identificador, clave, tamaño y número de segmentos del archivo cifrado.
+    """
+    os.makedirs(FILES_DIR, exist_ok=True)
+    file_id = base64.urlsafe_b64encode(os.urandom(12)).decode('utf-8')
+    file_key = AESGCM.generate_key(bit_length=256)
+    aesgcm = AESGCM(file_key)
+    prefix = os.urandom(7)
+    header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, SEGMENT_SIZE, prefix)
+    size = 0
+    index = 0
+    tmp_path = file_path(file_id) + ".tmp"
+    with open(source_path, 'rb') as source, open(tmp_path, 'wb') as target:
+        target.write(header)
+        segment = source.read(SEGMENT_SIZE)
+        while True:
+            next_segment = source.read(SEGMENT_SIZE)
+            last = not next_segment
+            target.write(aesgcm.encrypt(segment_nonce(prefix, index, last), segment, header))
+            size += len(segment)
+            index += 1
+            if last:
+                break
+            segment = next_segment
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(tmp_path, file_path(file_id))
+    safe_io.fsync_directory(file_path(file_id))
+    return {
+        "file_id": file_id,
+        "file_key": base64.urlsafe_b64encode(file_key).decode('utf-8'),
+        "size": size,
+        "segments": index,
+        "source_name": os.path.basename(source_path),
+    }
+
+def read_segments(file_info, start_segment=0):
+    """
+    Descifra y devuelve los segmentos de un archivo a partir de uno dado.
+
+    Como todos los segmentos cifrados tienen el mismo tamaño (salvo el último), la lectura
+    puede empezar directamente en cualquier segmento sin descifrar los anteriores.
+
+    Args:
+    - file_info (dict): La información del archivo devuelta por `import_file`.
+    - start_segment (int): El primer segmento a leer.
+
+    Returns:
+    - segments (generator): Los segmentos descifrados, en orden.
+    """
+    aesgcm = AESGCM(base64.urlsafe_b64decode(file_info["file_key"]))
+    total = file_info["segments"]
+    with open(file_path(file_info["file_id"]), 'rb') as source:
+        header = source.read(FILE_HEADER.size)
+        magic, version, segment_size, prefix = FILE_HEADER.unpack(header)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError("El archivo cifrado no es válido.")
+        source.seek(FILE_HEADER.size + start_segment * (segment_size + TAG_SIZE))
+        for index in range(start_segment, total):
+            encrypted_segment = source.read(segment_size + TAG_SIZE)
+            yield aesgcm.decrypt(segment_nonce(prefix, index, index == total - 1), encrypted_segment, header)
+
+def export_file(file_info, destination_path):
+    """
+    Descifra un archivo por segmentos y lo escribe en el disco.
+
+    Args:
+    - file_info (dict): La información del archivo devuelta por `import_file`.
+    - destination_path (str): La ruta donde se escribirá el archivo descifrado.
+    """
+    tmp_path = destination_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as target:
+            for segment in read_segments(file_info):
+                target.write(segment)
+    except Exception:
+        os.remove(tmp_path)  # No deja a medias un archivo que no ha superado la autenticación
+        raise
+    os.replace(tmp_path, destination_path)
+
+def delete_file(file_info):
+    """
+    Borra el archivo cifrado de un contenedor de archivo.
+
+    Args:
+    - file_info (dict): La información del archivo devuelta por `import_file`.
+    """
+    path = file_path(file_info["file_id"])
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,197 @@
+import difflib
+import json
+import os
+import time
+from encryption import encrypt_data, decrypt_data
+from record_index import name_hash
+
+HISTORY_DIR = 'history'
+KEYFRAME_INTERVAL = 10  # Cada cuántas revisiones se guarda una copia completa en lugar de un delta
+
+def history_path(name, key):
+    """
+    Devuelve la ruta del historial de un contenedor, identificado por el hash con clave de su nombre.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - path (str): La ruta del archivo de historial.
+    """
+    return os.path.join(HISTORY_DIR, name_hash(name, key).hex() + ".log")
+
+def make_delta(old, new):
+    """
+    Calcula un delta por líneas que transforma un texto en otro.
+
+    El delta es una lista de operaciones: [inicio, fin] copia ese rango de líneas del texto
+    anterior y una cadena se inserta tal cual.
+
+    Args:
+    - old (str): El texto anterior.
+    - new (str): El texto nuevo.
+
+    Returns:
+    - delta (list): Las operaciones del delta.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    delta = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(new_lines[j1:j2]))
+    return delta
+
+def apply_delta(old, delta):
+    """
+    Aplica un delta calculado con `make_delta`.
+
+    Args:
+    - old (str): El texto anterior.
+    - delta (list): Las operaciones del delta.
+
+    Returns:
+    - new (str): El texto resultante.
+    """
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in delta:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_lines[op[0]:op[1]])
+    return "".join(parts)
+
+def read_entries(name, key):
+    """
+    Lee las entradas del historial sin descifrarlas.
+
+    Cada entrada guarda en claro su número de revisión, su tipo ("key" para copias completas,
+    "delta" para diferencias) y su fecha; el contenido va cifrado en "data".
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - entries (list): Las entradas del historial, de la más antigua a la más reciente.
+    """
+    path = history_path(name, key)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def reconstruct(entries, rev, key):
+    """
+    Reconstruye el contenido de una revisión partiendo de la copia completa más cercana.
+
+    Solo se descifran la copia completa anterior y los deltas hasta la revisión pedida,
+    como mucho `KEYFRAME_INTERVAL` entradas, independientemente de la longitud del historial.
+
+    Args:
+    - entries (list): Las entradas del historial.
+    - rev (int): El número de revisión.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - content (str): El contenido de esa revisión.
+    """
+    position = next(i for i, entry in enumerate(entries) if entry["rev"] == rev)
+    start = position
+    while entries[start]["kind"] != "key":
+        start -= 1
+    content = json.loads(decrypt_data(entries[start]["data"], key))
+    for entry in entries[start + 1:position + 1]:
+        content = apply_delta(content, json.loads(decrypt_data(entry["data"], key)))
+    return content
+
+def append_entry(name, key, rev, kind, payload):
+    """
+    Cifra y añade una entrada al historial de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - rev (int): El número de revisión.
+    - kind (str): "key" o "delta".
+    - payload: El contenido completo o el delta.
+    """
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    entry = {"rev": rev, "kind": kind, "time": time.time(), "data": encrypt_data(json.dumps(payload), key)}
+    with open(history_path(name, key), 'a') as file:
+        file.write(json.dumps(entry) + "\n")
+
+def record_revision(name, content, key, previous_content=None):
+    """
+    Guarda una nueva revisión del contenido de un contenedor.
+
+    La revisión se guarda como delta respecto a la anterior, salvo cada `KEYFRAME_INTERVAL`
+    revisiones, en las que se guarda una copia completa.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - content (str): El nuevo contenido.
+    - key (bytes): La clave Fernet del vault.
+    - previous_content (str): El contenido anterior, que se guarda como primera revisión si
+      el contenedor aún no tenía historial.
+    """
+    entries = read_entries(name, key)
+    if not entries and previous_content is not None:
+        append_entry(name, key, 1, "key", previous_content)
+        entries = read_entries(name, key)
+    if not entries:
+        append_entry(name, key, 1, "key", content)
+        return
+    rev = entries[-1]["rev"] + 1
+    if (rev - 1) % KEYFRAME_INTERVAL == 0:
+        append_entry(name, key, rev, "key", content)
+    else:
+        latest = reconstruct(entries, entries[-1]["rev"], key)
+        append_entry(name, key, rev, "delta", make_delta(latest, content))
+
+def list_revisions(name, key):
+    """
+    Lista las revisiones de un contenedor sin descifrar ninguna.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - revisions (list): Tuplas (número de revisión, fecha) de la más antigua a la más reciente.
+    """
+    return [(entry["rev"], entry["time"]) for entry in read_entries(name, key)]
+
+def get_revision(name, rev, key):
+    """
+    Devuelve el contenido de una revisión concreta de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - rev (int): El número de revisión.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - content (str): El contenido de esa revisión, o None si no existe.
+    """
+    entries = read_entries(name, key)
+    if not any(entry["rev"] == rev for entry in entries):
+        return None
+    return reconstruct(entries, rev, key)
+
+def delete_history(name, key):
+    """
+    Borra el historial de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    """
+    path = history_path(name, key)
+    if os.path.exists(path):
+        os.remove(path)
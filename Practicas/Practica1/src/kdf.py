@@ -0,0 +1,415 @@
+import base64
+import json
+import os
+import time
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+import compression
+import safe_io
+
+HEADER_FILE = 'vault_header.json'  # Sal, algoritmo y parámetros de derivación de la clave, y ajustes del vault
+SALT_FILE = 'salt.key'  # Sal de los vaults anteriores a la cabecera (derivados con LEGACY_PARAMS)
+HEADER_VERSION = 1
+KEY_LENGTH = 32
+SALT_LENGTH = 16
+
+LEGACY_PARAMS = {"algorithm": "pbkdf2-sha256", "iterations": 100000}  # Los vaults sin cabecera
+DEFAULT_PARAMS = {"algorithm": "scrypt", "n": 2 ** 15, "r": 8, "p": 1}  # Si no se ha calibrado la máquina
+TARGET_UNLOCK_SECONDS = 0.5  # Tiempo de desbloqueo que busca la calibración
+MIN_PBKDF2_ITERATIONS = 100000  # La calibración nunca baja de estos costes
+MIN_SCRYPT_N = 2 ** 14
+MAX_SCRYPT_MEMORY = 1024 * 1024 * 1024  # scrypt usa 128 * r * n bytes de memoria
+
+def derive_pbkdf2(password, salt, params):
+    """
+    Deriva una clave con PBKDF2-HMAC-SHA256.
+
+    Args:
+    - password (bytes): La contraseña.
+    - salt (bytes): La sal.
+    - params (dict): "iterations".
+
+    Returns:
+    - key (bytes): La clave derivada, de KEY_LENGTH bytes.
+    """
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=KEY_LENGTH, salt=salt, iterations=params["iterations"])
+    return kdf.derive(password)
+
+def derive_scrypt(password, salt, params):
+    """
+    Deriva una clave con scrypt, que además de tiempo exige memoria y encarece los ataques con hardware dedicado.
+
+    Args:
+    - password (bytes): La contraseña.
+    - salt (bytes): La sal.
+    - params (dict): "n" (coste, potencia de dos), "r" (tamaño de bloque) y "p" (paralelismo).
+
+    Returns:
+    - key (bytes): La clave derivada, de KEY_LENGTH bytes.
+    """
+    kdf = Scrypt(salt=salt, length=KEY_LENGTH, n=params["n"], r=params["r"], p=params["p"])
+    return kdf.derive(password)
+
+def calibrate_pbkdf2(target_seconds):
+    """
+    Elige el número de iteraciones de PBKDF2 que tarda `target_seconds` en esta máquina.
+    """
+    probe = {"algorithm": "pbkdf2-sha256", "iterations": MIN_PBKDF2_ITERATIONS}
+    elapsed = time_derivation(probe)
+    iterations = int(probe["iterations"] * target_seconds / elapsed) // 1000 * 1000
+    return {"algorithm": "pbkdf2-sha256", "iterations": max(iterations, MIN_PBKDF2_ITERATIONS)}
+
+def calibrate_scrypt(target_seconds):
+    """
+    Elige el coste `n` de scrypt (duplicándolo) que más se acerca a `target_seconds` en esta
+    máquina sin pasarse de MAX_SCRYPT_MEMORY.
+    """
+    params = {"algorithm": "scrypt", "n": MIN_SCRYPT_N, "r": 8, "p": 1}
+    elapsed = time_derivation(params)
+    # Cada duplicación de n duplica el tiempo: se para cuando la siguiente se pasaría del objetivo
+    while elapsed * 2 <= target_seconds * 1.25 and 128 * params["r"] * params["n"] * 2 <= MAX_SCRYPT_MEMORY:
+        params["n"] *= 2
+        elapsed = time_derivation(params)
+    return params
+
+# Algoritmos de derivación disponibles; uno nuevo solo tiene que añadirse aquí
+# nombre -> (derivación, calibración, coste comparable entre parámetros del mismo algoritmo)
+ALGORITHMS = {
+    "pbkdf2-sha256": (derive_pbkdf2, calibrate_pbkdf2, lambda params: params["iterations"]),
+    "scrypt": (derive_scrypt, calibrate_scrypt, lambda params: params["n"] * params["r"] * params["p"]),
+}
+
+def derive(password, salt, params):
+    """
+    Deriva una clave a partir de la contraseña con el algoritmo y los parámetros indicados.
+
+    Args:
+    - password (str | bytes): La contraseña.
+    - salt (bytes): La sal.
+    - params (dict): "algorithm" (ver ALGORITHMS) y sus parámetros de coste.
+
+    Returns:
+    - key (bytes): La clave derivada, de KEY_LENGTH bytes.
+
+    Raises:
+    - ValueError: Si el algoritmo no existe.
+    """
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    if params["algorithm"] not in ALGORITHMS:
+        raise ValueError(f"Algoritmo de derivación desconocido: {params['algorithm']}")
+    return ALGORITHMS[params["algorithm"]][0](password, salt, params)
+
+def derive_key(password, salt, params):
+    """
+    Deriva una clave en el formato de Fernet (base64).
+
+    Args:
+    - password (str | bytes): La contraseña.
+    - salt (bytes): La sal.
+    - params (dict): El algoritmo y sus parámetros.
+
+    Returns:
+    - key (bytes): La clave Fernet derivada.
+    """
+    return base64.urlsafe_b64encode(derive(password, salt, params))
+
+def time_derivation(params):
+    """
+    Mide lo que tarda una derivación con los parámetros indicados.
+
+    Returns:
+    - seconds (float): El tiempo de una derivación.
+    """
+    start = time.perf_counter()
+    derive(b"calibracion", os.urandom(SALT_LENGTH), params)
+    return time.perf_counter() - start
+
+def calibrate(target_seconds=TARGET_UNLOCK_SECONDS, algorithm=DEFAULT_PARAMS["algorithm"]):
+    """
+    Elige los parámetros de un algoritmo para que desbloquear el vault tarde `target_seconds`
+    en esta máquina, sin bajar nunca de los costes mínimos.
+
+    Args:
+    - target_seconds (float): El tiempo de desbloqueo buscado.
+    - algorithm (str): El algoritmo (ver ALGORITHMS).
+
+    Returns:
+    - params (dict): Los parámetros elegidos.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Algoritmo de derivación desconocido: {algorithm}")
+    return ALGORITHMS[algorithm][1](target_seconds)
+
+def is_outdated(params, target):
+    """
+    Indica si unos parámetros deben sustituirse por los de referencia: porque usan otro algoritmo
+    o porque su coste es menor. Un objetivo más barato no rebaja parámetros más costosos.
+
+    Args:
+    - params (dict): Los parámetros con los que está derivada la clave.
+    - target (dict): Los parámetros de referencia.
+
+    Returns:
+    - bool: True si hay que volver a derivar la clave.
+    """
+    if params["algorithm"] != target["algorithm"]:
+        return True
+    cost = ALGORITHMS[params["algorithm"]][2]
+    return cost(params) < cost(target)
+
+def has_header():
+    """
+    Indica si el vault tiene contraseña configurada (con cabecera o con la sal de los vaults anteriores).
+    """
+    return os.path.exists(HEADER_FILE) or os.path.exists(SALT_FILE)
+
+def load_header():
+    """
+    Carga la cabecera de derivación del vault. Un vault anterior a la cabecera se presenta como
+    una cabecera con la sal de `salt.key` y LEGACY_PARAMS.
+
+    Returns:
+    - header (dict): "params", "salt" (bytes), "target" (los parámetros calibrados, o None),
+      "wrapped_key" (la clave del vault cifrada con la derivada de la contraseña, o None) y
+      "compression" (el códec de compresión del vault, ver `compression`).
+    """
+    if not os.path.exists(HEADER_FILE):
+        with open(SALT_FILE, 'rb') as salt_file:
+            salt = salt_file.read()
+        return {"params": dict(LEGACY_PARAMS), "salt": salt, "target": None, "wrapped_key": None,
+                "compression": compression.DEFAULT_CODEC}
+    with open(HEADER_FILE, 'r') as file:
+        stored = json.load(file)
+    return {
+        "params": stored["params"],
+        "salt": base64.b64decode(stored["salt"]),
+        "target": stored.get("target"),
+        "wrapped_key": stored.get("wrapped_key"),
+        "compression": stored.get("compression", compression.DEFAULT_CODEC),
+    }
+
+def save_header(header):
+    """
+    Guarda de forma atómica la cabecera de derivación: la sal, los parámetros y la clave
+    envuelta van en el mismo archivo, así que un cierre inesperado nunca los deja desparejados.
+
+    Args:
+    - header (dict): La cabecera (ver `load_header`).
+    """
+    stored = {
+        "version": HEADER_VERSION,
+        "params": header["params"],
+        "salt": base64.b64encode(header["salt"]).decode(),
+        "compression": header.get("compression", compression.DEFAULT_CODEC),
+    }
+    if header.get("target") is not None:
+        stored["target"] = header["target"]
+    if header.get("wrapped_key") is not None:
+        stored["wrapped_key"] = header["wrapped_key"]
+    safe_io.atomic_write(HEADER_FILE, json.dumps(stored, indent=2).encode())
+    if os.path.exists(SALT_FILE):
+        os.remove(SALT_FILE)  # La sal ya está en la cabecera
+
+def target_params(header=None):
+    """
+    Devuelve los parámetros de referencia: los calibrados en esta máquina o DEFAULT_PARAMS.
+    """
+    if header is not None and header.get("target") is not None:
+        return header["target"]
+    return dict(DEFAULT_PARAMS)
+
+def wrap_key(password, header, key):
+    """
+    Envuelve la clave del vault: la cifra con la clave derivada de la contraseña usando una sal
+    nueva y los parámetros de referencia, y guarda la cabecera.
+
+    Args:
+    - password (str): La contraseña.
+    - header (dict): La cabecera (ver `load_header`).
+    - key (bytes): La clave Fernet del vault.
+    """
+    header["params"] = target_params(header)
+    header["salt"] = os.urandom(SALT_LENGTH)
+    derived = derive_key(password, header["salt"], header["params"])
+    header["wrapped_key"] = Fernet(derived).encrypt(key).decode()
+    save_header(header)
+
+def create_header(password):
+    """
+    Configura la contraseña de un vault nuevo. La clave del vault es aleatoria y se guarda
+    envuelta por la derivada de la contraseña: la derivación solo se paga al desbloquear, y
+    cambiar la contraseña o los parámetros no obliga a volver a cifrar los contenedores.
+
+    Args:
+    - password (str): La contraseña.
+
+    Returns:
+    - key (bytes): La clave Fernet del vault.
+    """
+    key = Fernet.generate_key()
+    wrap_key(password, {"target": None, "compression": compression.DEFAULT_CODEC}, key)
+    compression.set_codec(compression.DEFAULT_CODEC)
+    return key
+
+def unlock(password):
+    """
+    Obtiene la clave del vault a partir de la contraseña y aplica el códec de compresión del vault.
+
+    Args:
+    - password (str): La contraseña.
+
+    Returns:
+    - key (bytes): La clave Fernet del vault, o None si la contraseña no descifra la clave envuelta.
+      En los vaults anteriores a la clave envuelta, la clave del vault es la derivada de la
+      contraseña, y una contraseña incorrecta devuelve una clave incorrecta: hay que comprobarla
+      con el valor de prueba.
+    """
+    header = load_header()
+    compression.set_codec(header["compression"])
+    derived = derive_key(password, header["salt"], header["params"])
+    if header["wrapped_key"] is None:
+        return derived
+    try:
+        return Fernet(derived).decrypt(header["wrapped_key"].encode())
+    except InvalidToken:
+        return None
+
+def needs_rehash():
+    """
+    Indica si hay que volver a envolver la clave del vault: porque la clave de la contraseña está
+    derivada con parámetros anticuados (ver `is_outdated`) o porque es un vault anterior a la
+    clave envuelta, cuya clave es directamente la derivada de la contraseña.
+    """
+    header = load_header()
+    return header["wrapped_key"] is None or is_outdated(header["params"], target_params(header))
+
+def rehash(password, key):
+    """
+    Vuelve a derivar la clave de la contraseña con los parámetros de referencia y una sal nueva.
+
+    La clave del vault no cambia (eso obligaría a volver a cifrar todos los contenedores): se
+    guarda envuelta, es decir, cifrada con la nueva clave derivada de la contraseña. En un vault
+    anterior a la clave envuelta, la clave que se envuelve es la que ya se derivaba de la contraseña.
+
+    Args:
+    - password (str): La contraseña, ya comprobada.
+    - key (bytes): La clave Fernet del vault.
+    """
+    wrap_key(password, load_header(), key)
+
+def change_password(old_password, new_password, key):
+    """
+    Cambia la contraseña del vault. Solo se vuelve a envolver la clave del vault: los
+    contenedores no se vuelven a cifrar.
+
+    Args:
+    - old_password (str): La contraseña actual.
+    - new_password (str): La contraseña nueva.
+    - key (bytes): La clave Fernet del vault (la de la sesión abierta).
+
+    Returns:
+    - bool: True si la contraseña actual es correcta y se ha cambiado.
+    """
+    if unlock(old_password) != key:
+        return False
+    wrap_key(new_password, load_header(), key)
+    return True
+
+def set_target(params):
+    """
+    Guarda los parámetros de referencia calibrados; se aplican en el siguiente inicio de sesión.
+
+    Args:
+    - params (dict): Los parámetros (ver `calibrate`).
+    """
+    header = load_header()
+    header["target"] = params
+    save_header(header)
+
+def apply_settings():
+    """
+    Aplica los ajustes guardados en la cabecera del vault (el códec de compresión). `unlock` ya
+    lo hace; hay que llamarla cuando la clave se obtiene sin desbloquear, del agente de claves.
+    """
+    compression.set_codec(load_header()["compression"])
+
+def set_compression(codec):
+    """
+    Cambia el códec de compresión del vault. Se aplica a lo que se guarde a partir de ahora; los
+    contenedores ya guardados se siguen leyendo con el códec con el que se comprimieron.
+
+    Args:
+    - codec (str): "zlib", "lzma" o None (ver `compression.CODEC_IDS`).
+    """
+    compression.set_codec(codec)
+    header = load_header()
+    header["compression"] = codec
+    save_header(header)
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+
+    for algorithm in ALGORITHMS:
+        params = calibrate(0.2, algorithm)
+        print(f"{algorithm}: {params} -> {time_derivation(params) * 1000:.0f} ms por desbloqueo")
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            # Un vault anterior a la cabecera: sal suelta y PBKDF2 con 100.000 iteraciones
+            salt = os.urandom(SALT_LENGTH)
+            with open(SALT_FILE, 'wb') as salt_file:
+                salt_file.write(salt)
+            legacy_key = derive_key("contraseña", salt, LEGACY_PARAMS)
+            assert unlock("contraseña") == legacy_key and needs_rehash()
+
+            # Al iniciar sesión se vuelve a derivar con los parámetros de referencia, sin cambiar la clave
+            rehash("contraseña", legacy_key)
+            assert not os.path.exists(SALT_FILE) and not needs_rehash()
+            assert load_header()["params"] == DEFAULT_PARAMS
+            assert unlock("contraseña") == legacy_key
+            assert unlock("otra") is None
+
+            # Tras calibrar, solo se vuelve a derivar si los parámetros nuevos son más costosos
+            set_target({"algorithm": "scrypt", "n": MIN_SCRYPT_N, "r": 8, "p": 1})
+            assert not needs_rehash(), "Un objetivo más barato no debe rebajar los parámetros."
+            set_target({"algorithm": "pbkdf2-sha256", "iterations": 200000})
+            assert needs_rehash()
+            rehash("contraseña", legacy_key)
+            assert unlock("contraseña") == legacy_key and not needs_rehash()
+
+            # Un vault nuevo: clave aleatoria, independiente de la contraseña
+            os.remove(HEADER_FILE)
+            key = create_header("contraseña")
+            assert key != derive_key("contraseña", load_header()["salt"], load_header()["params"])
+            assert unlock("contraseña") == key and unlock("otra") is None and not needs_rehash()
+
+            # Los vaults de la cabecera sin clave envuelta también se envuelven al iniciar sesión
+            header = load_header()
+            header["wrapped_key"] = None
+            save_header(header)
+            derived = derive_key("contraseña", header["salt"], header["params"])
+            assert unlock("contraseña") == derived and needs_rehash()
+            rehash("contraseña", derived)
+            assert unlock("contraseña") == derived and not needs_rehash()
+
+            # Cambiar la contraseña solo vuelve a envolver la clave del vault
+            assert not change_password("otra", "nueva", derived)
+            assert change_password("contraseña", "nueva", derived)
+            assert unlock("nueva") == derived and unlock("contraseña") is None
+
+            # El códec de compresión es un ajuste del vault: se conserva al cambiar la contraseña y se aplica al desbloquear
+            set_compression("lzma")
+            rehash("nueva", derived)
+            compression.set_codec(None)
+            assert load_header()["compression"] == "lzma" and unlock("nueva") == derived
+            assert compression.compress_payload(b"a" * 1000)[1] == compression.CODEC_IDS["lzma"]
+            print("Cabecera de derivación: rehash transparente, clave envuelta y cambio de contraseña comprobados.")
+        finally:
+            os.chdir(previous_dir)
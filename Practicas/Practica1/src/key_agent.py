@@ -0,0 +1,336 @@
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import time
+
+AGENT_SOCKET = 'agent.sock'  # Socket Unix del agente, junto al vault al que da servicio
+AGENT_TTL_SECONDS = 15 * 60  # Tiempo que el agente conserva la clave desbloqueada, por defecto
+AGENT_START_TIMEOUT_SECONDS = 5.0  # Espera máxima a que un agente recién lanzado acepte conexiones
+AGENT_IO_TIMEOUT_SECONDS = 5.0  # Un cliente que no completa su petición no bloquea el agente
+MAX_MESSAGE_BYTES = 64 * 1024
+PEER_CREDENTIALS = struct.Struct("3i")  # struct ucred de SO_PEERCRED: pid, uid, gid
+
+def peer_uid(sock):
+    """
+    Obtiene el usuario del proceso al otro lado de un socket Unix.
+
+    Args:
+    - sock (socket.socket): La conexión aceptada.
+
+    Returns:
+    - uid (int): El identificador del usuario, o None si el sistema no permite obtenerlo
+      (en ese caso solo protegen los permisos del socket).
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+    return PEER_CREDENTIALS.unpack(credentials)[1]
+
+class AgentServer(socketserver.UnixStreamServer):
+    def __init__(self, path=AGENT_SOCKET):
+        """
+        Inicializa el agente de claves: un proceso en segundo plano que guarda en memoria la clave
+        del vault desbloqueada durante un tiempo, como `ssh-agent`. Las siguientes ejecuciones de
+        la aplicación la piden por el socket en lugar de volver a derivarla de la contraseña.
+
+        Args:
+            path (str): La ruta del socket Unix.
+
+        El socket solo es accesible para su propietario y, donde el sistema lo permite, el agente
+        rechaza además las conexiones de otros usuarios. Cualquier proceso del mismo usuario puede,
+        en cambio, pedir con "get" la clave del vault tal cual mientras esté desbloqueado: la
+        protección es la misma que la de `ssh-agent`. La clave se borra de memoria al caducar
+        o al bloquear el agente.
+
+        Como el resto de archivos del vault, la ruta por defecto del socket (`AGENT_SOCKET`) es
+        relativa al directorio de trabajo: cada directorio con un vault tiene su propio agente. La
+        aplicación ejecutada desde otro directorio no encuentra el agente ya desbloqueado, así que
+        pide la contraseña, y "desbloquear" arranca allí un segundo agente.
+        """
+        previous_umask = os.umask(0o177)  # El socket se crea con permisos 0600
+        try:
+            super().__init__(path, AgentHandler)
+        finally:
+            os.umask(previous_umask)
+        self.path = path
+        self.key = None  # bytearray, para poder borrarla
+        self.expires_at = 0.0
+        self.ttl = AGENT_TTL_SECONDS
+        self.running = True
+
+    def verify_request(self, request, client_address):
+        uid = peer_uid(request)
+        return uid is None or uid == os.getuid()
+
+    def service_actions(self):
+        # Se ejecuta en cada vuelta del bucle del servidor: la clave caduca aunque nadie la pida
+        if self.key is not None and time.monotonic() >= self.expires_at:
+            self.forget_key()
+
+    def store_key(self, key, ttl):
+        """
+        Guarda la clave desbloqueada durante `ttl` segundos.
+
+        Args:
+            key (bytes): La clave del vault.
+            ttl (float): Los segundos que se conserva.
+        """
+        self.forget_key()
+        self.key = bytearray(key)
+        self.expires_at = time.monotonic() + ttl
+
+    def forget_key(self):
+        """
+        Borra la clave de memoria (sobrescribiéndola) y deja el agente bloqueado.
+        """
+        if self.key is not None:
+            self.key[:] = bytes(len(self.key))
+            self.key = None
+
+    def handle_message(self, message):
+        """
+        Atiende una petición del cliente.
+
+        Args:
+            message (dict): La petición: "op" y sus parámetros.
+
+        Returns:
+            dict: La respuesta, con "ok" y los datos o el error.
+        """
+        self.service_actions()
+        op = message.get("op")
+        if op == "get":
+            if self.key is None:
+                return {"ok": False, "error": "El agente está bloqueado."}
+            return {"ok": True, "key": self.key.decode(), "expires_in": self.expires_at - time.monotonic()}
+        if op == "add":
+            ttl = float(message.get("ttl", self.ttl))
+            self.store_key(message["key"].encode(), ttl)
+            return {"ok": True, "expires_in": ttl}
+        if op == "lock":
+            self.forget_key()
+            return {"ok": True}
+        if op == "timeout":
+            self.ttl = float(message["ttl"])
+            if self.key is not None:
+                self.expires_at = time.monotonic() + self.ttl
+            return {"ok": True}
+        if op == "status":
+            expires_in = self.expires_at - time.monotonic() if self.key is not None else 0
+            return {"ok": True, "locked": self.key is None, "expires_in": expires_in, "ttl": self.ttl, "pid": os.getpid()}
+        if op == "stop":
+            self.forget_key()
+            self.running = False
+            return {"ok": True}
+        return {"ok": False, "error": f"Operación desconocida: {op}"}
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    timeout = AGENT_IO_TIMEOUT_SECONDS
+
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline(MAX_MESSAGE_BYTES))
+            response = self.server.handle_message(message)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"ok": False, "error": f"Petición no válida: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+def serve(path=AGENT_SOCKET):
+    """
+    Ejecuta el agente hasta que se le pide que se detenga.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+    """
+    if os.path.exists(path):
+        if request({"op": "status"}, path) is not None:
+            print("El agente ya está en marcha.")
+            return
+        os.remove(path)  # Socket de un agente que terminó sin borrarlo
+    server = AgentServer(path)
+    server.timeout = 1.0  # Sin peticiones, se vuelve a comprobar la caducidad de la clave cada segundo
+    try:
+        while server.running:
+            server.handle_request()
+            server.service_actions()
+    finally:
+        server.forget_key()
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+def request(message, path=AGENT_SOCKET):
+    """
+    Envía una petición al agente.
+
+    Args:
+    - message (dict): La petición.
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - response (dict): La respuesta del agente, o None si no hay ningún agente en marcha.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(AGENT_IO_TIMEOUT_SECONDS)
+            sock.connect(path)
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            with sock.makefile('rb') as file:
+                return json.loads(file.readline(MAX_MESSAGE_BYTES))
+    except (OSError, ValueError):
+        return None
+
+def start_agent(path=AGENT_SOCKET):
+    """
+    Lanza el agente en segundo plano, si no está ya en marcha, y espera a que acepte conexiones.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - bool: True si el agente está en marcha.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    if request({"op": "status"}, path) is not None:
+        return True
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "servir", path],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)  # Sigue en marcha al terminar la aplicación
+    deadline = time.monotonic() + AGENT_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if request({"op": "status"}, path) is not None:
+            return True
+        time.sleep(0.05)
+    return False
+
+def get_key(path=AGENT_SOCKET):
+    """
+    Pide al agente la clave desbloqueada.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - key (bytes): La clave del vault, o None si no hay agente o está bloqueado.
+    """
+    response = request({"op": "get"}, path)
+    if response is None or not response.get("ok"):
+        return None
+    return response["key"].encode()
+
+def add_key(key, ttl=None, path=AGENT_SOCKET):
+    """
+    Entrega al agente la clave desbloqueada.
+
+    Args:
+    - key (bytes): La clave del vault.
+    - ttl (float): Los segundos que la conserva, o None para usar el plazo configurado en el agente.
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - bool: True si el agente la ha guardado.
+    """
+    message = {"op": "add", "key": key.decode()}
+    if ttl is not None:
+        message["ttl"] = ttl
+    response = request(message, path)
+    return response is not None and response.get("ok", False)
+
+def lock(path=AGENT_SOCKET):
+    """
+    Bloquea el agente: borra la clave de su memoria sin detenerlo.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - bool: True si había un agente en marcha.
+    """
+    return request({"op": "lock"}, path) is not None
+
+def set_timeout(ttl, path=AGENT_SOCKET):
+    """
+    Cambia el tiempo que el agente conserva la clave; si está desbloqueado, el plazo vuelve a
+    empezar con el nuevo valor.
+
+    Args:
+    - ttl (float): Los segundos que conserva la clave.
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - bool: True si había un agente en marcha.
+    """
+    return request({"op": "timeout", "ttl": ttl}, path) is not None
+
+def status(path=AGENT_SOCKET):
+    """
+    Consulta el estado del agente.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - status (dict): "locked", "expires_in", "ttl" y "pid", o None si no hay agente.
+    """
+    return request({"op": "status"}, path)
+
+def stop(path=AGENT_SOCKET):
+    """
+    Detiene el agente, borrando antes la clave de su memoria.
+
+    Args:
+    - path (str): La ruta del socket Unix.
+
+    Returns:
+    - bool: True si había un agente en marcha.
+    """
+    return request({"op": "stop"}, path) is not None
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "servir":
+        serve(sys.argv[2])
+        sys.exit()
+
+    import tempfile
+    from encryption import derive_key
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            salt = os.urandom(16)
+            start = time.perf_counter()
+            key = derive_key("contraseña", salt)
+            derive_time = time.perf_counter() - start
+
+            assert get_key() is None, "Sin agente no debe haber clave."
+            assert start_agent()
+            assert oct(os.stat(AGENT_SOCKET).st_mode & 0o777) == oct(0o600)
+            assert get_key() is None, "Un agente nuevo debe estar bloqueado."
+            assert add_key(key, ttl=1)
+            start = time.perf_counter()
+            assert get_key() == key
+            agent_time = time.perf_counter() - start
+
+            # Caducidad, bloqueo y cambio del plazo
+            time.sleep(2.2)
+            assert status()["locked"] and get_key() is None, "La clave debe caducar."
+            assert add_key(key) and lock() and get_key() is None, "Tras bloquear no debe entregar la clave."
+            assert add_key(key) and set_timeout(1) and status()["expires_in"] <= 1
+            assert request({"op": "desconocida"})["ok"] is False
+            assert stop()
+            time.sleep(0.2)
+            assert status() is None and not os.path.exists(AGENT_SOCKET)
+            print(f"Clave de la contraseña (PBKDF2): {derive_time * 1000:.1f} ms | del agente: {agent_time * 1000:.2f} ms")
+        finally:
+            stop()
+            os.chdir(previous_dir)
@@ -0,0 +1,252 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from encryption import encrypt_data, decrypt_data
+import safe_io
+
+LOG_FILE = 'vault.log'
+ROTATED_LOG_FILE = LOG_FILE + '.old'  # Log apartado mientras una compactación escribe la copia completa
+
+_lock = threading.RLock()
+_log_file = None  # Descriptor abierto del log para no reabrirlo en cada operación
+_pending = []  # Registros acumulados dentro de un group commit
+_group_depth = 0
+_unsynced = False
+_last_sync = 0.0
+_sync_timer = None
+
+def append_record(op, name, value, key):
+    """
+    Añade un registro cifrado al final del log de cambios del vault.
+
+    Cada registro contiene una única operación sobre un contenedor, de forma que
+    solo se cifra y se escribe el contenedor modificado en lugar de todo el vault.
+    Dentro de un `group_commit` el registro se acumula y se escribe junto con los demás.
+
+    Args:
+    - op (str): La operación registrada ("put" o "delete").
+    - name (str): El nombre del contenedor afectado.
+    - value (str): El contenedor cifrado en base64, o None para un borrado.
+    - key (bytes): La clave Fernet para cifrar el registro.
+    """
+    record = json.dumps({"op": op, "name": name, "data": value})
+    line = (encrypt_data(record, key) + "\n").encode('utf-8')
+    with _lock:
+        if _group_depth:
+            _pending.append(line)
+        else:
+            write_records([line])
+
+@contextmanager
+def group_commit():
+    """
+    Agrupa varias operaciones en una única escritura y un único fsync del log.
+
+    Uso:
+        with log_store.group_commit():
+            ...  # varias llamadas a append_put/append_delete
+    """
+    global _group_depth
+    with _lock:
+        _group_depth += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _group_depth -= 1
+            if not _group_depth and _pending:
+                lines = list(_pending)
+                _pending.clear()
+                write_records(lines)
+
+def open_log():
+    """
+    Abre el log para añadir registros, reutilizando el descriptor si ya está abierto.
+
+    Si el último registro quedó incompleto tras un cierre inesperado, se termina su línea
+    para que el siguiente registro no quede pegado a él.
+
+    Returns:
+    - log_file (file): El archivo del log abierto en modo binario para añadir.
+    """
+    global _log_file
+    if _log_file is None:
+        needs_newline = False
+        if os.path.exists(LOG_FILE) and os.stat(LOG_FILE).st_size > 0:
+            with open(LOG_FILE, 'rb') as existing:
+                existing.seek(-1, os.SEEK_END)
+                needs_newline = existing.read(1) != b"\n"
+        _log_file = open(LOG_FILE, 'ab')
+        if needs_newline:
+            _log_file.write(b"\n")
+    return _log_file
+
+def write_records(lines):
+    """
+    Escribe registros ya cifrados en el log y los sincroniza según `safe_io.FSYNC_POLICY`.
+
+    Args:
+    - lines (list): Los registros cifrados, cada uno terminado en salto de línea.
+    """
+    global _unsynced, _sync_timer
+    with _lock:
+        log_file = open_log()
+        log_file.write(b"".join(lines))
+        log_file.flush()
+        _unsynced = True
+        if safe_io.FSYNC_POLICY == "always":
+            sync_log()
+        elif safe_io.FSYNC_POLICY == "interval":
+            elapsed_ms = (time.monotonic() - _last_sync) * 1000
+            if elapsed_ms >= safe_io.FSYNC_INTERVAL_MS:
+                sync_log()
+            elif _sync_timer is None:
+                # Garantiza que los registros no queden sin sincronizar más del intervalo
+                _sync_timer = threading.Timer((safe_io.FSYNC_INTERVAL_MS - elapsed_ms) / 1000, sync_log)
+                _sync_timer.daemon = True
+                _sync_timer.start()
+
+def sync_log():
+    """
+    Sincroniza con el disco los registros del log que aún no lo estén.
+    """
+    global _unsynced, _last_sync, _sync_timer
+    with _lock:
+        if _sync_timer is not None:
+            _sync_timer.cancel()
+            _sync_timer = None
+        if _log_file is not None and _unsynced:
+            os.fsync(_log_file.fileno())
+        _unsynced = False
+        _last_sync = time.monotonic()
+
+def close_log():
+    """
+    Sincroniza y cierra el log. Se ejecuta automáticamente al salir de la aplicación.
+    """
+    global _log_file
+    with _lock:
+        sync_log()
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+atexit.register(close_log)
+
+def append_put(name, value, key):
+    """
+    Registra la creación o modificación de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - value (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet para cifrar el registro.
+    """
+    append_record("put", name, value, key)
+
+def append_delete(name, key):
+    """
+    Registra el borrado de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor borrado.
+    - key (bytes): La clave Fernet para cifrar el registro.
+    """
+    append_record("delete", name, None, key)
+
+def read_records(key):
+    """
+    Lee y descifra en orden los registros del log: primero los del log apartado por una
+    compactación en curso (o interrumpida), si lo hay, y después los del log actual.
+
+    Las líneas que no se pueden descifrar (por ejemplo, un registro incompleto por un
+    cierre inesperado durante la escritura) se descartan sin interrumpir la lectura.
+
+    Args:
+    - key (bytes): La clave Fernet para descifrar los registros.
+
+    Returns:
+    - records (generator): Los registros descifrados como diccionarios.
+    """
+    for path in (ROTATED_LOG_FILE, LOG_FILE):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as log_file:
+            for line in log_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(decrypt_data(line, key))
+                except Exception:
+                    continue  # Registro truncado o corrupto
+                yield record
+
+def replay_log(vault, key):
+    """
+    Aplica sobre el vault las operaciones registradas en el log.
+
+    Args:
+    - vault (dict): El vault cargado desde la última copia completa.
+    - key (bytes): La clave Fernet para descifrar los registros.
+
+    Returns:
+    - vault (dict): El vault con todos los cambios del log aplicados.
+    """
+    for record in read_records(key):
+        if record["op"] == "put":
+            vault[record["name"]] = record["data"]
+        elif record["op"] == "delete":
+            vault.pop(record["name"], None)
+    return vault
+
+def truncate_log():
+    """
+    Vacía el log una vez que su contenido ya está incluido en una copia completa del vault.
+    """
+    with _lock:
+        close_log()
+        for path in (LOG_FILE, ROTATED_LOG_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+                safe_io.fsync_directory(path)
+
+def rotate_log():
+    """
+    Aparta el log actual para que una compactación pueda escribir la copia completa sin bloquear
+    las escrituras: los registros nuevos van a un log vacío, y el apartado se borra cuando la
+    copia completa (que ya lo incluye) está escrita.
+
+    Si quedaba un log apartado de una compactación interrumpida, el actual se añade a su final.
+    """
+    with _lock:
+        close_log()
+        if not os.path.exists(LOG_FILE):
+            return
+        if os.path.exists(ROTATED_LOG_FILE):
+            with open(LOG_FILE, 'rb') as current, open(ROTATED_LOG_FILE, 'ab') as rotated:
+                rotated.write(b"\n" + current.read())  # Por si el apartado acabó en un registro incompleto
+                rotated.flush()
+                os.fsync(rotated.fileno())
+            os.remove(LOG_FILE)
+        else:
+            os.replace(LOG_FILE, ROTATED_LOG_FILE)
+        safe_io.fsync_directory(LOG_FILE)
+
+def drop_rotated_log():
+    """
+    Borra el log apartado por `rotate_log`, una vez escrita la copia completa que lo incluye.
+    """
+    with _lock:
+        if os.path.exists(ROTATED_LOG_FILE):
+            os.remove(ROTATED_LOG_FILE)
+            safe_io.fsync_directory(ROTATED_LOG_FILE)
+
+def log_size():
+    """
+    Devuelve los bytes que ocupa el log en disco (incluido el apartado, si lo hay).
+    """
+    return sum(os.path.getsize(path) for path in (LOG_FILE, ROTATED_LOG_FILE) if os.path.exists(path))
@@ -1,9 +1,18 @@
 import os
+import sys
 import json
 from getpass import getpass
 import encryption
 from encryption import *
 import containers
+import bulk_io
+import key_agent
+import kdf
+import compression
+from write_behind import WriteBehind
+from compactor import Compactor
+import storage
+from vault import Vault
 from cryptography.fernet import Fernet
 from google_drive_integration import *
 
@@ -22,11 +31,12 @@ def initialize_system():
     Inicializa el sistema verificando si existen archivos clave y, si no, crea una nueva configuración.
     Solicita al usuario que establezca una contraseña para SecureBox si es la primera vez,
     o verifica la contraseña ingresada contra la existente en los inicios de sesión posteriores.
+    Si el agente de claves está desbloqueado (ver `key_agent`), usa su clave sin pedir la contraseña.
 
     Returns:
         key (bytes): La clave de cifrado derivada de la contraseña del usuario.
     """
-    if not os.path.exists(SALT_FILE) or not os.path.exists(TEST_VALUE_FILE):
+    if not kdf.has_header() or not os.path.exists(TEST_VALUE_FILE):
         # Configuración inicial
         password = getpass("Establece una contraseña para SecureBox: ")
         password_confirm = getpass("Confirma tu contraseña: ")
@@ -34,11 +44,8 @@ def initialize_system():
             print("Las contraseñas no coinciden. Intenta nuevamente.")
             exit()
 
-        salt = os.urandom(16)
-        with open(SALT_FILE, 'wb') as salt_file:
-            salt_file.write(salt)
-        
-        key = derive_key(password, salt)
+        # La sal y los parámetros de derivación (los calibrados, ver `kdf`) van en la cabecera del vault
+        key = kdf.create_header(password)
         f = Fernet(key)
         encrypted_test_value = f.encrypt(TEST_VALUE)
         with open(TEST_VALUE_FILE, 'wb') as test_file:
@@ -46,13 +53,25 @@ def initialize_system():
 
         print("Configuración inicial completada.")
     else:
+        # Con el agente desbloqueado no hace falta pedir la contraseña ni derivar la clave
+        key = key_agent.get_key()
+        if key is not None and verify_access(key):
+            kdf.apply_settings()
+            return key
+
         # Verificación durante los inicios de sesión posteriores
-        salt = open(SALT_FILE, 'rb').read()
         password = getpass("Introduce tu contraseña para acceder a SecureBox: ")
-        key = derive_key(password, salt)
-        if not verify_access(key):
+        key = kdf.unlock(password)
+        if key is None or not verify_access(key):
             print("Acceso denegado. La contraseña es incorrecta.")
             exit()
+        # Si los parámetros de derivación han quedado anticuados (o la clave del vault aún es la derivada
+        # de la contraseña), se vuelve a envolver la clave del vault sin cambiarla
+        if kdf.needs_rehash():
+            kdf.rehash(password, key)
+            print("Protección de la clave del vault actualizada.")
+        # Si hay un agente en marcha (aunque esté bloqueado), las siguientes ejecuciones ya no la pedirán
+        key_agent.add_key(key)
     
     return key
 
@@ -109,23 +128,20 @@ def save_password(password, key):
 def load_or_create_vault(key):
     """
     Carga el vault existente o crea uno nuevo si no existe.
-    Si el archivo del vault está vacío o no existe, se crea un nuevo vault vacío.
+    Si no hay copia del vault ni log de cambios, se crea un nuevo vault vacío.
 
     Args:
         key (bytes): La clave de cifrado utilizada para descifrar el contenido del vault.
 
     Returns:
-        dict: El vault cargado o un nuevo vault vacío.
+        Vault: El vault cargado o un nuevo vault vacío (los contenedores se descifran al consultarlos).
     """
-    if not os.path.exists(DATA_FILE) or os.stat(DATA_FILE).st_size == 0:
+    if not storage.vault_exists():
         print("El archivo del vault no existe o está vacío, creando un nuevo vault.")
-        return {}
+        return Vault({}, key)
     else:
         try:
-            with open(DATA_FILE, 'r') as file:
-                encrypted_vault = file.read()
-            decrypted_vault = json.loads(decrypt_data(encrypted_vault, key))
-            return decrypted_vault
+            return Vault(storage.load_data(key), key)
         except Exception as e:
             print(f"No se pudo cargar el vault debido a un error: {e}")
             return None
@@ -150,56 +166,268 @@ def main():
         print(f"Error al manejar el vault: {e}")
         return
 
-    # Interfaz de usuario para la gestión de contenedores dentro del vault
-    while True:
-        print("\nOperaciones disponibles:")
-        print("1. Crear contenedor")
-        print("2. Editar contenedor")
-        print("3. Borrar contenedor")
-        print("4. Visualizar contenedor")
-        print("5. Listar todos los contenedores")
-        print("6. Guardar cambios y salir")
-        print("7. Subir copia de seguridad a Google Drive")
-        choice = input("Selecciona una opción: ")
-
-        if choice == "1":
-            containers.create_container(vault, key)
-        elif choice == "2":
-            containers.edit_container(vault, key)
-        elif choice == "3":
-            container_name = input("Introduce el nombre del contenedor que deseas borrar: ")
-            containers.delete_container(vault, container_name)
-        elif choice == "4":
-            container_name = input("Introduce el nombre del contenedor que deseas visualizar: ")
-            containers.view_container(vault, key, container_name)
-        elif choice == "5":
-            containers.list_containers(vault)
-        elif choice == "6":
-            save_vault_changes(vault, key)
-            print("Saliendo...")
-            exit()
-        elif choice == "7":
-            try:
-                # Autenticar al usuario y obtener el servicio de Google Drive
-                service = authenticate_google_drive()
-                # Definir el nombre del archivo y el tipo MIME
-                file_path = "vault.json"
-                mime_type = "application/json"
-                # Subir el archivo
-                upload_file(service, file_path, mime_type)
-            except Exception as e:
-                print(f"Error al subir la copia de seguridad: {e}")
-
-        else:
-            print("Opción no válida. Por favor, intenta de nuevo.")
-
-        # Guarda cualquier cambio realizado en el vault
-        try:
-            encrypted_vault = encryption.encrypt_data(json.dumps(vault), key)
-            with open(DATA_FILE, 'w') as data_file:
-                data_file.write(encrypted_vault)
-        except Exception as e:
-            print(f"Error al guardar el vault: {e}")
+    # Interfaz de usuario para la gestión de contenedores dentro del vault. Cada operación solo
+    # añade sus registros al log de cambios; la copia completa se escribe al salir o cuando el
+    # compactador, en segundo plano, detecta que el vault acumula demasiadas versiones sustituidas
+    writer = WriteBehind(vault, key)
+    compactor = Compactor(vault, key, writer.lock)
+    compactor.start()
+    try:
+        while True:
+            print("\nOperaciones disponibles:")
+            print("1. Crear contenedor")
+            print("2. Editar contenedor")
+            print("3. Borrar contenedor")
+            print("4. Visualizar contenedor")
+            print("5. Listar todos los contenedores")
+            print("6. Guardar cambios y salir")
+            print("7. Subir copia de seguridad a Google Drive")
+            print("8. Adjuntar archivo como contenedor")
+            print("9. Exportar archivo de un contenedor")
+            print("10. Ver historial y restaurar revisiones")
+            print("11. Buscar contenedores por contenido")
+            print("12. Editar etiquetas y metadatos de un contenedor")
+            print("13. Filtrar contenedores por metadatos")
+            print("14. Importar contenedores (JSON Lines o CSV)")
+            print("15. Exportar contenedores (JSON Lines o CSV)")
+            print("16. Cambiar la contraseña")
+            print("17. Renovar la clave de cifrado de un contenedor")
+            choice = input("Selecciona una opción: ")
+
+            with writer.lock:  # La compactación espera a que termine la operación
+                if choice == "1":
+                    containers.create_container(vault, key)
+                elif choice == "2":
+                    containers.edit_container(vault, key)
+                elif choice == "3":
+                    container_name = input("Introduce el nombre del contenedor que deseas borrar: ")
+                    containers.delete_container(vault, key, container_name)
+                elif choice == "4":
+                    container_name = input("Introduce el nombre del contenedor que deseas visualizar: ")
+                    containers.view_container(vault, key, container_name)
+                elif choice == "5":
+                    containers.list_containers(vault, key)
+                elif choice == "6":
+                    writer.flush()
+                    print("Cambios guardados exitosamente.")
+                    vault.clear_cache()
+                    print("Saliendo...")
+                    exit()
+                elif choice == "7":
+                    try:
+                        # Autenticar al usuario y obtener el servicio de Google Drive
+                        service = authenticate_google_drive()
+                        # Empaquetar la copia completa (con los cambios del log), la cabecera y los directorios de datos
+                        file_path = storage.create_backup(vault, key)
+                        if file_path is None:
+                            print("No se pudo preparar la copia de seguridad.")
+                        else:
+                            # Subir el archivo
+                            upload_file(service, file_path, "application/x-tar")
+                            os.remove(file_path)
+                            print(f"Versión del vault copiada: {vault.version_id()}")
+                    except Exception as e:
+                        print(f"Error al subir la copia de seguridad: {e}")
+                elif choice == "8":
+                    containers.attach_file(vault, key)
+                elif choice == "9":
+                    try:
+                        containers.export_attached_file(vault, key)
+                    except Exception as e:
+                        print(f"Error al exportar el archivo: {e}")
+                elif choice == "10":
+                    containers.restore_revision(vault, key)
+                elif choice == "11":
+                    containers.search_containers(vault, key)
+                elif choice == "12":
+                    containers.edit_metadata(vault, key)
+                elif choice == "13":
+                    containers.filter_containers(vault, key)
+                elif choice == "14":
+                    import_path = input("Ruta del archivo a importar (.jsonl o .csv): ")
+                    try:
+                        print(f"{bulk_io.import_containers(vault, key, import_path)} contenedores importados.")
+                    except Exception as e:
+                        print(f"Error al importar los contenedores: {e}")
+                elif choice == "15":
+                    export_path = input("Ruta del archivo de destino (.jsonl o .csv): ")
+                    try:
+                        exported, skipped = bulk_io.export_containers(vault, key, export_path)
+                        print(f"{exported} contenedores exportados ({skipped} contenedores de archivo omitidos).")
+                    except Exception as e:
+                        print(f"Error al exportar los contenedores: {e}")
+                elif choice == "16":
+                    change_password(key)
+                elif choice == "17":
+                    container_name = input("Introduce el nombre del contenedor cuya clave deseas renovar: ")
+                    if containers.renew_container_key(vault, key, container_name):
+                        print(f"Clave de cifrado de '{container_name}' renovada.")
+                    else:
+                        print("El contenedor especificado no existe.")
+
+                else:
+                    print("Opción no válida. Por favor, intenta de nuevo.")
+    finally:
+        compactor.stop()
+        writer.flush()
+
+def view_single_container(name):
+    """
+    Muestra el contenido de un único contenedor sin cargar el vault completo.
+
+    Args:
+        name (str): El nombre del contenedor a visualizar.
+    """
+    key = initialize_system()
+    try:
+        encrypted_content = storage.read_container(key, name)
+    except Exception as e:
+        print(f"No se pudo leer el contenedor debido a un error: {e}")
+        return
+    if encrypted_content is None:
+        print("El contenedor especificado no existe.")
+    else:
+        print(f"Contenido del contenedor '{name}': {decrypt_container(encrypted_content, key, name)}")
+
+def bulk_command(command, path):
+    """
+    Importa o exporta contenedores desde la línea de comandos, sin pasar por el menú.
+
+    Args:
+        command (str): "importar" o "exportar".
+        path (str): La ruta del archivo JSON Lines o CSV.
+    """
+    key = initialize_system()
+    vault = load_or_create_vault(key)
+    if vault is None:
+        return
+    if command == "importar":
+        print(f"{bulk_io.import_containers(vault, key, path)} contenedores importados.")
+    else:
+        exported, skipped = bulk_io.export_containers(vault, key, path)
+        print(f"{exported} contenedores exportados ({skipped} contenedores de archivo omitidos).")
+
+def agent_command(command, seconds=None):
+    """
+    Gestiona el agente de claves desde la línea de comandos.
+
+    Args:
+        command (str): "desbloquear" (lanza el agente si hace falta y le entrega la clave),
+            "bloquear" (borra la clave del agente), "caducidad" (cambia el tiempo que la conserva),
+            "agente" (muestra su estado) o "detener-agente".
+        seconds (str): Los segundos que el agente conserva la clave, para "desbloquear" y "caducidad".
+    """
+    ttl = float(seconds) if seconds is not None else None
+    if command == "desbloquear":
+        if not key_agent.start_agent():
+            print("No se pudo iniciar el agente de claves.")
+            return
+        key = initialize_system()
+        key_agent.add_key(key, ttl)
+        print(f"Agente desbloqueado durante {key_agent.status()['expires_in']:.0f} segundos.")
+        return
+
+    if command == "bloquear":
+        done = key_agent.lock()
+    elif command == "caducidad":
+        if ttl is None:
+            print("Indica los segundos que el agente conserva la clave.")
+            return
+        done = key_agent.set_timeout(ttl)
+    elif command == "detener-agente":
+        done = key_agent.stop()
+    else:
+        status = key_agent.status()
+        done = status is not None
+        if done:
+            state = "bloqueado" if status["locked"] else f"desbloqueado ({status['expires_in']:.0f} s restantes)"
+            print(f"Agente en marcha (pid {status['pid']}): {state}; conserva la clave {status['ttl']:.0f} s.")
+    if not done:
+        print("No hay ningún agente de claves en marcha.")
+
+def change_password(key):
+    """
+    Cambia la contraseña de SecureBox. La clave del vault no cambia, solo se vuelve a envolver
+    con la derivada de la nueva contraseña, así que el coste no depende del tamaño del vault.
+
+    Args:
+        key (bytes): La clave de cifrado del vault.
+    """
+    old_password = getpass("Contraseña actual: ")
+    new_password = getpass("Nueva contraseña: ")
+    if new_password != getpass("Confirma la nueva contraseña: "):
+        print("Las contraseñas no coinciden.")
+    elif kdf.change_password(old_password, new_password, key):
+        print("Contraseña cambiada exitosamente.")
+    else:
+        print("La contraseña actual es incorrecta.")
+
+def calibrate_command(seconds=None, algorithm=None):
+    """
+    Calibra la derivación de la contraseña para esta máquina: elige los parámetros con los que
+    desbloquear el vault tarda el tiempo indicado. Se aplican en el siguiente inicio de sesión.
+
+    Args:
+        seconds (str): El tiempo de desbloqueo buscado (por defecto, `kdf.TARGET_UNLOCK_SECONDS`).
+        algorithm (str): El algoritmo (ver `kdf.ALGORITHMS`; por defecto, scrypt).
+    """
+    target_seconds = float(seconds) if seconds is not None else kdf.TARGET_UNLOCK_SECONDS
+    algorithm = algorithm or kdf.DEFAULT_PARAMS["algorithm"]
+    if algorithm not in kdf.ALGORITHMS:
+        print(f"Algoritmo desconocido. Disponibles: {', '.join(kdf.ALGORITHMS)}")
+        return
+    params = kdf.calibrate(target_seconds, algorithm)
+    print(f"Parámetros elegidos: {params} ({kdf.time_derivation(params) * 1000:.0f} ms por desbloqueo).")
+    if not kdf.has_header():
+        print("El vault aún no tiene contraseña; se usarán los parámetros por defecto al configurarla.")
+        return
+    kdf.set_target(params)
+    if kdf.needs_rehash():
+        print("Se aplicarán en el próximo inicio de sesión.")
+    else:
+        print("Los parámetros actuales ya son al menos igual de costosos; no se cambiarán.")
+
+def compression_command(codec=None):
+    """
+    Muestra o cambia el códec de compresión del vault. El cambio se aplica a lo que se guarde a
+    partir de ahora; los contenedores ya guardados se siguen leyendo igual.
+
+    Args:
+        codec (str): "zlib", "lzma" o "ninguno"; sin indicarlo, se muestra el actual.
+    """
+    initialize_system()  # Solo el propietario del vault puede cambiar sus ajustes
+    if codec is None:
+        print(f"Códec de compresión del vault: {kdf.load_header()['compression'] or 'ninguno'}")
+        return
+    codec = None if codec == "ninguno" else codec
+    if codec not in compression.CODEC_IDS:
+        print("Códec desconocido. Disponibles: zlib, lzma, ninguno")
+        return
+    kdf.set_compression(codec)
+    print(f"Códec de compresión del vault: {codec or 'ninguno'}.")
+
+def version_command():
+    """
+    Muestra el identificador de versión del vault (la raíz de su árbol de Merkle), que permite
+    comprobar si dos copias del vault tienen exactamente el mismo contenido.
+    """
+    key = initialize_system()
+    vault = load_or_create_vault(key)
+    if vault is not None:
+        print(f"Versión del vault: {vault.version_id()} ({len(vault)} contenedores)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == "ver":
+        view_single_container(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] in ("importar", "exportar"):
+        bulk_command(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) in (2, 3) and sys.argv[1] in ("desbloquear", "bloquear", "caducidad", "agente", "detener-agente"):
+        agent_command(*sys.argv[1:])
+    elif 2 <= len(sys.argv) <= 4 and sys.argv[1] == "calibrar":
+        calibrate_command(*sys.argv[2:])
+    elif len(sys.argv) in (2, 3) and sys.argv[1] == "compresion":
+        compression_command(*sys.argv[2:])
+    elif len(sys.argv) == 2 and sys.argv[1] == "version":
+        version_command()
+    else:
+        main()
\ No newline at end of file
@@ -1,11 +1,15 @@
 import tkinter as tk
-from tkinter import simpledialog, messagebox
+from tkinter import simpledialog, messagebox, filedialog
 import json
-import encryption
+import os
 import containers
 import google_drive_integration as gdrive
 import system_init as sysinit
 import containers_ui
+import storage
+import bulk_io
+import compactor
+import kdf
 
 class SecureBoxUI:
     def __init__(self, master):
@@ -31,6 +35,15 @@ class SecureBoxUI:
         if self.vault is None:
             master.quit()  # Salir si la carga/creación del vault falla
             return
+
+        # Cada cambio se guarda al hacerlo en el log de cambios; la copia completa la escriben
+        # el compactador o la salida de la aplicación, como en la línea de comandos
+        master.protocol("WM_DELETE_WINDOW", self.quit)
+
+        # Compactación en segundo plano cuando el vault acumula demasiadas versiones sustituidas
+        self.compactor = compactor.Compactor(self.vault, self.key)
+        self.compaction_job = None
+        self.schedule_compaction()
         
         self.label = tk.Label(master, text="¡Bienvenido a SecureBox!")
         self.label.pack()
@@ -50,10 +63,40 @@ class SecureBoxUI:
         self.list_containers_button = tk.Button(master, text="Listar todos los contenedores", command=self.list_containers)
         self.list_containers_button.pack()
 
+        self.attach_file_button = tk.Button(master, text="Adjuntar archivo", command=self.attach_file)
+        self.attach_file_button.pack()
+
+        self.export_file_button = tk.Button(master, text="Exportar archivo", command=self.export_file)
+        self.export_file_button.pack()
+
+        self.history_button = tk.Button(master, text="Historial de revisiones", command=self.show_history)
+        self.history_button.pack()
+
+        self.search_button = tk.Button(master, text="Buscar por contenido", command=self.search_containers)
+        self.search_button.pack()
+
+        self.metadata_button = tk.Button(master, text="Editar metadatos", command=self.edit_metadata)
+        self.metadata_button.pack()
+
+        self.filter_button = tk.Button(master, text="Filtrar por metadatos", command=self.filter_containers)
+        self.filter_button.pack()
+
+        self.import_button = tk.Button(master, text="Importar contenedores", command=self.import_containers)
+        self.import_button.pack()
+
+        self.export_button = tk.Button(master, text="Exportar contenedores", command=self.export_containers)
+        self.export_button.pack()
+
+        self.change_password_button = tk.Button(master, text="Cambiar contraseña", command=self.change_password)
+        self.change_password_button.pack()
+
+        self.rekey_button = tk.Button(master, text="Renovar la clave de un contenedor", command=self.renew_container_key)
+        self.rekey_button.pack()
+
         self.upload_backup_button = tk.Button(master, text="Subir copia de seguridad a Google Drive", command=self.upload_backup)
         self.upload_backup_button.pack()
 
-        self.quit_button = tk.Button(master, text="Salir", command=master.quit)
+        self.quit_button = tk.Button(master, text="Salir", command=self.quit)
         self.quit_button.pack()
 
     def create_container(self):
@@ -65,7 +108,6 @@ class SecureBoxUI:
         if name and content:
             containers_ui.create_container_ui(self.vault, self.key, name, content)
             messagebox.showinfo("Información", "Contenedor creado con éxito.")
-            self.save_vault()
         else:
             messagebox.showerror("Error", "Debe proporcionar tanto el nombre como el contenido para el contenedor.")
 
@@ -79,7 +121,6 @@ class SecureBoxUI:
             if content:  # Asegurarse de que se haya ingresado contenido
                 containers_ui.edit_container_ui(self.vault, self.key, name, content)
                 messagebox.showinfo("Información", f"Contenedor '{name}' editado con éxito.")
-                self.save_vault()
             else:
                 messagebox.showerror("Error", "Debe proporcionar el contenido para el contenedor.")
 
@@ -91,7 +132,6 @@ class SecureBoxUI:
         if name in self.vault:
             containers_ui.delete_container_ui(self.vault, self.key, name)
             messagebox.showinfo("Información", f"Contenedor '{name}' borrado con éxito.")
-            self.save_vault()
         else:
             messagebox.showerror("Error", "Contenedor no encontrado.")
 
@@ -107,9 +147,138 @@ class SecureBoxUI:
 
     def list_containers(self):
         """
-        Lista todos los contenedores existentes en el vault.
+        Lista por páginas los contenedores del vault, opcionalmente filtrados por un prefijo.
+        """
+        prefix = simpledialog.askstring("Input", "Prefijo de los contenedores (vacío para todos):", parent=self.master)
+        if prefix is None:
+            return
+        cursor = containers_ui.list_containers_ui(self.vault, self.key, prefix)
+        while cursor is not None and messagebox.askyesno("Contenedores", "¿Ver la página siguiente?"):
+            cursor = containers_ui.list_containers_ui(self.vault, self.key, prefix, cursor)
+
+    def attach_file(self):
+        """
+        Solicita al usuario un nombre y un archivo del disco, y lo guarda cifrado como contenedor de archivo.
+        """
+        name = simpledialog.askstring("Input", "Nombre del contenedor:", parent=self.master)
+        source_path = filedialog.askopenfilename(parent=self.master, title="Archivo a adjuntar")
+        if name and source_path:
+            containers_ui.attach_file_ui(self.vault, self.key, name, source_path)
+            messagebox.showinfo("Información", "Archivo adjuntado con éxito.")
+        else:
+            messagebox.showerror("Error", "Debe proporcionar tanto el nombre como el archivo.")
+
+    def export_file(self):
+        """
+        Descifra el archivo de un contenedor de archivo y lo guarda donde indique el usuario.
+        """
+        name = simpledialog.askstring("Input", "Nombre del contenedor de archivo:", parent=self.master)
+        if name and name in self.vault:
+            destination_path = filedialog.asksaveasfilename(parent=self.master, title="Guardar archivo como")
+            if destination_path:
+                try:
+                    containers_ui.export_file_ui(self.vault, self.key, name, destination_path)
+                except Exception as e:
+                    messagebox.showerror("Error", f"No se pudo exportar el archivo: {e}")
+        else:
+            messagebox.showerror("Error", "Contenedor no encontrado.")
+
+    def show_history(self):
+        """
+        Muestra las revisiones de un contenedor y permite restaurar una de ellas.
+        """
+        name = simpledialog.askstring("Input", "Nombre del contenedor:", parent=self.master)
+        if not name:
+            return
+        revisions = containers_ui.list_revisions_ui(self.vault, self.key, name)
+        if revisions:
+            rev = simpledialog.askinteger("Input", "Revisión a restaurar (cancelar para salir):", parent=self.master)
+            if rev is not None:
+                containers_ui.restore_revision_ui(self.vault, self.key, name, rev)
+
+    def search_containers(self):
+        """
+        Busca los contenedores cuyo contenido incluye los términos indicados.
+        """
+        query = simpledialog.askstring("Input", "Términos a buscar:", parent=self.master)
+        if query:
+            containers_ui.search_containers_ui(self.vault, self.key, query)
+
+    def edit_metadata(self):
+        """
+        Solicita al usuario un contenedor y sus nuevas etiquetas, entorno y propietario (vacío para conservarlos).
         """
-        containers_ui.list_containers_ui(self.vault)
+        name = simpledialog.askstring("Input", "Nombre del contenedor:", parent=self.master)
+        if not name:
+            return
+        tags = simpledialog.askstring("Input", "Etiquetas separadas por comas:", parent=self.master)
+        env = simpledialog.askstring("Input", "Entorno (por ejemplo, prod):", parent=self.master)
+        owner = simpledialog.askstring("Input", "Propietario:", parent=self.master)
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None
+        containers_ui.edit_metadata_ui(self.vault, self.key, name, tags, env or None, owner or None)
+
+    def filter_containers(self):
+        """
+        Solicita al usuario los filtros de metadatos y muestra los contenedores que los cumplen.
+        """
+        tags = simpledialog.askstring("Input", "Etiquetas (vacío para cualquiera):", parent=self.master) or ""
+        env = simpledialog.askstring("Input", "Entorno (vacío para cualquiera):", parent=self.master)
+        owner = simpledialog.askstring("Input", "Propietario (vacío para cualquiera):", parent=self.master)
+        days = simpledialog.askinteger("Input", "Modificados en los últimos N días (cancelar para cualquier fecha):", parent=self.master)
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        containers_ui.filter_containers_ui(self.vault, self.key, tags, env or None, owner or None, days)
+
+    def import_containers(self):
+        """
+        Importa contenedores desde un archivo JSON Lines o CSV elegido por el usuario.
+        """
+        import_path = filedialog.askopenfilename(parent=self.master, title="Archivo a importar",
+                                                 filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")])
+        if import_path:
+            try:
+                imported = bulk_io.import_containers(self.vault, self.key, import_path)
+                messagebox.showinfo("Información", f"{imported} contenedores importados.")
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudieron importar los contenedores: {e}")
+
+    def export_containers(self):
+        """
+        Exporta los contenedores de texto a un archivo JSON Lines o CSV elegido por el usuario.
+        """
+        export_path = filedialog.asksaveasfilename(parent=self.master, title="Exportar contenedores",
+                                                   defaultextension=".jsonl",
+                                                   filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")])
+        if export_path:
+            try:
+                exported, skipped = bulk_io.export_containers(self.vault, self.key, export_path)
+                messagebox.showinfo("Información", f"{exported} contenedores exportados ({skipped} contenedores de archivo omitidos).")
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudieron exportar los contenedores: {e}")
+
+    def change_password(self):
+        """
+        Cambia la contraseña de SecureBox: solo se vuelve a envolver la clave del vault.
+        """
+        old_password = simpledialog.askstring("Contraseña", "Contraseña actual:", parent=self.master, show='*')
+        new_password = simpledialog.askstring("Contraseña", "Nueva contraseña:", parent=self.master, show='*')
+        if old_password is None or new_password is None:
+            return
+        if new_password != simpledialog.askstring("Contraseña", "Confirma la nueva contraseña:", parent=self.master, show='*'):
+            messagebox.showerror("Error", "Las contraseñas no coinciden.")
+        elif kdf.change_password(old_password, new_password, self.key):
+            messagebox.showinfo("Información", "Contraseña cambiada con éxito.")
+        else:
+            messagebox.showerror("Error", "La contraseña actual es incorrecta.")
+
+    def renew_container_key(self):
+        """
+        Vuelve a cifrar un contenedor con una clave de datos nueva.
+        """
+        name = simpledialog.askstring("Input", "Nombre del contenedor:", parent=self.master)
+        if containers.renew_container_key(self.vault, self.key, name):
+            messagebox.showinfo("Información", f"Contenedor '{name}' cifrado con una clave nueva.")
+        else:
+            messagebox.showerror("Error", "Contenedor no encontrado.")
 
     def upload_backup(self):
         """
@@ -117,23 +286,51 @@ class SecureBoxUI:
         """
         try:
             service = gdrive.authenticate_google_drive()
-            file_path = "vault.json"
-            mime_type = "application/json"
-            gdrive.upload_file(service, file_path, mime_type)
-            messagebox.showinfo("Backup", "Copia de seguridad subida con éxito a Google Drive.")
+            file_path = storage.create_backup(self.vault, self.key)
+            if file_path is None:
+                messagebox.showerror("Error", "No se pudo preparar la copia de seguridad.")
+                return
+            gdrive.upload_file(service, file_path, "application/x-tar")
+            os.remove(file_path)
+            messagebox.showinfo("Backup", "Copia de seguridad subida con éxito a Google Drive.\n"
+                                          f"Versión del vault: {self.vault.version_id()}")
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo subir la copia de seguridad: {e}")
 
-    def save_vault(self):
+    def quit(self):
         """
-        Guarda los cambios realizados en el vault.
+        Detiene la compactación (esperando a la que esté en curso), guarda los cambios pendientes,
+        borra de memoria los contenidos descifrados y cierra la aplicación.
+        """
+        if self.compaction_job is not None:
+            self.master.after_cancel(self.compaction_job)
+        self.compactor.stop()
+        self.save_vault()
+        self.vault.clear_cache()
+        self.master.quit()
+
+    def schedule_compaction(self):
+        """
+        Comprueba cada `compactor.CHECK_INTERVAL_SECONDS` si hay que compactar el vault. La
+        comprobación y la copia de los datos vivos se hacen en el hilo de la interfaz, entre
+        dos operaciones; la escritura, en un hilo de fondo.
         """
-        # Guarda el vault actualizado utilizando la clave
         try:
-            encryption.save_vault_changes(self.vault, self.key)
-            messagebox.showinfo("Información", "Cambios guardados exitosamente.")
+            self.compactor.check(background=True)
         except Exception as e:
-            messagebox.showerror("Error", f"Error al guardar los cambios en el vault: {e}")
+            print(f"Error al comprobar la compactación del vault: {e}")
+        self.compaction_job = self.master.after(int(compactor.CHECK_INTERVAL_SECONDS * 1000), self.schedule_compaction)
+
+    def save_vault(self):
+        """
+        Guarda los cambios realizados en el vault, solo si los hay.
+        """
+        if not self.vault.dirty:
+            return
+        # Guarda la copia completa en el formato del vault (ver `storage.open_store`), si la necesita
+        storage.flush(self.vault, self.key)
+        if self.vault.dirty:
+            messagebox.showerror("Error", "Error al guardar los cambios en el vault.")
 
 root = tk.Tk()
 my_gui = SecureBoxUI(root)
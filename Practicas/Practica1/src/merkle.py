@@ -0,0 +1,228 @@
+from hashlib import sha256
+
+TREE_DEPTH = 16  # El árbol tiene 2**16 hojas; cada hoja agrupa los contenedores cuyo nombre cae en ella
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def leaf_position(name):
+    """
+    Devuelve la hoja del árbol en la que se guarda un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+
+    Returns:
+    - position (int): El índice de la hoja.
+    """
+    return int.from_bytes(sha256(name.encode('utf-8')).digest()[:4], 'big') >> (32 - TREE_DEPTH)
+
+def entry_hash(name, value):
+    """
+    Calcula el hash de un contenedor a partir de su nombre y su contenido cifrado.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - value (str): El contenedor cifrado.
+
+    Returns:
+    - digest (bytes): El hash del contenedor.
+    """
+    name_bytes = name.encode('utf-8')
+    return sha256(len(name_bytes).to_bytes(4, 'big') + name_bytes + value.encode('utf-8')).digest()
+
+def empty_hashes():
+    """
+    Calcula el hash de un subárbol vacío en cada nivel, para no tener que guardar esos nodos.
+
+    Returns:
+    - hashes (list): El hash vacío de cada nivel, desde las hojas hasta la raíz.
+    """
+    hashes = [sha256(LEAF_PREFIX).digest()]
+    for _ in range(TREE_DEPTH):
+        hashes.append(sha256(NODE_PREFIX + hashes[-1] + hashes[-1]).digest())
+    return hashes
+
+EMPTY_HASHES = empty_hashes()
+
+class MerkleTree:
+    def __init__(self, items=()):
+        """
+        Inicializa un árbol de Merkle disperso sobre los contenedores del vault.
+
+        Args:
+            items (iterable): Pares (nombre, contenedor cifrado) con los que construir el árbol.
+
+        Solo se guardan los nodos que no están vacíos, y cada cambio recalcula únicamente
+        el camino desde su hoja hasta la raíz (`TREE_DEPTH` hashes).
+        """
+        self.buckets = {}  # posición de la hoja -> {nombre: hash del contenedor}
+        self.nodes = {}  # (nivel, índice) -> hash, solo para los nodos no vacíos
+        for name, value in items:
+            self.buckets.setdefault(leaf_position(name), {})[name] = entry_hash(name, value)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Recalcula todos los nodos a partir de las hojas, de abajo arriba.
+        """
+        self.nodes = {(0, position): self.bucket_hash(position) for position in self.buckets}
+        level_indices = set(self.buckets)
+        for level in range(TREE_DEPTH):
+            level_indices = {index >> 1 for index in level_indices}
+            for index in level_indices:
+                self.nodes[(level + 1, index)] = self.parent_hash(level, index)
+
+    def bucket_hash(self, position):
+        """
+        Calcula el hash de una hoja a partir de los contenedores que agrupa, ordenados por nombre.
+
+        Args:
+            position (int): El índice de la hoja.
+
+        Returns:
+            bytes: El hash de la hoja.
+        """
+        bucket = self.buckets.get(position)
+        if not bucket:
+            return EMPTY_HASHES[0]
+        return sha256(LEAF_PREFIX + b"".join(bucket[name] for name in sorted(bucket))).digest()
+
+    def node(self, level, index):
+        """
+        Devuelve el hash de un nodo, o el hash vacío de su nivel si no se guarda.
+        """
+        return self.nodes.get((level, index), EMPTY_HASHES[level])
+
+    def parent_hash(self, level, index):
+        """
+        Calcula el hash del nodo `index` del nivel `level + 1` a partir de sus dos hijos.
+        """
+        return sha256(NODE_PREFIX + self.node(level, index * 2) + self.node(level, index * 2 + 1)).digest()
+
+    def set_node(self, level, index, digest):
+        """
+        Guarda el hash de un nodo, o lo descarta si es el hash vacío de su nivel.
+        """
+        if digest == EMPTY_HASHES[level]:
+            self.nodes.pop((level, index), None)
+        else:
+            self.nodes[(level, index)] = digest
+
+    def update_path(self, position):
+        """
+        Recalcula los nodos desde una hoja hasta la raíz.
+
+        Args:
+            position (int): El índice de la hoja modificada.
+        """
+        self.set_node(0, position, self.bucket_hash(position))
+        index = position
+        for level in range(TREE_DEPTH):
+            index >>= 1
+            self.set_node(level + 1, index, self.parent_hash(level, index))
+
+    def put(self, name, value):
+        """
+        Añade o actualiza un contenedor en el árbol.
+
+        Args:
+            name (str): El nombre del contenedor.
+            value (str): El contenedor cifrado.
+        """
+        position = leaf_position(name)
+        self.buckets.setdefault(position, {})[name] = entry_hash(name, value)
+        self.update_path(position)
+
+    def put_many(self, items):
+        """
+        Añade o actualiza muchos contenedores a la vez, recalculando cada nodo afectado una sola vez
+        en lugar de un camino completo por contenedor.
+
+        Args:
+            items (iterable): Pares (nombre, contenedor cifrado).
+        """
+        positions = set()
+        for name, value in items:
+            position = leaf_position(name)
+            self.buckets.setdefault(position, {})[name] = entry_hash(name, value)
+            positions.add(position)
+        for position in positions:
+            self.set_node(0, position, self.bucket_hash(position))
+        for level in range(TREE_DEPTH):
+            positions = {index >> 1 for index in positions}
+            for index in positions:
+                self.set_node(level + 1, index, self.parent_hash(level, index))
+
+    def remove(self, name):
+        """
+        Quita un contenedor del árbol, si estaba.
+
+        Args:
+            name (str): El nombre del contenedor.
+        """
+        position = leaf_position(name)
+        bucket = self.buckets.get(position)
+        if bucket is None or bucket.pop(name, None) is None:
+            return
+        if not bucket:
+            del self.buckets[position]
+        self.update_path(position)
+
+    def clear(self):
+        """
+        Vacía el árbol.
+        """
+        self.buckets.clear()
+        self.nodes.clear()
+
+    def root(self):
+        """
+        Devuelve la raíz del árbol, que resume el contenido cifrado de todo el vault.
+
+        Returns:
+            bytes: El hash raíz.
+        """
+        return self.node(TREE_DEPTH, 0)
+
+def vault_digest(vault):
+    """
+    Devuelve el resumen de Merkle de un vault.
+
+    Args:
+    - vault (dict): El vault; si es un `Vault`, se usa el árbol que mantiene al modificarse.
+
+    Returns:
+    - digest (bytes): La raíz del árbol de Merkle de sus contenedores.
+    """
+    if hasattr(vault, "digest"):
+        return vault.digest()
+    return MerkleTree(vault.items()).root()
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import json
+    import os
+    import time
+
+    vault = {f"contenedor{i}": os.urandom(48).hex() for i in range(100000)}
+    tree = MerkleTree(vault.items())
+    assert tree.root() == MerkleTree(reversed(list(vault.items()))).root(), "La raíz depende del orden de inserción."
+
+    start = time.perf_counter()
+    for i in range(1000):
+        vault[f"contenedor{i}"] = os.urandom(48).hex()
+        tree.put(f"contenedor{i}", vault[f"contenedor{i}"])
+    incremental = (time.perf_counter() - start) / 1000
+    assert tree.root() == MerkleTree(vault.items()).root(), "La actualización incremental no coincide con el árbol completo."
+
+    root = tree.root()
+    tree.put("extra", "valor")
+    tree.remove("extra")
+    assert tree.root() == root, "Añadir y quitar un contenedor cambia la raíz."
+
+    start = time.perf_counter()
+    for _ in range(10):
+        sha256(json.dumps(vault, sort_keys=True).encode()).digest()
+    full = (time.perf_counter() - start) / 10
+    print(f"Actualización incremental: {incremental * 1e6:.1f} µs; hash completo del vault: {full * 1e3:.1f} ms")
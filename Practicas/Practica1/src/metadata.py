@@ -0,0 +1,265 @@
+import bisect
+import getpass
+import json
+import os
+import time
+from contextlib import contextmanager
+from encryption import encrypt_data, decrypt_data
+import safe_io
+
+METADATA_FILE = 'metadata.dat'
+INDEXED_FIELDS = ("tags", "env", "owner")  # Campos con índice invertido
+
+_tables = {}  # ruta -> (clave, tabla de metadatos, índices)
+_unsaved = set()  # rutas de las tablas modificadas dentro de `batch`
+_batch_depth = 0
+_default_owner = None
+
+def build_indexes(table):
+    """
+    Construye los índices invertidos de la tabla de metadatos.
+
+    Args:
+    - table (dict): nombre del contenedor -> metadatos.
+
+    Returns:
+    - indexes (dict): Para cada campo de `INDEXED_FIELDS`, valor -> conjunto de nombres; y en
+      "modified", la lista ordenada de pares (fecha de modificación, nombre).
+    """
+    indexes = {field: {} for field in INDEXED_FIELDS}
+    for name, meta in table.items():
+        add_to_indexes(indexes, name, meta)
+    indexes["modified"] = sorted((meta["modified"], name) for name, meta in table.items())
+    return indexes
+
+def field_values(meta, field):
+    """
+    Devuelve los valores de un campo como lista (las etiquetas ya lo son; el resto tiene un único valor o ninguno).
+    """
+    value = meta.get(field)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def add_to_indexes(indexes, name, meta):
+    """
+    Añade un contenedor a los índices invertidos de sus campos (el índice de fechas se actualiza aparte).
+    """
+    for field in INDEXED_FIELDS:
+        for value in field_values(meta, field):
+            indexes[field].setdefault(value, set()).add(name)
+
+def remove_from_indexes(indexes, name, meta):
+    """
+    Quita un contenedor de todos los índices, incluido el de fechas de modificación.
+    """
+    for field in INDEXED_FIELDS:
+        for value in field_values(meta, field):
+            names = indexes[field].get(value)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del indexes[field][value]
+    position = bisect.bisect_left(indexes["modified"], (meta["modified"], name))
+    if position < len(indexes["modified"]) and indexes["modified"][position] == (meta["modified"], name):
+        del indexes["modified"][position]
+
+def load_table(key, path=METADATA_FILE):
+    """
+    Carga la tabla de metadatos y sus índices, o los devuelve de memoria si ya se cargaron.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la tabla.
+
+    Returns:
+    - table (dict): nombre del contenedor -> metadatos.
+    - indexes (dict): Los índices invertidos (ver `build_indexes`).
+    """
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    table = {}
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            table = json.loads(decrypt_data(file.read(), key))
+    indexes = build_indexes(table)
+    _tables[path] = (key, table, indexes)
+    return table, indexes
+
+def save_table(table, key, path=METADATA_FILE):
+    """
+    Cifra y guarda la tabla de metadatos de forma atómica. Se cifra aparte de los contenedores,
+    así que consultarla nunca descifra su contenido. Dentro de `batch` se guarda una sola vez al final.
+
+    Args:
+    - table (dict): nombre del contenedor -> metadatos.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la tabla.
+    """
+    if _batch_depth:
+        _unsaved.add(path)
+        return
+    safe_io.atomic_write(path, encrypt_data(json.dumps(table, separators=(',', ':')), key))
+
+@contextmanager
+def batch(key):
+    """
+    Agrupa muchas modificaciones de metadatos en una única escritura de la tabla.
+
+    Uso:
+        with metadata.batch(key):
+            ...  # varias llamadas a update_metadata/remove_metadata
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    """
+    global _batch_depth
+    _batch_depth += 1
+    try:
+        yield
+    finally:
+        _batch_depth -= 1
+        if not _batch_depth:
+            for path in list(_unsaved):
+                _unsaved.discard(path)
+                save_table(load_table(key, path)[0], key, path)
+
+def default_owner():
+    """
+    Devuelve el propietario que se asigna a los contenedores nuevos: el usuario del sistema.
+    """
+    global _default_owner
+    if _default_owner is None:
+        _default_owner = getpass.getuser()
+    return _default_owner
+
+def update_metadata(name, key, path=METADATA_FILE, touch=True, **fields):
+    """
+    Crea o actualiza los metadatos de un contenedor y sus entradas en los índices.
+
+    Al crearlos se fijan la fecha de creación y el propietario (el usuario del sistema).
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la tabla.
+    - touch (bool): Si se actualiza la fecha de modificación (al cambiar el contenido, no al cambiar solo los metadatos).
+    - fields: Campos a cambiar ("tags", "env", "owner"); un valor None borra el campo.
+    """
+    table, indexes = load_table(key, path)
+    now = time.time()
+    meta = table.get(name)
+    if meta is None:
+        meta = {"created": now, "modified": now, "owner": default_owner()}
+    else:
+        remove_from_indexes(indexes, name, meta)
+        meta = dict(meta)
+    for field, value in fields.items():
+        if value is None:
+            meta.pop(field, None)
+        elif field == "tags":
+            meta["tags"] = sorted(set(value))
+        else:
+            meta[field] = value
+    if touch:
+        meta["modified"] = now
+    table[name] = meta
+    add_to_indexes(indexes, name, meta)
+    bisect.insort(indexes["modified"], (meta["modified"], name))
+    save_table(table, key, path)
+
+def remove_metadata(name, key, path=METADATA_FILE):
+    """
+    Borra los metadatos de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la tabla.
+    """
+    table, indexes = load_table(key, path)
+    meta = table.pop(name, None)
+    if meta is not None:
+        remove_from_indexes(indexes, name, meta)
+        save_table(table, key, path)
+
+def get_metadata(name, key, path=METADATA_FILE):
+    """
+    Devuelve los metadatos de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la tabla.
+
+    Returns:
+    - meta (dict): Sus metadatos, o None si no tiene.
+    """
+    return load_table(key, path)[0].get(name)
+
+def filter_containers(key, tags=(), env=None, owner=None, modified_since=None, modified_before=None, path=METADATA_FILE):
+    """
+    Devuelve los contenedores que cumplen todos los filtros, usando solo los índices.
+
+    Por ejemplo, `filter_containers(key, env="prod", modified_since=time.time() - 30 * 86400)`
+    devuelve los contenedores de producción modificados en los últimos 30 días.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - tags (iterable): Etiquetas que deben tener todas.
+    - env (str): Entorno.
+    - owner (str): Propietario.
+    - modified_since (float): Fecha mínima de modificación (marca de tiempo).
+    - modified_before (float): Fecha máxima de modificación, excluida.
+    - path (str): La ruta de la tabla.
+
+    Returns:
+    - names (list): Los nombres de los contenedores, ordenados.
+    """
+    table, indexes = load_table(key, path)
+    candidates = []
+    for tag in tags:
+        candidates.append(indexes["tags"].get(tag, set()))
+    if env is not None:
+        candidates.append(indexes["env"].get(env, set()))
+    if owner is not None:
+        candidates.append(indexes["owner"].get(owner, set()))
+    if modified_since is not None or modified_before is not None:
+        modified = indexes["modified"]
+        low = bisect.bisect_left(modified, (modified_since, "")) if modified_since is not None else 0
+        high = bisect.bisect_left(modified, (modified_before, "")) if modified_before is not None else len(modified)
+        candidates.append({name for _, name in modified[low:high]})
+    if not candidates:
+        return sorted(table)
+    candidates.sort(key=len)  # Se empieza por el conjunto más pequeño
+    return sorted(set(candidates[0]).intersection(*candidates[1:]))
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+    from cryptography.fernet import Fernet
+
+    key = Fernet.generate_key()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, METADATA_FILE)
+        for i in range(20000):
+            table, _ = load_table(key, path)
+            table[f"contenedor-{i}"] = {"created": i, "modified": i, "owner": "admin" if i % 3 else "ops",
+                                        "env": ("prod", "dev", "test")[i % 3], "tags": ["db"] if i % 2 else ["web"]}
+        save_table(table, key, path)
+        _tables.clear()
+
+        start = time.perf_counter()
+        found = filter_containers(key, tags=["db"], env="prod", modified_since=15000, path=path)
+        elapsed = time.perf_counter() - start
+        expected = sorted(f"contenedor-{i}" for i in range(15000, 20000) if i % 3 == 0 and i % 2)
+        assert found == expected, "El filtro no coincide con la búsqueda directa."
+
+        update_metadata("contenedor-3", key, path, env="dev", tags=["web"])
+        assert "contenedor-3" in filter_containers(key, env="dev", modified_since=time.time() - 60, path=path)
+        assert "contenedor-3" not in filter_containers(key, env="prod", path=path)
+        remove_metadata("contenedor-3", key, path)
+        assert "contenedor-3" not in filter_containers(key, env="dev", path=path)
+        print(f"20000 contenedores: filtro (carga e índices incluidos) en {elapsed * 1000:.1f} ms, {os.path.getsize(path)} bytes de metadatos")
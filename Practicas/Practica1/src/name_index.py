@@ -0,0 +1,294 @@
+import bisect
+import json
+import os
+from encryption import encrypt_data, decrypt_data
+import safe_io
+
+NAME_INDEX_DIR = 'names'
+PAGE_SIZE = 512  # Máximo de nombres por página; al superarlo la página se divide en dos
+LIST_PAGE_SIZE = 50  # Nombres que se muestran en cada página del listado
+
+_directory_cache = {}  # directorio del índice -> (clave, directorio descifrado)
+
+def directory_path(directory=NAME_INDEX_DIR):
+    """
+    Devuelve la ruta del directorio de páginas del índice.
+    """
+    return os.path.join(directory, 'directory.dat')
+
+def page_path(page_id, directory=NAME_INDEX_DIR):
+    """
+    Devuelve la ruta de una página del índice.
+    """
+    return os.path.join(directory, f"{page_id}.dat")
+
+def read_directory(key, directory=NAME_INDEX_DIR):
+    """
+    Lee el directorio del índice: la lista ordenada de páginas con el primer nombre de cada una.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+
+    Returns:
+    - index_directory (dict): {"next_id", "count", "pages": [[primer nombre, id de página, nº de nombres], ...]},
+      o None si el índice no existe.
+    """
+    cached = _directory_cache.get(directory)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    path = directory_path(directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        index_directory = json.loads(decrypt_data(file.read(), key))
+    _directory_cache[directory] = (key, index_directory)
+    return index_directory
+
+def write_directory(index_directory, key, directory=NAME_INDEX_DIR):
+    """
+    Cifra y guarda el directorio del índice. Se escribe después de las páginas, de modo que
+    una interrupción deja como mucho páginas huérfanas, nunca un directorio que apunte a páginas inexistentes.
+
+    Args:
+    - index_directory (dict): El directorio del índice.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    index_directory["count"] = sum(page[2] for page in index_directory["pages"])
+    safe_io.atomic_write(directory_path(directory), encrypt_data(json.dumps(index_directory), key))
+    _directory_cache[directory] = (key, index_directory)
+
+def read_page(page_id, key, directory=NAME_INDEX_DIR):
+    """
+    Lee y descifra una página del índice.
+
+    Args:
+    - page_id (int): El identificador de la página.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+
+    Returns:
+    - names (list): Los nombres de la página, ordenados.
+    """
+    with open(page_path(page_id, directory), 'r') as file:
+        return json.loads(decrypt_data(file.read(), key))
+
+def write_page(page_id, names, key, directory=NAME_INDEX_DIR):
+    """
+    Cifra y guarda una página del índice de forma atómica.
+
+    Args:
+    - page_id (int): El identificador de la página.
+    - names (list): Los nombres de la página, ordenados.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    safe_io.atomic_write(page_path(page_id, directory), encrypt_data(json.dumps(names), key))
+
+def build_index(names, key, directory=NAME_INDEX_DIR):
+    """
+    Construye el índice desde cero a partir de todos los nombres del vault.
+
+    Args:
+    - names (iterable): Los nombres de los contenedores.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    os.makedirs(directory, exist_ok=True)
+    old_directory = read_directory(key, directory) if os.path.exists(directory_path(directory)) else None
+    names = sorted(names)
+    first_id = old_directory["next_id"] if old_directory else 0
+    pages = []
+    for start in range(0, len(names), PAGE_SIZE):
+        page_names = names[start:start + PAGE_SIZE]
+        page_id = first_id + len(pages)
+        write_page(page_id, page_names, key, directory)
+        pages.append([page_names[0], page_id, len(page_names)])
+    write_directory({"next_id": first_id + len(pages), "pages": pages}, key, directory)
+    if old_directory:
+        for page in old_directory["pages"]:
+            os.remove(page_path(page[1], directory))
+
+def find_page(index_directory, name):
+    """
+    Devuelve la posición en el directorio de la página en la que está (o estaría) un nombre.
+    """
+    first_names = [page[0] for page in index_directory["pages"]]
+    return max(bisect.bisect_right(first_names, name) - 1, 0)
+
+def add_name(name, key, directory=NAME_INDEX_DIR):
+    """
+    Añade un nombre al índice, descifrando y reescribiendo únicamente su página.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    index_directory = read_directory(key, directory)
+    if index_directory is None:
+        build_index([name], key, directory)
+        return
+    if not index_directory["pages"]:
+        page_id = index_directory["next_id"]
+        write_page(page_id, [name], key, directory)
+        index_directory["pages"].append([name, page_id, 1])
+        index_directory["next_id"] += 1
+        write_directory(index_directory, key, directory)
+        return
+    position = find_page(index_directory, name)
+    page = index_directory["pages"][position]
+    names = read_page(page[1], key, directory)
+    insert_at = bisect.bisect_left(names, name)
+    if insert_at < len(names) and names[insert_at] == name:
+        return  # Ya estaba: una edición no cambia el índice
+    names.insert(insert_at, name)
+    if len(names) > PAGE_SIZE:
+        # Divide la página en dos nuevas; la antigua se borra cuando el directorio ya no la usa
+        half = len(names) // 2
+        first_id = index_directory["next_id"]
+        write_page(first_id, names[:half], key, directory)
+        write_page(first_id + 1, names[half:], key, directory)
+        index_directory["pages"][position:position + 1] = [
+            [names[0], first_id, half],
+            [names[half], first_id + 1, len(names) - half],
+        ]
+        index_directory["next_id"] += 2
+        write_directory(index_directory, key, directory)
+        os.remove(page_path(page[1], directory))
+    else:
+        write_page(page[1], names, key, directory)
+        page[0], page[2] = names[0], len(names)
+        write_directory(index_directory, key, directory)
+
+def remove_name(name, key, directory=NAME_INDEX_DIR):
+    """
+    Quita un nombre del índice, descifrando y reescribiendo únicamente su página.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    index_directory = read_directory(key, directory)
+    if not index_directory or not index_directory["pages"]:
+        return
+    position = find_page(index_directory, name)
+    page = index_directory["pages"][position]
+    names = read_page(page[1], key, directory)
+    remove_at = bisect.bisect_left(names, name)
+    if remove_at == len(names) or names[remove_at] != name:
+        return
+    del names[remove_at]
+    if names:
+        write_page(page[1], names, key, directory)
+        page[0], page[2] = names[0], len(names)
+        write_directory(index_directory, key, directory)
+    else:
+        del index_directory["pages"][position]
+        write_directory(index_directory, key, directory)
+        os.remove(page_path(page[1], directory))
+
+def ensure_index(vault, key, directory=NAME_INDEX_DIR):
+    """
+    Reconstruye el índice si no existe o no tiene el mismo número de nombres que el vault
+    (por ejemplo, en un vault creado antes de que existiera el índice).
+
+    Args:
+    - vault (dict): El vault.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio del índice.
+    """
+    index_directory = read_directory(key, directory)
+    if index_directory is None or index_directory["count"] != len(vault):
+        build_index(vault.keys(), key, directory)
+
+def iter_names(key, start="", after=None, directory=NAME_INDEX_DIR):
+    """
+    Recorre en orden los nombres del índice a partir de una posición, descifrando las páginas
+    solo a medida que se necesitan.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - start (str): Primer nombre posible (incluido).
+    - after (str): Cursor: si se indica, se empieza en el primer nombre estrictamente posterior.
+    - directory (str): El directorio del índice.
+
+    Yields:
+    - name (str): Los nombres, en orden.
+    """
+    index_directory = read_directory(key, directory)
+    if not index_directory or not index_directory["pages"]:
+        return
+    if after is not None and after >= start:
+        start = after
+    position = find_page(index_directory, start)
+    for page in index_directory["pages"][position:]:
+        names = read_page(page[1], key, directory)
+        # Con cursor se excluye el propio cursor, que ya se devolvió en la página anterior
+        first = bisect.bisect_right(names, start) if start == after else bisect.bisect_left(names, start)
+        yield from names[first:]
+
+def query(key, prefix="", low=None, high=None, after=None, limit=LIST_PAGE_SIZE, directory=NAME_INDEX_DIR):
+    """
+    Devuelve una página de nombres ordenados que empiezan por un prefijo y/o están en un rango.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - prefix (str): Prefijo que deben tener los nombres (por ejemplo, "prod/db/").
+    - low (str): Límite inferior del rango (incluido).
+    - high (str): Límite superior del rango (excluido).
+    - after (str): Cursor devuelto por la llamada anterior, para obtener la página siguiente.
+    - limit (int): Número máximo de nombres de la página.
+    - directory (str): El directorio del índice.
+
+    Returns:
+    - names (list): Los nombres de la página.
+    - cursor (str): El cursor de la página siguiente, o None si no hay más.
+    """
+    start = max(prefix, low) if low is not None else prefix
+    names = []
+    for name in iter_names(key, start, after, directory):
+        if not name.startswith(prefix) or (high is not None and name >= high):
+            return names, None
+        if len(names) == limit:
+            return names, names[-1]
+        names.append(name)
+    return names, None
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from cryptography.fernet import Fernet
+
+    key = Fernet.generate_key()
+    all_names = [f"{env}/{service}/secreto-{i}" for env in ("dev", "prod", "test")
+                 for service in ("api", "db", "web") for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, NAME_INDEX_DIR)
+        for name in all_names[:200]:
+            add_name(name, key, directory)
+        build_index(all_names, key, directory)
+        _directory_cache.clear()
+
+        start = time.perf_counter()
+        page, cursor = query(key, prefix="prod/db/", directory=directory)
+        first_page = time.perf_counter() - start
+        assert page == sorted(n for n in all_names if n.startswith("prod/db/"))[:LIST_PAGE_SIZE]
+
+        listed = []
+        cursor = None
+        while True:
+            page, cursor = query(key, prefix="prod/db/", after=cursor, limit=1000, directory=directory)
+            listed.extend(page)
+            if cursor is None:
+                break
+        assert listed == sorted(n for n in all_names if n.startswith("prod/db/")), "La paginación pierde nombres."
+
+        remove_name("prod/db/secreto-0", key, directory)
+        add_name("prod/db/secreto-0", key, directory)
+        assert query(key, limit=len(all_names) + 1, directory=directory)[0] == sorted(all_names)
+        print(f"{len(all_names)} nombres: primera página de 'prod/db/' en {first_page * 1000:.2f} ms")
@@ -0,0 +1,99 @@
+import base64
+import hmac
+import mmap
+import os
+import struct
+import safe_io
+
+INDEX_FILE = 'vault.idx'
+INDEX_MAGIC = b"SBXI"
+INDEX_VERSION = 2
+
+INDEX_HEADER = struct.Struct(">4sB16sI")  # Cabecera: número mágico, versión, generación del vault y número de entradas
+INDEX_ENTRY = struct.Struct(">32sQI")  # Entrada: hash del nombre, offset y longitud del registro
+
+_index_keys = {}  # clave del vault -> clave derivada para los hashes de nombres
+
+def name_hash(name, key):
+    """
+    Calcula el hash con clave del nombre de un contenedor.
+
+    Se usa HMAC-SHA256 con una clave derivada de la del vault para que el índice
+    no permita comprobar qué nombres existen sin conocer la clave.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - digest (bytes): El hash de 32 bytes del nombre.
+    """
+    index_key = _index_keys.get(key)
+    if index_key is None:
+        index_key = _index_keys[key] = hmac.digest(base64.urlsafe_b64decode(key), b"SecureBox-index", 'sha256')
+    return hmac.digest(index_key, name.encode('utf-8'), 'sha256')
+
+def write_index(entries, key, generation, path=INDEX_FILE):
+    """
+    Escribe el índice de registros ordenado por hash del nombre.
+
+    Args:
+    - entries (list): Tuplas (nombre, offset, longitud) de cada registro.
+    - key (bytes): La clave Fernet del vault.
+    - generation (bytes): El identificador de la escritura del vault al que corresponde el índice.
+    - path (str): La ruta del archivo de índice.
+    """
+    hashed = sorted((name_hash(name, key), offset, length) for name, offset, length in entries)
+    data = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, generation, len(hashed))
+    safe_io.atomic_write(path, data + b"".join(INDEX_ENTRY.pack(*entry) for entry in hashed))
+
+def index_matches(generation, path=INDEX_FILE):
+    """
+    Comprueba si el índice corresponde a la última escritura del vault.
+
+    El vault y su índice se renombran por separado, así que tras un cierre inesperado entre
+    ambas escrituras el índice podría apuntar a posiciones de una versión anterior.
+
+    Args:
+    - generation (bytes): El identificador de escritura guardado en la cabecera del vault.
+    - path (str): La ruta del archivo de índice.
+
+    Returns:
+    - bool: True si el índice es válido para esa escritura del vault.
+    """
+    if not os.path.exists(path) or os.stat(path).st_size < INDEX_HEADER.size:
+        return False
+    with open(path, 'rb') as file:
+        magic, version, index_generation, _ = INDEX_HEADER.unpack(file.read(INDEX_HEADER.size))
+    return magic == INDEX_MAGIC and version == INDEX_VERSION and index_generation == generation
+
+def lookup(name, key, path=INDEX_FILE):
+    """
+    Busca la posición del registro de un contenedor mediante búsqueda binaria sobre el índice mapeado en memoria.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del archivo de índice.
+
+    Returns:
+    - (offset, length) (tuple): La posición del registro, o None si el nombre no está indexado.
+    """
+    if not os.path.exists(path) or os.stat(path).st_size < INDEX_HEADER.size:
+        return None
+    target = name_hash(name, key)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, _, count = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("El índice del vault no es válido.")
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            digest, offset, length = INDEX_ENTRY.unpack_from(data, INDEX_HEADER.size + middle * INDEX_ENTRY.size)
+            if digest < target:
+                low = middle + 1
+            elif digest > target:
+                high = middle
+            else:
+                return offset, length
+    return None
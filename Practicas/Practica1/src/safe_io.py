@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Política de fsync para el log de cambios y la base de datos SQLite:
+# - "always": cada operación (o cada group commit) se sincroniza con el disco antes de continuar.
+# - "interval": se sincroniza como mucho cada FSYNC_INTERVAL_MS milisegundos.
+# - "exit": solo se sincroniza al cerrar la aplicación.
+FSYNC_POLICY = "always"
+FSYNC_INTERVAL_MS = 200
+
+THROTTLE_SLICE_BYTES = 1024 * 1024  # Bloque que se escribe entre pausas cuando la escritura está limitada
+
+_throttle = threading.local()  # Límite de velocidad de escritura del hilo actual (ver `throttle`)
+
+def fsync_directory(path):
+    """
+    Sincroniza con el disco el directorio que contiene un archivo, para que un renombrado o un
+    borrado sobrevivan a un cierre inesperado.
+
+    Args:
+    - path (str): La ruta del archivo cuyo directorio se sincroniza.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows no permite abrir directorios para sincronizarlos
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, data):
+    """
+    Escribe un archivo de forma atómica: los datos se escriben en un archivo temporal, se
+    sincronizan con el disco y después se renombra sobre el destino. Un cierre inesperado deja
+    el archivo anterior o el nuevo completo, nunca uno a medias.
+
+    Args:
+    - path (str): La ruta del archivo de destino.
+    - data (str | bytes): El contenido a escribir.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp_path = path + ".tmp"
+    max_rate = getattr(_throttle, "max_rate", None)
+    with open(tmp_path, 'wb') as file:
+        if max_rate:
+            # Escritura limitada: por bloques, con pausas para no superar `max_rate` bytes por segundo
+            start = time.monotonic()
+            for offset in range(0, len(data), THROTTLE_SLICE_BYTES):
+                file.write(data[offset:offset + THROTTLE_SLICE_BYTES])
+                ahead = (offset + THROTTLE_SLICE_BYTES) / max_rate - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        else:
+            file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+
+@contextmanager
+def throttle(max_rate):
+    """
+    Limita la velocidad de las escrituras atómicas del hilo actual, para que una tarea de fondo
+    (como la compactación) no acapare el disco. Las escrituras de otros hilos no se ven afectadas.
+
+    Uso:
+        with safe_io.throttle(8 * 1024 * 1024):
+            ...  # escrituras con atomic_write a como mucho 8 MB/s
+
+    Args:
+    - max_rate (float): Bytes por segundo, o None para no limitar.
+    """
+    previous = getattr(_throttle, "max_rate", None)
+    _throttle.max_rate = max_rate
+    try:
+        yield
+    finally:
+        _throttle.max_rate = previous
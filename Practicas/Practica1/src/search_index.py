@@ -0,0 +1,318 @@
+import hmac
+import json
+import os
+import re
+import unicodedata
+from contextlib import contextmanager
+from encryption import encrypt_data, decrypt_data, read_container_data
+from chunk_store import derive_subkey
+from record_index import name_hash
+import safe_io
+
+SEARCH_DIR = 'search'
+NAMES_FILE = os.path.join(SEARCH_DIR, 'names.dat')
+TERM_PATTERN = re.compile(r"[\w.@:/-]+")  # Mantiene juntos nombres de máquina, direcciones y usuarios
+TERM_SEPARATORS = re.compile(r"[.@:/-]+")
+
+TOKEN_CACHE_SIZE = 65536  # Términos cuyo token se recuerda (los términos frecuentes se repiten en muchos contenedores)
+
+_search_keys = {}  # clave del vault -> subclave de los tokens
+_token_cache = {}  # (clave del vault, término) -> token
+_pending = {}  # ruta -> contenido de los archivos modificados dentro de `batch`
+_batch_depth = 0
+
+def normalize_terms(text):
+    """
+    Extrae los términos de un texto: en minúsculas, normalizados (NFKC) y, para los que tienen
+    separadores como `db1.prod.example.com` o `admin@host`, también cada una de sus partes.
+
+    Args:
+    - text (str): El texto a analizar.
+
+    Returns:
+    - terms (set): Los términos distintos del texto.
+    """
+    terms = set()
+    for word in TERM_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        word = word.strip(".:/-")
+        if not word:
+            continue
+        terms.add(word)
+        terms.update(part for part in TERM_SEPARATORS.split(word) if part)
+    return terms
+
+def query_terms(query):
+    """
+    Extrae los términos de una consulta. De cada palabra se buscan sus partes, que `normalize_terms`
+    indexa siempre: la palabra entera solo está indexada si aparece completa en el contenido, así
+    que `db1.prod` o `example.com` no la encontrarían dentro de `db1.prod.example.com`.
+
+    Args:
+    - query (str): La consulta.
+
+    Returns:
+    - terms (set): Los términos que deben aparecer todos en el contenedor.
+    """
+    terms = set()
+    for word in TERM_PATTERN.findall(unicodedata.normalize("NFKC", query).lower()):
+        terms.update(part for part in TERM_SEPARATORS.split(word) if part)
+    return terms
+
+def term_token(term, key):
+    """
+    Calcula el token de un término: un HMAC con una subclave del vault, de modo que el índice
+    no revela los términos y no se puede buscar en él sin la clave.
+
+    Args:
+    - term (str): El término normalizado.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - token (str): El token en hexadecimal (64 bits).
+    """
+    token = _token_cache.get((key, term))
+    if token is None:
+        search_key = _search_keys.get(key)
+        if search_key is None:
+            search_key = _search_keys[key] = derive_subkey(key, b"SecureBox-search")
+        token = hmac.digest(search_key, term.encode('utf-8'), 'sha256')[:8].hex()
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            _token_cache.clear()
+        _token_cache[(key, term)] = token
+    return token
+
+def container_id(name, key):
+    """
+    Devuelve el identificador de un contenedor en el índice (el principio del hash con clave de su nombre).
+    """
+    return name_hash(name, key)[:6].hex()
+
+def bucket_path(kind, identifier):
+    """
+    Devuelve el archivo del índice en el que se guarda un token ("postings") o un contenedor ("forward").
+
+    Cada tipo se reparte en 256 archivos según el primer byte del identificador, para reescribir
+    poco en cada cambio.
+    """
+    return os.path.join(SEARCH_DIR, f"{kind}-{identifier[:2]}.dat")
+
+def read_bucket(path, key):
+    """
+    Lee y descifra un archivo del índice.
+
+    Args:
+    - path (str): La ruta del archivo.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - bucket (dict): Su contenido (vacío si aún no existe).
+    """
+    if path in _pending:
+        return _pending[path]
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.loads(decrypt_data(file.read(), key))
+
+def write_bucket(path, bucket, key):
+    """
+    Cifra y guarda un archivo del índice de forma atómica.
+
+    Dentro de `batch` la escritura se aplaza hasta el final, para escribir cada archivo una sola vez.
+
+    Args:
+    - path (str): La ruta del archivo.
+    - bucket (dict): Su contenido.
+    - key (bytes): La clave Fernet del vault.
+    """
+    if _batch_depth:
+        _pending[path] = bucket
+        return
+    os.makedirs(SEARCH_DIR, exist_ok=True)
+    safe_io.atomic_write(path, encrypt_data(json.dumps(bucket), key))
+
+@contextmanager
+def batch(key):
+    """
+    Agrupa la indexación de muchos contenedores para escribir cada archivo del índice una única vez.
+
+    Uso:
+        with search_index.batch(key):
+            ...  # varias llamadas a index_container/remove_container
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    """
+    global _batch_depth
+    _batch_depth += 1
+    try:
+        yield
+    finally:
+        _batch_depth -= 1
+        if not _batch_depth:
+            pending = dict(_pending)
+            _pending.clear()
+            for path, bucket in pending.items():
+                write_bucket(path, bucket, key)
+
+def update_postings(ident, old_tokens, new_tokens, key):
+    """
+    Añade el contenedor a las listas de los tokens nuevos y lo quita de las de los que ya no tiene,
+    reescribiendo solo los archivos de esos tokens.
+
+    Args:
+    - ident (str): El identificador del contenedor.
+    - old_tokens (set): Los tokens que tenía.
+    - new_tokens (set): Los tokens que tiene ahora.
+    - key (bytes): La clave Fernet del vault.
+    """
+    changes = {}
+    for token in old_tokens - new_tokens:
+        changes.setdefault(token[:2], []).append((token, False))
+    for token in new_tokens - old_tokens:
+        changes.setdefault(token[:2], []).append((token, True))
+    for prefix, token_changes in changes.items():
+        path = bucket_path("postings", prefix)
+        bucket = read_bucket(path, key)
+        for token, added in token_changes:
+            postings = bucket.setdefault(token, [])
+            if added:
+                postings.append(ident)  # El mapa directo garantiza que no estaba ya en la lista
+            elif not added and ident in postings:
+                postings.remove(ident)
+                if not postings:
+                    del bucket[token]
+        write_bucket(path, bucket, key)
+
+def index_container(name, content, key):
+    """
+    Indexa (o reindexa tras una edición) el contenido de un contenedor.
+
+    Un mapa directo guarda los tokens de cada contenedor, de modo que al editarlo solo se
+    actualizan las listas de los términos que han aparecido o desaparecido. Los nombres de los
+    contenedores se guardan aparte, en un archivo pequeño que solo cambia al crear o borrar uno.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - content (str): El contenido del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    """
+    ident = container_id(name, key)
+    forward_path = bucket_path("forward", ident)
+    forward = read_bucket(forward_path, key)
+    old_tokens = set(forward.get(ident, []))
+    new_tokens = {term_token(term, key) for term in normalize_terms(content)}
+    update_postings(ident, old_tokens, new_tokens, key)
+    forward[ident] = sorted(new_tokens)
+    write_bucket(forward_path, forward, key)
+    names = read_bucket(NAMES_FILE, key)
+    if names.get(ident) != name:
+        names[ident] = name
+        write_bucket(NAMES_FILE, names, key)
+
+def remove_container(name, key):
+    """
+    Quita un contenedor del índice.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    """
+    ident = container_id(name, key)
+    forward_path = bucket_path("forward", ident)
+    forward = read_bucket(forward_path, key)
+    tokens = forward.pop(ident, None)
+    if tokens is None:
+        return
+    update_postings(ident, set(tokens), set(), key)
+    write_bucket(forward_path, forward, key)
+    names = read_bucket(NAMES_FILE, key)
+    names.pop(ident, None)
+    write_bucket(NAMES_FILE, names, key)
+
+def ensure_index(vault, key):
+    """
+    Reconstruye el índice si no tiene los mismos contenedores que el vault (por ejemplo, en un
+    vault creado antes de que existiera el índice). Es la única operación que descifra todos los contenedores.
+
+    Args:
+    - vault (Vault): El vault.
+    - key (bytes): La clave Fernet del vault.
+    """
+    names = read_bucket(NAMES_FILE, key)
+    if sorted(names.values()) == sorted(vault.keys()):
+        return
+    for name in set(names.values()) - set(vault.keys()):
+        remove_container(name, key)
+    for name in set(vault.keys()) - set(names.values()):
+        container_data = read_container_data(vault[name], key, name)
+        if "file" in container_data:
+            index_container(name, container_data["file"]["source_name"], key)  # De los archivos solo se indexa su nombre
+        else:
+            index_container(name, vault.get_content(name), key)
+
+def search(query, key):
+    """
+    Busca los contenedores que contienen todos los términos de la consulta, sin descifrar ningún contenedor.
+
+    Args:
+    - query (str): Los términos a buscar (por ejemplo, un nombre de máquina o de usuario).
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - names (list): Los nombres de los contenedores encontrados, ordenados.
+    """
+    tokens = [term_token(term, key) for term in sorted(query_terms(query))]
+    if not tokens:
+        return []
+    buckets = {}
+    matches = None
+    for token in tokens:
+        path = bucket_path("postings", token)
+        if path not in buckets:
+            buckets[path] = read_bucket(path, key)
+        postings = set(buckets[path].get(token, []))
+        matches = postings if matches is None else matches & postings
+        if not matches:
+            return []
+    names = read_bucket(NAMES_FILE, key)
+    return sorted(names[ident] for ident in matches if ident in names)
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from cryptography.fernet import Fernet
+
+    key = Fernet.generate_key()
+    contents = {f"servidor-{i}": f"host: db{i}.prod.example.com\nusuario: admin{i % 50}@example.com\npuerto: {5000 + i}"
+                for i in range(1000)}
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for name, content in contents.items():
+                index_container(name, content, key)
+            index_container("servidor-7", "host: otro.example.org", key)
+            contents["servidor-7"] = "host: otro.example.org"
+            remove_container("servidor-8", key)
+            del contents["servidor-8"]
+
+            start = time.perf_counter()
+            found = search("admin7@example.com", key)
+            indexed = time.perf_counter() - start
+            expected = sorted(n for n, c in contents.items() if "admin7@example.com" in c)
+            assert found == expected, "La búsqueda no coincide con una búsqueda en claro."
+            assert search("db7.prod.example.com", key) == []
+            assert search("DB9.prod.example.com puerto", key) == ["servidor-9"]
+            assert search("otro.example.org", key) == ["servidor-7"]
+            assert search("db9.prod", key) == search("example.com db9", key) == ["servidor-9"]
+
+            encrypted = {name: encrypt_data(content, key) for name, content in contents.items()}
+            start = time.perf_counter()
+            sorted(n for n, c in encrypted.items() if "admin7@example.com" in decrypt_data(c, key))
+            scan = time.perf_counter() - start
+            print(f"{len(contents)} contenedores: índice {indexed * 1000:.2f} ms | descifrar todos {scan * 1000:.1f} ms")
+        finally:
+            os.chdir(previous_dir)
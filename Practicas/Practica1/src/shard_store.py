@@ -0,0 +1,468 @@
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from hashlib import sha256
+from encryption import encrypt_data, decrypt_data
+from record_index import name_hash
+import safe_io
+from vault_store import VaultStore
+
+SHARDS_DIR = 'shards'
+MANIFEST_FILE = os.path.join(SHARDS_DIR, 'manifest.json')
+INITIAL_SHARD_BITS = 4  # El vault empieza con 2**4 = 16 fragmentos
+SHARD_MAX_CONTAINERS = 2048  # Si un fragmento supera este número de contenedores, se duplica el número de fragmentos
+
+_shard_digests = {}  # ruta del fragmento -> hash de su contenido en claro guardado, para no reescribir los que no cambian
+_pending = {}  # ruta del fragmento -> contenido modificado dentro de `batch`
+_batch_depth = 0
+
+def read_manifest(directory=SHARDS_DIR):
+    """
+    Lee el manifiesto del vault fragmentado.
+
+    El manifiesto no está cifrado: solo indica cuántos fragmentos hay (`2 ** bits`).
+
+    Args:
+    - directory (str): El directorio de los fragmentos.
+
+    Returns:
+    - manifest (dict): El manifiesto, o None si el vault no está fragmentado.
+    """
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def write_manifest(bits, directory=SHARDS_DIR):
+    """
+    Escribe el manifiesto de forma atómica. Es el paso que hace efectivo un cambio en el número de fragmentos.
+
+    Args:
+    - bits (int): El número de fragmentos es `2 ** bits`.
+    - directory (str): El directorio de los fragmentos.
+    """
+    os.makedirs(directory, exist_ok=True)
+    safe_io.atomic_write(os.path.join(directory, 'manifest.json'), json.dumps({"version": 1, "bits": bits}))
+
+def shard_index(name, key, bits):
+    """
+    Devuelve el fragmento al que pertenece un contenedor, según el hash con clave de su nombre.
+
+    Se usan los bits bajos del hash, de modo que al duplicar el número de fragmentos cada
+    fragmento `i` se reparte únicamente entre los nuevos fragmentos `i` e `i + 2 ** bits`.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - bits (int): El número de fragmentos es `2 ** bits`.
+
+    Returns:
+    - index (int): El índice del fragmento.
+    """
+    return int.from_bytes(name_hash(name, key)[:8], 'big') & ((1 << bits) - 1)
+
+def shard_path(bits, index, directory=SHARDS_DIR):
+    """
+    Devuelve la ruta de un fragmento. El número de fragmentos forma parte del nombre del archivo,
+    así que los fragmentos de un redimensionado no sobrescriben nunca a los vigentes.
+
+    Args:
+    - bits (int): El número de fragmentos es `2 ** bits`.
+    - index (int): El índice del fragmento.
+    - directory (str): El directorio de los fragmentos.
+
+    Returns:
+    - path (str): La ruta del archivo.
+    """
+    return os.path.join(directory, f"{bits}-{index}.dat")
+
+def read_shard(path, key):
+    """
+    Lee y descifra un fragmento.
+
+    Args:
+    - path (str): La ruta del fragmento.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - shard (dict): Los contenedores del fragmento (vacío si aún no existe).
+    """
+    if path in _pending:
+        return _pending[path]
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        serialized = decrypt_data(file.read(), key)
+    # Se guarda tal y como lo serializa `write_shard`: basta con el hash de lo leído, sin volver a serializarlo
+    _shard_digests[path] = sha256(serialized.encode()).digest()
+    return json.loads(serialized)
+
+def write_shard(path, shard, key):
+    """
+    Cifra y guarda un fragmento de forma atómica, salvo que su contenido no haya cambiado.
+
+    Dentro de `batch` la escritura se aplaza hasta el final, para escribir cada fragmento una sola vez.
+
+    Args:
+    - path (str): La ruta del fragmento.
+    - shard (dict): Los contenedores del fragmento.
+    - key (bytes): La clave Fernet del vault.
+    """
+    if _batch_depth:
+        _pending[path] = shard
+        return
+    serialized = json.dumps(shard, sort_keys=True)
+    digest = sha256(serialized.encode()).digest()
+    if _shard_digests.get(path) == digest and os.path.exists(path):
+        return
+    safe_io.atomic_write(path, encrypt_data(serialized, key))
+    _shard_digests[path] = digest
+
+@contextmanager
+def batch(key):
+    """
+    Agrupa varias modificaciones para escribir cada fragmento afectado una única vez.
+
+    Al terminar, si algún fragmento supera `SHARD_MAX_CONTAINERS`, se aumenta el número de
+    fragmentos igual que al guardar un contenedor suelto.
+
+    Uso:
+        with shard_store.batch(key):
+            ...  # varias llamadas a put_container/delete_container
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    """
+    global _batch_depth
+    _batch_depth += 1
+    pending = {}
+    try:
+        yield
+    finally:
+        _batch_depth -= 1
+        if not _batch_depth:
+            pending = dict(_pending)
+            _pending.clear()
+            for path, shard in pending.items():
+                write_shard(path, shard, key)
+    largest = {}  # directorio -> contenedores del mayor fragmento modificado
+    for path, shard in pending.items():
+        directory = os.path.dirname(path)
+        largest[directory] = max(largest.get(directory, 0), len(shard))
+    for directory, size in largest.items():
+        split_shards(key, size, directory)
+
+def put_container(name, value, key, directory=SHARDS_DIR):
+    """
+    Guarda un contenedor reescribiendo únicamente su fragmento.
+
+    Si el fragmento supera `SHARD_MAX_CONTAINERS`, se duplica el número de fragmentos.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - value (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+    """
+    bits = read_manifest(directory)["bits"]
+    path = shard_path(bits, shard_index(name, key, bits), directory)
+    shard = read_shard(path, key)
+    shard[name] = value
+    write_shard(path, shard, key)
+    if not _batch_depth:
+        split_shards(key, len(shard), directory)
+
+def delete_container(name, key, directory=SHARDS_DIR):
+    """
+    Borra un contenedor reescribiendo únicamente su fragmento.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+    """
+    bits = read_manifest(directory)["bits"]
+    path = shard_path(bits, shard_index(name, key, bits), directory)
+    shard = read_shard(path, key)
+    if shard.pop(name, None) is not None:
+        write_shard(path, shard, key)
+
+def get_container(name, key, directory=SHARDS_DIR):
+    """
+    Obtiene un contenedor descifrando solo su fragmento.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+
+    Returns:
+    - value (str): El contenedor cifrado en base64, o None si no existe.
+    """
+    bits = read_manifest(directory)["bits"]
+    return read_shard(shard_path(bits, shard_index(name, key, bits), directory), key).get(name)
+
+def iter_shards(key, directory=SHARDS_DIR):
+    """
+    Recorre los fragmentos del vault de uno en uno, sin tenerlos todos descifrados a la vez.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+
+    Yields:
+    - shard (dict): Los contenedores de cada fragmento.
+    """
+    bits = read_manifest(directory)["bits"]
+    for index in range(1 << bits):
+        yield read_shard(shard_path(bits, index, directory), key)
+
+def load_all(key, directory=SHARDS_DIR):
+    """
+    Carga todos los contenedores, fragmento a fragmento.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+
+    Returns:
+    - vault (dict): El vault completo.
+    """
+    vault = {}
+    for shard in iter_shards(key, directory):
+        vault.update(shard)
+    return vault
+
+def save_all(vault, key, directory=SHARDS_DIR):
+    """
+    Guarda el vault completo, reescribiendo solo los fragmentos cuyo contenido ha cambiado.
+
+    Si el vault ha crecido tanto que algún fragmento supera `SHARD_MAX_CONTAINERS`, se guarda
+    directamente con más fragmentos.
+
+    Args:
+    - vault (dict): El vault a guardar.
+    - key (bytes): La clave Fernet del vault.
+    - directory (str): El directorio de los fragmentos.
+    """
+    manifest = read_manifest(directory)
+    bits = manifest["bits"] if manifest else INITIAL_SHARD_BITS
+    while True:
+        shards = [{} for _ in range(1 << bits)]
+        for name, value in vault.items():
+            shards[shard_index(name, key, bits)][name] = value
+        if max(len(shard) for shard in shards) <= SHARD_MAX_CONTAINERS:
+            break
+        bits += 1
+    os.makedirs(directory, exist_ok=True)
+    for index, shard in enumerate(shards):
+        write_shard(shard_path(bits, index, directory), shard, key)
+    if manifest is None or manifest["bits"] != bits:
+        write_manifest(bits, directory)
+        if manifest is not None:
+            remove_shards(manifest["bits"], directory)
+
+def reshard(key, bits, directory=SHARDS_DIR):
+    """
+    Duplica (una o varias veces) el número de fragmentos sin cargar el vault completo.
+
+    Cada fragmento vigente se lee, se reparte entre los nuevos fragmentos y se libera antes
+    de pasar al siguiente. Los nuevos fragmentos llevan otro nombre de archivo, así que hasta
+    que se escribe el manifiesto el vault sigue usando los anteriores y una interrupción no
+    pierde datos.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - bits (int): El nuevo número de fragmentos es `2 ** bits`.
+    - directory (str): El directorio de los fragmentos.
+
+    Returns:
+    - largest (int): El número de contenedores del mayor de los nuevos fragmentos.
+    """
+    old_bits = read_manifest(directory)["bits"]
+    largest = 0
+    for old_index in range(1 << old_bits):
+        old_shard = read_shard(shard_path(old_bits, old_index, directory), key)
+        new_shards = {}
+        for name, value in old_shard.items():
+            new_shards.setdefault(shard_index(name, key, bits), {})[name] = value
+        # Todos los contenedores del fragmento `old_index` van a fragmentos nuevos con esos mismos bits bajos
+        for new_index in range(old_index, 1 << bits, 1 << old_bits):
+            write_shard(shard_path(bits, new_index, directory), new_shards.get(new_index, {}), key)
+        largest = max([largest] + [len(shard) for shard in new_shards.values()])
+    write_manifest(bits, directory)
+    remove_shards(old_bits, directory)
+    return largest
+
+def split_shards(key, largest, directory=SHARDS_DIR):
+    """
+    Aumenta el número de fragmentos hasta que ninguno supera `SHARD_MAX_CONTAINERS`.
+
+    Los bits que faltan se estiman a partir del fragmento más grande, de modo que un lote que
+    ha hecho crecer mucho el vault se redistribuye de una vez en lugar de duplicando varias veces.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - largest (int): El número de contenedores del mayor fragmento.
+    - directory (str): El directorio de los fragmentos.
+    """
+    while largest > SHARD_MAX_CONTAINERS:
+        bits = read_manifest(directory)["bits"]
+        largest = reshard(key, bits + math.ceil(math.log2(largest / SHARD_MAX_CONTAINERS)), directory)
+
+def remove_shards(bits, directory=SHARDS_DIR):
+    """
+    Borra los archivos de los fragmentos de una configuración que ya no está vigente.
+
+    Args:
+    - bits (int): El número de fragmentos de esa configuración es `2 ** bits`.
+    - directory (str): El directorio de los fragmentos.
+    """
+    for index in range(1 << bits):
+        path = shard_path(bits, index, directory)
+        _shard_digests.pop(path, None)
+        if os.path.exists(path):
+            os.remove(path)
+
+def migrate_to_shards(key):
+    """
+    Convierte de una sola vez el vault actual al formato fragmentado.
+
+    Tras guardar todos los fragmentos se eliminan los archivos del formato anterior.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - vault (dict): El vault migrado.
+    """
+    import storage
+    import log_store
+    import binary_vault
+    import record_index
+    import sqlite_store
+    vault = storage.load_data(key)
+    save_all(vault, key)
+    sqlite_store.close_connection()
+    for path in (storage.DATA_FILE, storage.CHECKPOINT_FILE, binary_vault.BINARY_FILE, record_index.INDEX_FILE, sqlite_store.SQLITE_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    log_store.truncate_log()
+    return vault
+
+class ShardStore(VaultStore):
+    def __init__(self, key, directory=SHARDS_DIR):
+        """
+        Inicializa el almacén fragmentado: los contenedores repartidos por el hash de su nombre
+        en fragmentos cifrados por separado, sin log de cambios.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+            directory (str): El directorio de los fragmentos.
+        """
+        super().__init__(key)
+        self.directory = directory
+
+    def exists(self):
+        return read_manifest(self.directory) is not None
+
+    def open(self):
+        if not self.exists():
+            save_all({}, self.key, self.directory)
+        return load_all(self.key, self.directory)
+
+    def get(self, name):
+        if not self.exists():
+            return None
+        return get_container(name, self.key, self.directory)
+
+    def put(self, name, value):
+        if not self.exists():
+            save_all({}, self.key, self.directory)
+        put_container(name, value, self.key, self.directory)
+
+    def delete(self, name):
+        if self.exists():
+            delete_container(name, self.key, self.directory)
+
+    def iterate(self):
+        if self.exists():
+            for shard in iter_shards(self.key, self.directory):
+                yield from shard.items()
+
+    def commit(self, vault):
+        save_all(vault, self.key, self.directory)
+
+    def needs_snapshot(self):
+        # Cada `put`/`delete` ya reescribe su fragmento
+        return False
+
+    def batch(self):
+        return batch(self.key)
+
+    def close(self):
+        # Las rutas de la caché son relativas: sin vaciarla, otro vault en otro directorio podría no escribirse
+        _shard_digests.clear()
+
+# Sección de prueba
+
+def benchmark(sizes=(1000, 10000, 100000), content_size=200):
+    """
+    Compara el coste de guardar una modificación y de leer un contenedor entre `vault.json` y el vault fragmentado.
+
+    Args:
+    - sizes (tuple): Números de contenedores a probar.
+    - content_size (int): Tamaño en caracteres del contenido de cada contenedor.
+    """
+    import tempfile
+    from cryptography.fernet import Fernet
+    from encryption import encrypt_container
+
+    key = Fernet.generate_key()
+    for num_containers in sizes:
+        vault = {f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * content_size, key)
+                 for i in range(num_containers)}
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'vault.json')
+            shards_dir = os.path.join(tmp, SHARDS_DIR)
+            save_all(vault, key, shards_dir)
+
+            name = f"contenedor-{num_containers // 2}"
+            vault[name] = encrypt_container(name, "y" * content_size, key)
+
+            start = time.perf_counter()
+            with open(json_path, 'w') as file:
+                file.write(encrypt_data(json.dumps(vault), key))
+            json_save = time.perf_counter() - start
+
+            start = time.perf_counter()
+            put_container(name, vault[name], key, shards_dir)
+            shard_save = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with open(json_path, 'r') as file:
+                json.loads(decrypt_data(file.read(), key))
+            json_load = time.perf_counter() - start
+
+            _shard_digests.clear()
+            start = time.perf_counter()
+            get_container(name, key, shards_dir)
+            shard_get = time.perf_counter() - start
+
+            assert load_all(key, shards_dir) == vault, "El vault fragmentado no devuelve el mismo vault."
+            bits = read_manifest(shards_dir)["bits"]
+            print(f"{num_containers} contenedores ({1 << bits} fragmentos):")
+            print(f"  Guardar un cambio:  JSON {json_save * 1000:8.1f} ms | fragmentos {shard_save * 1000:8.2f} ms")
+            print(f"  Leer un contenedor: JSON {json_load * 1000:8.1f} ms | fragmentos {shard_get * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "migrar":
+        from main import initialize_system
+        migrated = migrate_to_shards(initialize_system())
+        print(f"Vault migrado a fragmentos ({len(migrated)} contenedores).")
+    else:
+        benchmark()
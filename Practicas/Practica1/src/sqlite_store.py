@@ -0,0 +1,342 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from cryptography.fernet import Fernet
+from record_index import name_hash
+import safe_io
+from vault_store import VaultStore
+
+SQLITE_FILE = 'vault.db'
+
+_connections = {}
+_batch_depth = 0  # Nivel de anidamiento de `batch`; mientras sea mayor que cero no se confirma
+
+def get_connection(path=SQLITE_FILE):
+    """
+    Abre (o reutiliza) la conexión a la base de datos SQLite del vault y crea la tabla si no existe.
+
+    Cada contenedor ocupa una fila identificada por el hash con clave de su nombre, con el
+    nombre cifrado y el contenedor cifrado tal y como lo devuelve `encrypt_container`.
+
+    Args:
+    - path (str): La ruta de la base de datos.
+
+    Returns:
+    - conn (sqlite3.Connection): La conexión abierta.
+    """
+    conn = _connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path)
+        # Con el journal WAL las escrituras no reescriben la base de datos; la política de
+        # fsync decide si cada transacción se sincroniza (FULL) o solo en los checkpoints (NORMAL).
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=" + ("FULL" if safe_io.FSYNC_POLICY == "always" else "NORMAL"))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS containers ("
+            " name_hash BLOB PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " data TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.commit()
+        _connections[path] = conn
+    return conn
+
+def close_connection(path=SQLITE_FILE):
+    """
+    Cierra la conexión abierta con la base de datos, si existe.
+
+    Args:
+    - path (str): La ruta de la base de datos.
+    """
+    conn = _connections.pop(path, None)
+    if conn is not None:
+        conn.close()
+
+@contextmanager
+def batch(path=SQLITE_FILE):
+    """
+    Agrupa varias operaciones en una única transacción (y un único fsync).
+
+    Uso:
+        with sqlite_store.batch():
+            ...  # varias llamadas a put_container/delete_container
+
+    Args:
+    - path (str): La ruta de la base de datos.
+    """
+    global _batch_depth
+    conn = get_connection(path)
+    _batch_depth += 1
+    try:
+        yield conn
+    except Exception:
+        _batch_depth -= 1
+        if not _batch_depth:
+            conn.rollback()
+        raise
+    else:
+        _batch_depth -= 1
+        if not _batch_depth:
+            conn.commit()
+
+def commit_unless_batched(conn):
+    """
+    Confirma la transacción en curso salvo que se esté dentro de `batch`.
+
+    Args:
+    - conn (sqlite3.Connection): La conexión con la transacción abierta.
+    """
+    if not _batch_depth:
+        conn.commit()
+
+def make_row(name, value, key, f):
+    """
+    Prepara la fila de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - value (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet del vault.
+    - f (Fernet): La instancia Fernet con la que se cifra el nombre.
+
+    Returns:
+    - row (tuple): La tupla (hash del nombre, nombre cifrado, contenedor cifrado).
+    """
+    return name_hash(name, key), f.encrypt(name.encode('utf-8')).decode('utf-8'), value
+
+def put_container(name, value, key, path=SQLITE_FILE):
+    """
+    Inserta o reemplaza la fila de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - value (str): El contenedor cifrado en base64.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la base de datos.
+    """
+    conn = get_connection(path)
+    conn.execute("INSERT OR REPLACE INTO containers VALUES (?, ?, ?)", make_row(name, value, key, Fernet(key)))
+    commit_unless_batched(conn)
+
+def delete_container(name, key, path=SQLITE_FILE):
+    """
+    Borra la fila de un contenedor.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la base de datos.
+    """
+    conn = get_connection(path)
+    conn.execute("DELETE FROM containers WHERE name_hash = ?", (name_hash(name, key),))
+    commit_unless_batched(conn)
+
+def get_container(name, key, path=SQLITE_FILE):
+    """
+    Obtiene un contenedor mediante una búsqueda por clave primaria.
+
+    Args:
+    - name (str): El nombre del contenedor.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la base de datos.
+
+    Returns:
+    - value (str): El contenedor cifrado en base64, o None si no existe.
+    """
+    row = get_connection(path).execute(
+        "SELECT data FROM containers WHERE name_hash = ?", (name_hash(name, key),)
+    ).fetchone()
+    return row[0] if row else None
+
+def save_all(vault, key, path=SQLITE_FILE):
+    """
+    Reemplaza todas las filas por el contenido del vault en una única transacción.
+
+    Args:
+    - vault (dict): El vault a guardar.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la base de datos.
+    """
+    f = Fernet(key)
+    conn = get_connection(path)
+    with conn:
+        conn.execute("DELETE FROM containers")
+        conn.executemany(
+            "INSERT INTO containers VALUES (?, ?, ?)",
+            (make_row(name, value, key, f) for name, value in vault.items())
+        )
+
+def load_all(key, path=SQLITE_FILE):
+    """
+    Carga todos los contenedores de la base de datos.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta de la base de datos.
+
+    Returns:
+    - vault (dict): El vault con los contenedores en su representación habitual.
+    """
+    f = Fernet(key)
+    rows = get_connection(path).execute("SELECT name, data FROM containers")
+    return {f.decrypt(name.encode('utf-8')).decode('utf-8'): data for name, data in rows}
+
+def migrate_to_sqlite(key):
+    """
+    Convierte de una sola vez el vault actual a la base de datos SQLite.
+
+    Tras guardar todas las filas se eliminan los archivos del formato anterior, de modo que a
+    partir de ese momento el almacenamiento usa SQLite.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - vault (dict): El vault migrado.
+    """
+    import storage
+    import log_store
+    import binary_vault
+    import record_index
+    vault = storage.load_data(key)
+    save_all(vault, key)
+    for path in (storage.DATA_FILE, storage.CHECKPOINT_FILE, binary_vault.BINARY_FILE, record_index.INDEX_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    log_store.truncate_log()
+    return vault
+
+class SqliteStore(VaultStore):
+    def __init__(self, key, path=SQLITE_FILE):
+        """
+        Inicializa el almacén SQLite: una fila por contenedor, sin log de cambios.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+            path (str): La ruta de la base de datos.
+        """
+        super().__init__(key)
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def open(self):
+        return load_all(self.key, self.path)
+
+    def get(self, name):
+        return get_container(name, self.key, self.path)
+
+    def put(self, name, value):
+        put_container(name, value, self.key, self.path)
+
+    def delete(self, name):
+        delete_container(name, self.key, self.path)
+
+    def iterate(self):
+        f = Fernet(self.key)
+        for name, data in get_connection(self.path).execute("SELECT name, data FROM containers"):
+            yield f.decrypt(name.encode('utf-8')).decode('utf-8'), data
+
+    def commit(self, vault):
+        save_all(vault, self.key, self.path)
+
+    def needs_snapshot(self):
+        # Cada `put`/`delete` ya es una sentencia sobre su fila
+        return False
+
+    def batch(self):
+        return batch(self.path)
+
+    def space_usage(self, vault):
+        # Las filas borradas o sustituidas dejan páginas libres que SQLite no devuelve al disco.
+        # Se usa una conexión propia, porque la compactación se mide desde un hilo de fondo.
+        if not self.exists():
+            return 0, 0
+        conn = sqlite3.connect(self.path)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            conn.close()
+        disk = sum(os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path))
+        return disk, (page_count - free_pages) * page_size
+
+    def compact(self, live):
+        # VACUUM reescribe las filas vivas en un archivo nuevo y lo sustituye; SQLite no permite limitar su velocidad
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    def close(self):
+        close_connection(self.path)
+
+# Sección de prueba
+
+def benchmark(sizes=(1000, 10000, 100000), content_size=200):
+    """
+    Compara el coste de una modificación y de la carga completa entre `vault.json` y SQLite.
+
+    Args:
+    - sizes (tuple): Números de contenedores a probar.
+    - content_size (int): Tamaño en caracteres del contenido de cada contenedor.
+    """
+    import json
+    import tempfile
+    from encryption import encrypt_container, encrypt_data, decrypt_data
+
+    key = Fernet.generate_key()
+    for num_containers in sizes:
+        vault = {f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * content_size, key)
+                 for i in range(num_containers)}
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'vault.json')
+            db_path = os.path.join(tmp, SQLITE_FILE)
+            save_all(vault, key, db_path)
+
+            name = f"contenedor-{num_containers // 2}"
+            vault[name] = encrypt_container(name, "y" * content_size, key)
+
+            start = time.perf_counter()
+            with open(json_path, 'w') as file:
+                file.write(encrypt_data(json.dumps(vault), key))
+            json_save = time.perf_counter() - start
+
+            start = time.perf_counter()
+            put_container(name, vault[name], key, db_path)
+            sqlite_save = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with open(json_path, 'r') as file:
+                json.loads(decrypt_data(file.read(), key))
+            json_load = time.perf_counter() - start
+
+            start = time.perf_counter()
+            get_container(name, key, db_path)
+            sqlite_get = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load_all(key, db_path)
+            sqlite_load = time.perf_counter() - start
+            close_connection(db_path)
+
+            assert loaded == vault, "SQLite no devuelve el mismo vault."
+            print(f"{num_containers} contenedores:")
+            print(f"  Guardar un cambio:  JSON {json_save * 1000:8.1f} ms | SQLite {sqlite_save * 1000:8.2f} ms")
+            print(f"  Leer un contenedor: JSON {json_load * 1000:8.1f} ms | SQLite {sqlite_get * 1000:8.2f} ms")
+            print(f"  Carga completa:     JSON {json_load * 1000:8.1f} ms | SQLite {sqlite_load * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "migrar":
+        from main import initialize_system
+        migrated = migrate_to_sqlite(initialize_system())
+        print(f"Vault migrado a SQLite ({len(migrated)} contenedores).")
+    else:
+        benchmark()
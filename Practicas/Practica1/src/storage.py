@@ -1,17 +1,253 @@
-import json
-from encryption import *
+import os
+import tarfile
+from contextlib import contextmanager
+import binary_vault
+import chunk_store
+import file_containers
+import kdf
+import record_index
+import sqlite_store
+import shard_store
+import name_index
+import vault_store
+import checkpoint
+
+DATA_FILE = vault_store.DATA_FILE
+CHECKPOINT_FILE = checkpoint.CHECKPOINT_FILE
+TEST_VALUE_FILE = 'test_value.key'
+BACKUP_FILE = 'securebox_backup.tar'
+
+def open_store(key):
+    """Devuelve el almacén (`vault_store.VaultStore`) del formato en el que está guardado el vault.
+
+    Todas las lecturas y escrituras del vault pasan por aquí, así que un formato nuevo solo
+    tiene que implementar esa interfaz y añadirse a esta elección.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - store (VaultStore): SQLite, fragmentos, binario o, por defecto, checkpoint con su cola de
+      cambios (que lee también los vaults guardados en `vault.json`), en ese orden de preferencia.
+    """
+    if uses_sqlite():
+        return sqlite_store.SqliteStore(key)
+    if uses_shards():
+        return shard_store.ShardStore(key)
+    if uses_binary_format():
+        return binary_vault.BinaryStore(key)
+    return checkpoint.CheckpointStore(key)
 
 def save_data(vault, key):
-    """Guarda el archivo JSON con los datos de los contenedores cifrados.
-    
+    """Guarda la copia completa del vault en el formato en el que está guardado.
+
+    Con fragmentos, solo se reescriben los que han cambiado. Con checkpoint, en JSON y en el formato binario
+    la copia se escribe de forma atómica (archivo temporal y renombrado), y una vez escrita
+    el log de cambios deja de ser necesario y se vacía.
+
     Args:
     - vault (dict): El vault a ser guardado.
     - key (bytes): La clave Fernet para cifrar el contenedor.
+
+    Returns:
+    - saved (bool): True si la copia se guardó, False si hubo un error.
+    """
+    try:
+        with chunk_store.storing(chunk_store.pending_in(vault), key):
+            open_store(key).commit(vault)
+        name_index.ensure_index(vault, key)
+        return True
+    except Exception as e:
+        print(f"Error al guardar los datos: {e}")
+        return False
+
+def flush(vault, key):
+    """Guarda la copia completa del vault solo si tiene cambios sin guardar.
+
+    Los contenedores modificados ya están en el log de cambios, así que la copia completa puede
+    aplazarse y agruparse: varias ediciones seguidas se guardan con una sola escritura, y las
+    operaciones de solo lectura no escriben nada. Con SQLite y con fragmentos cada cambio ya está
+    en su fila o en su fragmento y no se escribe nada (ver `VaultStore.needs_snapshot`).
+
+    Args:
+    - vault (Vault): El vault a guardar.
+    - key (bytes): La clave Fernet del vault.
+
+    Returns:
+    - saved (bool): True si se escribió la copia, False si no había cambios, el formato no la
+      necesita o hubo un error (en ese caso el vault sigue marcado como modificado).
+    """
+    if not vault.dirty:
+        return False
+    if not open_store(key).needs_snapshot():
+        vault.mark_clean()
+        return False
+    if save_data(vault, key):
+        vault.mark_clean()
+        return True
+    return False
+
+def save_container(vault, key, name):
+    """Persiste únicamente el contenedor indicado añadiendo un registro al log.
+
+    Con SQLite el contenedor se guarda directamente como una única fila, y con fragmentos
+    se reescribe únicamente el fragmento que lo contiene. El nombre se añade también al índice ordenado.
+    Si el contenido es grande, sus fragmentos deduplicados (ver `chunk_store`) se guardan aquí,
+    y sus referencias solo se cuentan si el contenedor se ha guardado.
+
+    Args:
+    - vault (dict): El vault que contiene el contenedor.
+    - key (bytes): La clave Fernet para cifrar el registro.
+    - name (str): El nombre del contenedor creado o modificado.
+
+    Returns:
+    - saved (bool): True si el contenedor se guardó, False si hubo un error.
     """
     try:
-        data_str = json.dumps(vault)  # Convierte el vault a una cadena JSON
-        encrypted_data_str = encrypt_data(data_str, key)  # Cifra la cadena JSON
-        with open("vault.json", 'w') as file:  # Cambia a 'w' para escribir la cadena cifrada
-            file.write(encrypted_data_str)  # Escribe los datos cifrados como cadena Base64
+        with chunk_store.storing([(name, vault[name])], key):
+            open_store(key).put(name, vault[name])
+        name_index.add_name(name, key)
+        return True
     except Exception as e:
-        print(f"Error al guardar los datos: {e}")
\ No newline at end of file
+        print(f"Error al guardar el contenedor: {e}")
+        return False
+
+def remove_container(key, name):
+    """Persiste el borrado de un contenedor añadiendo un registro al log.
+
+    Con SQLite se borra directamente la fila del contenedor, y con fragmentos se reescribe su fragmento.
+    El nombre se quita también del índice ordenado.
+
+    Args:
+    - key (bytes): La clave Fernet para cifrar el registro.
+    - name (str): El nombre del contenedor borrado.
+    """
+    try:
+        open_store(key).delete(name)
+        name_index.remove_name(name, key)
+    except Exception as e:
+        print(f"Error al guardar el borrado del contenedor: {e}")
+
+@contextmanager
+def group_commit(key=None):
+    """Agrupa varias modificaciones de contenedores en una única escritura y un único fsync.
+
+    Uso:
+        with storage.group_commit(key):
+            ...  # varias llamadas a save_container/remove_container
+
+    Args:
+    - key (bytes): La clave Fernet del vault (necesaria con fragmentos, que se cifran al final).
+    """
+    with open_store(key).batch():
+        yield
+
+def uses_sqlite():
+    """Indica si el vault se guarda en la base de datos SQLite.
+
+    Returns:
+    - bool: True si existe la base de datos del vault.
+    """
+    return os.path.exists(sqlite_store.SQLITE_FILE)
+
+def uses_shards():
+    """Indica si el vault se guarda repartido en fragmentos.
+
+    Returns:
+    - bool: True si existe el manifiesto de los fragmentos.
+    """
+    return os.path.exists(shard_store.MANIFEST_FILE)
+
+def uses_binary_format():
+    """Indica si el vault se guarda en el formato binario en lugar de en `vault.json`.
+
+    Returns:
+    - bool: True si existe el archivo del vault binario.
+    """
+    return os.path.exists(binary_vault.BINARY_FILE)
+
+def current_data_file():
+    """Devuelve la ruta del archivo con la copia completa del vault.
+
+    Returns:
+    - str: `vault.db`, el manifiesto de los fragmentos, `vault.bin`, el checkpoint o `vault.json`
+      (si aún no hay checkpoint) según el formato que use el vault.
+    """
+    if uses_sqlite():
+        return sqlite_store.SQLITE_FILE
+    if uses_shards():
+        return shard_store.MANIFEST_FILE
+    if uses_binary_format():
+        return binary_vault.BINARY_FILE
+    return CHECKPOINT_FILE if os.path.exists(CHECKPOINT_FILE) else DATA_FILE
+
+def create_backup(vault, key, path=BACKUP_FILE):
+    """Empaqueta en un archivo tar todo lo necesario para restaurar el vault en otro equipo.
+
+    Antes se guarda la copia completa, para que incluya los cambios que solo están en el log, y se
+    cierra el almacén (SQLite vuelca así su WAL a `vault.db`). Además de la copia se incluyen la
+    cabecera con la clave envuelta (`vault_header.json`), el valor de prueba de la contraseña, el
+    índice del formato binario y los directorios de fragmentos, de trozos deduplicados y de
+    archivos adjuntos, si existen.
+
+    Args:
+    - vault (Vault): El vault a copiar.
+    - key (bytes): La clave Fernet del vault.
+    - path (str): La ruta del archivo tar a crear.
+
+    Returns:
+    - path (str): La ruta del archivo creado, o None si no se pudo guardar la copia completa.
+    """
+    store = open_store(key)
+    if store.needs_snapshot():
+        if not save_data(vault, key):
+            return None
+        vault.mark_clean()
+    store.close()
+    paths = [current_data_file(), kdf.HEADER_FILE, TEST_VALUE_FILE]
+    if uses_shards():
+        paths.append(shard_store.SHARDS_DIR)
+    elif uses_binary_format():
+        paths.append(record_index.INDEX_FILE)
+    paths += [chunk_store.CHUNKS_DIR, file_containers.FILES_DIR]
+    with tarfile.open(path, 'w') as archive:
+        for item in paths:
+            if os.path.exists(item):
+                archive.add(item)
+    return path
+
+def vault_exists():
+    """Indica si hay datos del vault guardados, ya sea la copia completa o el log de cambios.
+
+    Returns:
+    - bool: True si existe algún dato guardado, False en caso contrario.
+    """
+    return open_store(None).exists()
+
+def load_data(key):
+    """Carga la última copia completa del vault y aplica los cambios pendientes del log.
+
+    Args:
+    - key (bytes): La clave Fernet para descifrar el vault.
+
+    Returns:
+    - vault (dict): El vault descifrado.
+    """
+    return open_store(key).open()
+
+def read_container(key, name):
+    """Obtiene un único contenedor cifrado sin cargar el vault completo cuando es posible.
+
+    Primero se consulta el log de cambios, que siempre contiene la versión más reciente.
+    Si el contenedor no aparece en él y el vault usa el formato binario, se lee su registro
+    a través del índice; en el formato JSON no queda más remedio que cargar el vault.
+    Con SQLite basta con una búsqueda por clave primaria, y con fragmentos con descifrar el suyo.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - name (str): El nombre del contenedor.
+
+    Returns:
+    - value (str): El contenedor cifrado en base64, o None si no existe.
+    """
+    return open_store(key).get(name)
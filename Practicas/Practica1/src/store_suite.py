@@ -0,0 +1,185 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from cryptography.fernet import Fernet
+from encryption import encrypt_container
+from vault_store import JsonStore
+from checkpoint import CheckpointStore
+from binary_vault import BinaryStore
+from sqlite_store import SqliteStore
+from shard_store import ShardStore
+
+# Formatos que deben pasar las comprobaciones; uno nuevo solo tiene que añadirse aquí
+BACKENDS = {
+    "JSON": JsonStore,
+    "Checkpoint": CheckpointStore,
+    "Binario": BinaryStore,
+    "SQLite": SqliteStore,
+    "Fragmentos": ShardStore,
+}
+
+@contextmanager
+def fresh_directory():
+    """
+    Ejecuta el bloque en un directorio temporal vacío, ya que los almacenes usan rutas relativas.
+    """
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(previous_dir)
+
+def make_containers(key, count, content_size=200, prefix="contenedor"):
+    """
+    Crea contenedores cifrados de prueba.
+
+    Args:
+    - key (bytes): La clave Fernet del vault.
+    - count (int): Número de contenedores.
+    - content_size (int): Tamaño en caracteres del contenido de cada uno.
+    - prefix (str): Prefijo de los nombres.
+
+    Returns:
+    - containers (dict): nombre -> contenedor cifrado.
+    """
+    return {f"{prefix}-{i}": encrypt_container(f"{prefix}-{i}", "x" * content_size, key) for i in range(count)}
+
+def check_store(store_class):
+    """
+    Comprueba que un almacén cumple el contrato de `VaultStore`. Debe ejecutarse en un
+    directorio vacío (ver `fresh_directory`); lanza AssertionError en el primer fallo.
+
+    Cada comprobación de persistencia abre una instancia nueva del almacén, de modo que solo
+    se da por guardado lo que realmente está en disco.
+
+    Args:
+    - store_class (type): La clase del almacén; se construye con la clave del vault.
+    """
+    key = Fernet.generate_key()
+    reopen = lambda: store_class(key)
+    store = reopen()
+    try:
+        assert not store.exists(), "Un almacén nuevo no debe tener datos."
+        assert store.open() == {}, "Un almacén nuevo debe estar vacío."
+        assert store.get("no-existe") is None
+        assert list(store.iterate()) == []
+
+        # put/get/delete quedan guardados sin necesidad de commit
+        expected = make_containers(key, 3)
+        expected["unicode/ñandú €"] = encrypt_container("unicode/ñandú €", "contenido ✓", key)
+        for name, value in expected.items():
+            store.put(name, value)
+        expected["contenedor-0"] = encrypt_container("contenedor-0", "modificado", key)
+        store.put("contenedor-0", expected["contenedor-0"])
+        store.delete("contenedor-1")
+        del expected["contenedor-1"]
+        store.delete("no-existe")
+        assert reopen().exists(), "Tras guardar un contenedor el almacén debe existir."
+        assert reopen().open() == expected, "Los cambios sin commit no se han guardado."
+        for name, value in expected.items():
+            assert reopen().get(name) == value, f"get('{name}') no devuelve lo guardado."
+        assert reopen().get("contenedor-1") is None, "Un contenedor borrado sigue apareciendo."
+        assert dict(reopen().iterate()) == expected, "iterate no coincide con open."
+
+        # batch agrupa operaciones que quedan guardadas al terminar
+        batch_containers = make_containers(key, 100, prefix="lote")
+        with store.batch():
+            for name, value in batch_containers.items():
+                store.put(name, value)
+            store.delete("contenedor-2")
+        expected.update(batch_containers)
+        del expected["contenedor-2"]
+        assert reopen().open() == expected, "Las operaciones de batch no se han guardado."
+
+        # commit sustituye todo lo guardado por la copia completa
+        snapshot = make_containers(key, 50, prefix="copia")
+        store.commit(snapshot)
+        assert reopen().open() == snapshot, "commit no sustituye el contenido guardado."
+        assert reopen().get("lote-0") is None
+        assert reopen().get("copia-7") == snapshot["copia-7"]
+
+        # Los cambios posteriores a un commit se suman a la copia completa
+        store.put("nuevo", expected["contenedor-0"])
+        store.delete("copia-0")
+        snapshot["nuevo"] = expected["contenedor-0"]
+        del snapshot["copia-0"]
+        assert reopen().open() == snapshot, "Los cambios tras el commit no se han guardado."
+        assert reopen().get("copia-0") is None
+    finally:
+        store.close()
+
+def benchmark_store(store_class, count, content_size=200, repeats=20):
+    """
+    Mide el coste de las operaciones de un almacén con un vault de `count` contenedores.
+    Debe ejecutarse en un directorio vacío.
+
+    Args:
+    - store_class (type): La clase del almacén.
+    - count (int): Número de contenedores del vault.
+    - content_size (int): Tamaño en caracteres del contenido de cada contenedor.
+    - repeats (int): Número de lecturas y escrituras individuales que se promedian.
+
+    Returns:
+    - results (dict): Tiempo en milisegundos de "commit", "open", "get", "put" y "delete", y los bytes en disco.
+    """
+    key = Fernet.generate_key()
+    vault = make_containers(key, count, content_size)
+    names = list(vault)[::max(count // repeats, 1)][:repeats]
+    store = store_class(key)
+    results = {}
+    try:
+        start = time.perf_counter()
+        store.commit(vault)
+        results["commit"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        assert len(store_class(key).open()) == count
+        results["open"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for name in names:
+            assert store_class(key).get(name) == vault[name]
+        results["get"] = (time.perf_counter() - start) * 1000 / len(names)
+
+        start = time.perf_counter()
+        for name in names:
+            store.put(name, vault[names[0]])
+        results["put"] = (time.perf_counter() - start) * 1000 / len(names)
+
+        start = time.perf_counter()
+        for name in names:
+            store.delete(name)
+        results["delete"] = (time.perf_counter() - start) * 1000 / len(names)
+
+        results["bytes"] = sum(os.path.getsize(os.path.join(root, file))
+                               for root, _, files in os.walk(".") for file in files)
+    finally:
+        store.close()
+    return results
+
+def run(sizes=(1000, 10000)):
+    """
+    Pasa las comprobaciones a todos los formatos de `BACKENDS` y muestra una tabla comparativa.
+
+    Args:
+    - sizes (tuple): Tamaños de vault con los que se mide cada formato.
+    """
+    for label, store_class in BACKENDS.items():
+        with fresh_directory():
+            check_store(store_class)
+        print(f"{label}: cumple el contrato de VaultStore")
+    print(f"\n{'Formato':<11}{'Contenedores':>13}{'commit':>10}{'open':>10}{'get':>9}{'put':>9}{'delete':>9}{'Disco':>12}")
+    for count in sizes:
+        for label, store_class in BACKENDS.items():
+            with fresh_directory():
+                r = benchmark_store(store_class, count)
+            print(f"{label:<11}{count:>13}{r['commit']:>8.1f}ms{r['open']:>8.1f}ms{r['get']:>7.2f}ms"
+                  f"{r['put']:>7.2f}ms{r['delete']:>7.2f}ms{r['bytes']:>12}")
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    run()
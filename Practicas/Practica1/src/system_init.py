@@ -1,13 +1,15 @@
 import tkinter as tk
 from tkinter import simpledialog, messagebox
-import json
 import os
 import base64
 from cryptography.fernet import Fernet
 from encryption import derive_key, encrypt_data, decrypt_data
+import storage
+import key_agent
+import kdf
+from vault import Vault
 
 SALT_FILE = 'salt.key'
-ENCRYPTED_VAULT_FILE = 'encrypted_vault.dat'
 DATA_FILE = 'vault.json'
 TEST_VALUE_FILE = 'test_value.key'
 TEST_VALUE = b"SecureBoxTest"
@@ -27,7 +29,14 @@ def initialize_system_gui(parent):
     from encryption import derive_key, encrypt_data, decrypt_data, Fernet
     
     # Verifica si es la configuración inicial o una verificación posterior
-    is_initial_setup = not os.path.exists(SALT_FILE) or not os.path.exists(TEST_VALUE_FILE)
+    is_initial_setup = not kdf.has_header() or not os.path.exists(TEST_VALUE_FILE)
+
+    # Con el agente de claves desbloqueado no hace falta pedir la contraseña
+    if not is_initial_setup:
+        key = agent_key()
+        if key is not None:
+            kdf.apply_settings()
+            return key
 
     # Solicita la contraseña
     password = simpledialog.askstring("Contraseña", "Introduce tu contraseña para SecureBox:", parent=parent, show='*')
@@ -43,11 +52,8 @@ def initialize_system_gui(parent):
     
     if is_initial_setup:
         # Proceso de configuración inicial
-        salt = os.urandom(16)
-        with open(SALT_FILE, 'wb') as salt_file:
-            salt_file.write(salt)
-        
-        key = derive_key(password, salt)
+        # La sal y los parámetros de derivación van en la cabecera del vault (ver `kdf`)
+        key = kdf.create_header(password)
         f = Fernet(key)
         encrypted_test_value = f.encrypt(TEST_VALUE)
         with open(TEST_VALUE_FILE, 'wb') as test_file:
@@ -56,8 +62,10 @@ def initialize_system_gui(parent):
         messagebox.showinfo("Configuración", "Configuración inicial completada.", parent=parent)
     else:
         # Verificación durante los inicios de sesión posteriores
-        salt = open(SALT_FILE, 'rb').read()
-        key = derive_key(password, salt)
+        key = kdf.unlock(password)
+        if key is None:
+            messagebox.showerror("Error", "Acceso denegado. La contraseña es incorrecta.", parent=parent)
+            return None
         try:
             with open(TEST_VALUE_FILE, 'rb') as test_file:
                 encrypted_test_value = test_file.read()
@@ -69,50 +77,52 @@ def initialize_system_gui(parent):
         except Exception as e:
             messagebox.showerror("Error", "Acceso denegado. No se pudo verificar la contraseña. " + str(e), parent=parent)
             return None
+        # Si los parámetros de derivación han quedado anticuados (o la clave del vault aún es la derivada
+        # de la contraseña), se vuelve a envolver la clave del vault sin cambiarla
+        if kdf.needs_rehash():
+            kdf.rehash(password, key)
+        key_agent.add_key(key)  # Solo si hay un agente en marcha
     
     return key
 
+def agent_key():
+    """
+    Obtiene la clave del agente de claves (ver `key_agent`) y comprueba que descifra el valor de prueba.
+
+    Returns:
+    - La clave del vault, o None si no hay agente, está bloqueado o su clave no es la de este vault.
+    """
+    key = key_agent.get_key()
+    if key is None:
+        return None
+    try:
+        with open(TEST_VALUE_FILE, 'rb') as test_file:
+            if Fernet(key).decrypt(test_file.read()) == TEST_VALUE:
+                return key
+    except Exception:
+        pass
+    return None
+
 
 def load_or_create_vault_gui(key, parent):
     """
-    Carga el vault cifrado desde un archivo, o crea uno nuevo si no existe o está vacío.
+    Carga el vault cifrado desde un archivo junto con su log de cambios, o crea uno nuevo si no existe o está vacío.
 
     Args:
     - key: La clave utilizada para cifrar/descifrar el vault.
     - parent: El widget de tkinter que actúa como contenedor padre para los mensajes de error.
 
     Returns:
-    - Un diccionario representando el vault cargado o un nuevo vault vacío, o None si ocurre un error.
+    - El vault cargado (que descifra los contenedores al consultarlos) o un nuevo vault vacío, o None si ocurre un error.
     """
-    if not os.path.exists(DATA_FILE) or os.stat(DATA_FILE).st_size == 0:
-        vault = {}
+    if not storage.vault_exists():
+        vault = Vault({}, key)
     else:
         try:
-            with open(DATA_FILE, 'rb') as file:
-                encrypted_vault = file.read()
-            decrypted_vault = decrypt_data(encrypted_vault, key)
-            vault = json.loads(decrypted_vault)
+            vault = Vault(storage.load_data(key), key)
         except Exception as e:
             from tkinter import messagebox
             messagebox.showerror("Error", "No se pudo cargar el vault debido a un error: " + str(e), parent=parent)
             return None
     
     return vault
-
-def save_vault_changes(vault, key):
-    """
-    Cifra y guarda el vault actualizado en un archivo utilizando la clave proporcionada.
-
-    Args:
-    - vault: El diccionario que representa el vault a guardar.
-    - key: La clave utilizada para cifrar el vault.
-
-    Raises:
-    - Muestra un mensaje de error a través de la GUI si ocurre un error durante el guardado.
-    """
-    try:
-        encrypted_vault = encrypt_data(json.dumps(vault), key)
-        with open(ENCRYPTED_VAULT_FILE, 'wb') as file:
-            file.write(encrypted_vault)
-    except Exception as e:
-        messagebox.showerror("Error", "Error al guardar cambios en el vault: " + str(e))
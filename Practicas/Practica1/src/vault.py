@@ -0,0 +1,223 @@
+import time
+from collections import OrderedDict
+from encryption import decrypt_container
+from merkle import MerkleTree
+
+CACHE_MAX_BYTES = 1024 * 1024  # Máximo de texto en claro que se mantiene descifrado en memoria
+CACHE_TTL_SECONDS = 300  # Tiempo máximo que un contenido descifrado permanece en la caché
+
+class PlaintextCache:
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS):
+        """
+        Inicializa una caché LRU de contenidos descifrados, limitada por bytes y por tiempo.
+
+        Args:
+            max_bytes (int): El tamaño máximo total de los contenidos en caché.
+            ttl (float): Los segundos que un contenido puede permanecer en caché.
+
+        Los contenidos se guardan en `bytearray` para poder sobrescribirlos con ceros al
+        expulsarlos, en lugar de dejar el texto en claro en memoria hasta que se reutilice.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.entries = OrderedDict()  # nombre -> (contenido, instante de expiración)
+
+    def get(self, name):
+        """
+        Devuelve un contenido de la caché y lo marca como usado recientemente.
+
+        Args:
+            name (str): El nombre del contenedor.
+
+        Returns:
+            str: El contenido descifrado, o None si no está en caché o ha expirado.
+        """
+        self.expire()
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        self.entries.move_to_end(name)
+        return entry[0].decode('utf-8')
+
+    def put(self, name, content):
+        """
+        Guarda un contenido en la caché, expulsando los menos usados si se supera el límite.
+
+        Args:
+            name (str): El nombre del contenedor.
+            content (str): El contenido descifrado.
+        """
+        self.discard(name)
+        data = bytearray(content.encode('utf-8'))
+        if len(data) > self.max_bytes:
+            self.wipe(data)
+            return  # Un contenido mayor que la caché entera no se guarda
+        self.entries[name] = (data, time.monotonic() + self.ttl)
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, name):
+        """
+        Expulsa un contenido de la caché sobrescribiéndolo con ceros.
+
+        Args:
+            name (str): El nombre del contenedor.
+        """
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+            self.wipe(entry[0])
+
+    def expire(self):
+        """
+        Expulsa los contenidos cuyo tiempo en caché ha vencido.
+        """
+        now = time.monotonic()
+        for name in [name for name, (_, expires) in self.entries.items() if expires <= now]:
+            self.discard(name)
+
+    def clear(self):
+        """
+        Expulsa todos los contenidos de la caché.
+        """
+        for name in list(self.entries):
+            self.discard(name)
+
+    @staticmethod
+    def wipe(data):
+        """
+        Sobrescribe con ceros un contenido descifrado.
+
+        Args:
+            data (bytearray): El contenido a borrar.
+        """
+        data[:] = bytes(len(data))
+
+class Vault(dict):
+    def __init__(self, data, key, cache=None):
+        """
+        Inicializa el vault en memoria: un diccionario nombre -> contenedor cifrado que descifra
+        los contenedores solo cuando se consultan, guardándolos en una caché limitada.
+        La raíz de un árbol de Merkle de los contenedores cifrados identifica el contenido y la
+        versión del vault; el árbol se construye la primera vez que se pide (`digest`) y a
+        partir de entonces se actualiza en cada cambio.
+        Cualquier cambio marca además el vault como modificado (`dirty`), para que solo se
+        guarde cuando de verdad hay algo que guardar.
+
+        Args:
+            data (dict): Los contenedores cifrados, tal y como se cargan del almacenamiento.
+            key (bytes): La clave para descifrar los contenedores.
+            cache (PlaintextCache): La caché de contenidos descifrados; se crea una si no se indica.
+        """
+        super().__init__(data)
+        self.key = key
+        self.cache = cache if cache is not None else PlaintextCache()
+        self.merkle = None  # Sin construir hasta la primera llamada a `digest`
+        self.dirty = False  # Hay cambios que aún no se han guardado en la copia completa
+
+    def get_content(self, name):
+        """
+        Devuelve el contenido descifrado de un contenedor, usando la caché si es posible.
+
+        Args:
+            name (str): El nombre del contenedor.
+
+        Returns:
+            str: El contenido del contenedor.
+        """
+        content = self.cache.get(name)
+        if content is None:
+            content = decrypt_container(self[name], self.key, name)
+            self.cache.put(name, content)
+        return content
+
+    def digest(self):
+        """
+        Devuelve la raíz del árbol de Merkle del vault. Solo la primera llamada recorre los
+        contenedores para construir el árbol; después, cada cambio lo actualiza.
+
+        Returns:
+            bytes: El resumen del contenido cifrado de todo el vault.
+        """
+        if self.merkle is None:
+            self.merkle = MerkleTree(self.items())
+        return self.merkle.root()
+
+    def version_id(self):
+        """
+        Devuelve el identificador de versión del vault: la raíz de Merkle en hexadecimal.
+
+        Returns:
+            str: El identificador, que cambia con cualquier alta, modificación o borrado.
+        """
+        return self.digest().hex()
+
+    def mark_clean(self):
+        """
+        Marca el vault como guardado, tras escribir su copia completa.
+        """
+        self.dirty = False
+
+    def clear_cache(self):
+        """
+        Borra de memoria todos los contenidos descifrados (por ejemplo, al salir).
+        """
+        self.cache.clear()
+
+    # Cualquier modificación de un contenedor invalida su contenido en caché, actualiza el árbol
+    # de Merkle (si ya se ha construido) y marca el vault como modificado
+
+    def __setitem__(self, name, value):
+        self.cache.discard(name)
+        super().__setitem__(name, value)
+        if self.merkle is not None:
+            self.merkle.put(name, value)
+        self.dirty = True
+
+    def __delitem__(self, name):
+        self.cache.discard(name)
+        super().__delitem__(name)
+        if self.merkle is not None:
+            self.merkle.remove(name)
+        self.dirty = True
+
+    def pop(self, name, *default):
+        if name in self:
+            self.cache.discard(name)
+            if self.merkle is not None:
+                self.merkle.remove(name)
+            self.dirty = True
+        return super().pop(name, *default)
+
+    def popitem(self):
+        name, value = super().popitem()
+        self.cache.discard(name)
+        if self.merkle is not None:
+            self.merkle.remove(name)
+        self.dirty = True
+        return name, value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        items = dict(*args, **kwargs)
+        for name in items:
+            self.cache.discard(name)
+        super().update(items)
+        if self.merkle is not None:
+            self.merkle.put_many(items.items())
+        if items:
+            self.dirty = True
+
+    def clear(self):
+        self.cache.clear()
+        if self.merkle is not None:
+            self.merkle.clear()
+        if self:
+            self.dirty = True
+        super().clear()
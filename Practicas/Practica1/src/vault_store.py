@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+from contextlib import nullcontext
+from encryption import encrypt_data, decrypt_data
+import safe_io
+import log_store
+
+DATA_FILE = "vault.json"
+
+# Serializa las copias completas: una compactación en curso y un guardado no pueden escribirlas a la vez
+_commit_lock = threading.Lock()
+
+class VaultStore:
+    def __init__(self, key):
+        """
+        Inicializa un almacén del vault: la interfaz común de todos los formatos en los que se
+        puede guardar (JSON, binario, SQLite, fragmentos). El resto de la aplicación solo usa
+        estas operaciones, a través de `storage`.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+
+        Cada formato la implementa en una subclase. Las operaciones sobre un contenedor (`put`,
+        `delete`) quedan guardadas al volver (o al terminar `batch`); `commit` escribe además
+        una copia completa, tras la cual el formato puede descartar lo que ya no necesite.
+        """
+        self.key = key
+
+    def exists(self):
+        """
+        Indica si hay datos guardados en este formato.
+
+        Returns:
+            bool: True si existe algún dato guardado.
+        """
+        raise NotImplementedError
+
+    def open(self):
+        """
+        Abre el almacén (creándolo vacío si el formato lo necesita) y carga todos los contenedores.
+
+        Returns:
+            dict: nombre -> contenedor cifrado.
+        """
+        raise NotImplementedError
+
+    def get(self, name):
+        """
+        Obtiene un único contenedor, sin cargar el vault completo si el formato lo permite.
+
+        Args:
+            name (str): El nombre del contenedor.
+
+        Returns:
+            str: El contenedor cifrado, o None si no existe.
+        """
+        raise NotImplementedError
+
+    def put(self, name, value):
+        """
+        Guarda un contenedor nuevo o modificado.
+
+        Args:
+            name (str): El nombre del contenedor.
+            value (str): El contenedor cifrado.
+        """
+        raise NotImplementedError
+
+    def delete(self, name):
+        """
+        Borra un contenedor (no hace nada si no existe).
+
+        Args:
+            name (str): El nombre del contenedor.
+        """
+        raise NotImplementedError
+
+    def iterate(self):
+        """
+        Recorre todos los contenedores guardados.
+
+        Yields:
+            tuple: (nombre, contenedor cifrado).
+        """
+        yield from self.open().items()
+
+    def commit(self, vault):
+        """
+        Escribe la copia completa del vault, que sustituye a todo lo guardado.
+
+        Args:
+            vault (dict): El vault completo.
+        """
+        raise NotImplementedError
+
+    def needs_snapshot(self):
+        """
+        Indica si, además de `put`/`delete`, hace falta escribir de vez en cuando la copia completa.
+        Los formatos con log de cambios la necesitan para vaciarlo; los que guardan cada contenedor
+        en su sitio (SQLite, fragmentos) no, y para ellos `commit` reescribe todo sin ganar nada.
+
+        Returns:
+            bool: True si `storage.flush` debe escribir la copia completa.
+        """
+        return True
+
+    def batch(self):
+        """
+        Agrupa varias llamadas a `put`/`delete` en una única escritura, si el formato lo permite.
+
+        Returns:
+            contextmanager: El contexto que agrupa las operaciones.
+        """
+        return nullcontext()
+
+    def space_usage(self, vault):
+        """
+        Mide la amplificación de espacio: lo que ocupa el vault en disco frente a lo que ocupan
+        sus datos vivos. La diferencia es la basura que dejan las ediciones y los borrados.
+
+        Args:
+            vault (dict): El vault en memoria, es decir, los datos vivos.
+
+        Returns:
+            tuple: (bytes en disco, bytes vivos); (0, 0) si el formato no acumula basura.
+        """
+        return 0, 0
+
+    def begin_compaction(self):
+        """
+        Prepara una compactación. Se llama con el vault bloqueado, en el mismo momento en que se
+        copian sus datos vivos, y siempre va seguida de `compact`.
+        """
+
+    def compact(self, live):
+        """
+        Reescribe los datos vivos en un archivo nuevo, descartando la basura. Puede ejecutarse en
+        un hilo de fondo mientras se siguen guardando cambios.
+
+        Args:
+            live (dict): Los datos vivos copiados al llamar a `begin_compaction`.
+        """
+        self.commit(live)
+
+    def close(self):
+        """
+        Libera los recursos abiertos (archivos, conexiones) y sincroniza lo pendiente.
+        """
+
+class JsonStore(VaultStore):
+    def __init__(self, key, path=DATA_FILE):
+        """
+        Inicializa el almacén JSON: una copia completa cifrada en `vault.json` más el log de
+        cambios, al que se añade un registro por cada contenedor modificado o borrado.
+
+        Args:
+            key (bytes): La clave Fernet del vault.
+            path (str): La ruta de la copia completa.
+
+        Las subclases que solo cambian el formato de la copia completa (el vault binario)
+        redefinen `read_snapshot`, `read_snapshot_value`, `write_snapshot` y `has_snapshot`.
+        """
+        super().__init__(key)
+        self.path = path
+
+    def has_snapshot(self):
+        """
+        Indica si existe la copia completa.
+        """
+        return os.path.exists(self.path) and os.stat(self.path).st_size > 0
+
+    def snapshot_files(self):
+        """
+        Devuelve los archivos que forman la copia completa.
+        """
+        return [self.path]
+
+    def read_snapshot(self):
+        """
+        Carga la copia completa.
+
+        Returns:
+            dict: El vault tal y como estaba en la última copia completa.
+        """
+        if not self.has_snapshot():
+            return {}
+        with open(self.path, 'r') as file:
+            return json.loads(decrypt_data(file.read(), self.key))
+
+    def read_snapshot_value(self, name):
+        """
+        Lee un contenedor de la copia completa (en JSON, cargándola entera).
+        """
+        return self.read_snapshot().get(name)
+
+    def write_snapshot(self, vault):
+        """
+        Escribe la copia completa de forma atómica.
+        """
+        safe_io.atomic_write(self.path, encrypt_data(json.dumps(vault), self.key))
+
+    def exists(self):
+        return self.has_snapshot() or any(os.path.exists(path) for path in (log_store.LOG_FILE, log_store.ROTATED_LOG_FILE))
+
+    def open(self):
+        return log_store.replay_log(self.read_snapshot(), self.key)
+
+    def get(self, name):
+        # El log siempre contiene la versión más reciente de lo que ha cambiado
+        found, value = False, None
+        for record in log_store.read_records(self.key):
+            if record["name"] == name:
+                found, value = True, record["data"]
+        if found:
+            return value
+        return self.read_snapshot_value(name)
+
+    def put(self, name, value):
+        log_store.append_put(name, value, self.key)
+
+    def delete(self, name):
+        log_store.append_delete(name, self.key)
+
+    def commit(self, vault):
+        with _commit_lock:
+            self.write_snapshot(vault)
+            # Una vez escrita la copia completa, el log deja de ser necesario
+            log_store.truncate_log()
+
+    def batch(self):
+        return log_store.group_commit()
+
+    def space_usage(self, vault):
+        # En disco: la copia completa y el log, donde se acumulan las versiones sustituidas
+        # y las marcas de borrado hasta la siguiente copia completa
+        disk = sum(os.path.getsize(path) for path in self.snapshot_files() if os.path.exists(path))
+        disk += log_store.log_size()
+        live = sum(len(name) + len(value) for name, value in vault.items())
+        return disk, live
+
+    def begin_compaction(self):
+        _commit_lock.acquire()  # Hasta que termine `compact`, ningún guardado puede adelantarse
+        try:
+            # Los cambios que lleguen durante la compactación van a un log nuevo
+            log_store.rotate_log()
+        except Exception:
+            _commit_lock.release()
+            raise
+
+    def compact(self, live):
+        try:
+            self.write_snapshot(live)
+            # El log apartado ya está incluido en la copia nueva; el actual se conserva
+            log_store.drop_rotated_log()
+        finally:
+            _commit_lock.release()
+
+    def close(self):
+        log_store.close_log()
@@ -0,0 +1,105 @@
+import threading
+import storage
+
+FLUSH_DELAY_SECONDS = 2.0  # Tiempo sin cambios tras el que se guarda la copia completa del vault
+
+class WriteBehind:
+    def __init__(self, vault, key, delay=FLUSH_DELAY_SECONDS, save=storage.flush):
+        """
+        Inicializa el guardado diferido del vault: tras un cambio, la copia completa no se escribe
+        enseguida sino cuando pasan `delay` segundos sin más cambios, o al salir. Una ráfaga de
+        ediciones produce así una única escritura, y las operaciones de lectura ninguna.
+
+        Los cambios no se pierden mientras tanto: cada contenedor modificado ya está en el log de cambios.
+
+        Args:
+            vault (Vault): El vault a guardar.
+            key (bytes): La clave Fernet del vault.
+            delay (float): Los segundos sin cambios tras los que se guarda.
+            save (callable): La función que guarda el vault si tiene cambios (`storage.flush`).
+
+        Mientras se modifica el vault hay que mantener `lock`, para que el guardado no lo
+        recorra a medias: el temporizador solo guarda cuando la aplicación está esperando al usuario.
+        """
+        self.vault = vault
+        self.key = key
+        self.delay = delay
+        self.save = save
+        self.lock = threading.RLock()
+        self.timer = None
+        self.writes = 0  # Copias completas escritas
+
+    def schedule(self):
+        """
+        Programa el guardado para dentro de `delay` segundos si el vault tiene cambios, aplazando
+        el que hubiera pendiente.
+        """
+        with self.lock:
+            self.cancel()
+            if self.vault.dirty:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def cancel(self):
+        """
+        Cancela el guardado pendiente, si lo hay.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def flush(self):
+        """
+        Guarda ya el vault si tiene cambios (por ejemplo, al salir).
+        """
+        with self.lock:
+            self.cancel()
+            if self.save(self.vault, self.key):
+                self.writes += 1
+
+# Sección de prueba
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    from cryptography.fernet import Fernet
+    from encryption import encrypt_container
+    from vault import Vault
+
+    key = Fernet.generate_key()
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            vault = Vault({f"contenedor-{i}": encrypt_container(f"contenedor-{i}", "x" * 200, key) for i in range(5000)}, key)
+            edits = [(f"contenedor-{i}", encrypt_container(f"contenedor-{i}", "y" * 200, key)) for i in range(50)]
+
+            # Antes: una copia completa tras cada operación
+            start = time.perf_counter()
+            for name, value in edits:
+                vault[name] = value
+                storage.save_data(vault, key)
+            eager = time.perf_counter() - start
+
+            # Ahora: lecturas sin escrituras y una ráfaga de ediciones agrupada en una sola
+            writer = WriteBehind(vault, key, delay=0.2)
+            vault.mark_clean()
+            for name in vault:
+                writer.schedule()
+            assert writer.timer is None and writer.writes == 0, "Una lectura no debe programar un guardado."
+            start = time.perf_counter()
+            for name, value in edits:
+                with writer.lock:
+                    vault[name] = value
+                writer.schedule()
+            burst = time.perf_counter() - start
+            time.sleep(0.5)
+            assert writer.writes == 1 and not vault.dirty
+            assert storage.load_data(key) == dict(vault)
+            print(f"{len(edits)} ediciones sobre 5000 contenedores: guardando cada una {eager * 1000:.0f} ms | "
+                  f"diferido {burst * 1000:.1f} ms y {writer.writes} escritura")
+        finally:
+            os.chdir(previous_dir)